@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import argparse
+from collections import Counter
+from datetime import datetime
+import pandas as pd
+from config import Config
+from review_store import ReviewStore, review_ids, _parse_literal
+
+# Columns the aggregates are built from
+SOURCE_COLUMNS = ['place_id', 'fetched_at', 'rating', 'sentiment_label', 'primary_emotion',
+                  'all_emotions', 'categories', 'positive_keywords', 'negative_keywords']
+
+
+def _labels(value):
+    """Labels of a {label: score} dict, label/score structs or a plain list"""
+    value = _parse_literal(value)
+    if isinstance(value, dict):
+        return list(value.keys())
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return []
+    return [item['label'] if isinstance(item, dict) else item for item in value]
+
+
+def _value(value):
+    return '' if value is None or pd.isna(value) else str(value)
+
+
+class AggregateStore:
+    """
+    Incrementally maintained review counts for reports and dashboards.
+    Counts are kept per fetch day, place and sentiment label for each
+    dimension (reviews, sentiment, rating, primary_emotion, emotion,
+    category, positive_keyword, negative_keyword). Every review is counted
+    once: review ids already aggregated are skipped, so updating with
+    overlapping batches is safe. Readers sum a few hundred rows instead of
+    rescanning the analyzed history.
+    """
+
+    DIMENSIONS = ['reviews', 'sentiment', 'rating', 'primary_emotion', 'emotion',
+                  'category', 'positive_keyword', 'negative_keyword']
+
+    def __init__(self, path=None):
+        self.path = path or Config.AGGREGATES_FILE
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS aggregated (review_id TEXT PRIMARY KEY)")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS counts (
+                day TEXT NOT NULL,
+                place_id TEXT NOT NULL,
+                sentiment TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (day, place_id, sentiment, dimension, value)
+            )"""
+        )
+        self.conn.commit()
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """In-memory aggregates of a DataFrame of analyzed reviews"""
+        aggregates = cls(':memory:')
+        aggregates.update(df)
+        return aggregates
+
+    def update(self, df):
+        """
+        Add analyzed reviews that have not been aggregated yet.
+        Returns the number of newly counted reviews.
+        """
+        if len(df) == 0:
+            return 0
+        df = df.copy()
+        if 'fetched_at' not in df.columns:
+            df['fetched_at'] = datetime.now()
+        for column in SOURCE_COLUMNS:
+            if column not in df.columns:
+                df[column] = None
+        if 'review_id' not in df.columns:
+            df['review_id'] = review_ids(df)
+        days = pd.to_datetime(df['fetched_at']).dt.strftime('%Y-%m-%d')
+
+        counts = Counter()
+        added = 0
+        with self.conn:
+            for review_id, day, row in zip(df['review_id'], days, df.itertuples(index=False)):
+                inserted = self.conn.execute(
+                    "INSERT OR IGNORE INTO aggregated (review_id) VALUES (?)", (review_id,)
+                ).rowcount
+                if not inserted:
+                    continue
+                added += 1
+
+                key = (day, _value(row.place_id), _value(row.sentiment_label))
+                counts[key + ('reviews', '')] += 1
+                if _value(row.sentiment_label):
+                    counts[key + ('sentiment', row.sentiment_label)] += 1
+                if _value(row.rating):
+                    counts[key + ('rating', str(int(row.rating)))] += 1
+                if _value(row.primary_emotion):
+                    counts[key + ('primary_emotion', row.primary_emotion)] += 1
+                for label in _labels(row.all_emotions):
+                    counts[key + ('emotion', label)] += 1
+                for category in _labels(row.categories):
+                    counts[key + ('category', category)] += 1
+                for keyword in _labels(row.positive_keywords):
+                    counts[key + ('positive_keyword', keyword)] += 1
+                for keyword in _labels(row.negative_keywords):
+                    counts[key + ('negative_keyword', keyword)] += 1
+
+            self.conn.executemany(
+                """INSERT INTO counts (day, place_id, sentiment, dimension, value, count)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (day, place_id, sentiment, dimension, value)
+                   DO UPDATE SET count = count + excluded.count""",
+                [key + (count,) for key, count in counts.items()]
+            )
+        return added
+
+    def sync(self, store=None):
+        """
+        Catch up with the review store, e.g. after the aggregate file was
+        lost or the history was imported. Only reads the store when it holds
+        more reviews than have been aggregated.
+        """
+        store = store or ReviewStore()
+        if store.count() <= self.review_count():
+            return 0
+        return self.update(store.read(columns=['review_id'] + SOURCE_COLUMNS))
+
+    def _where(self, dimension, since=None, until=None, place_id=None, sentiment=None):
+        clauses, params = ["dimension = ?"], [dimension]
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(since.strftime('%Y-%m-%d'))
+        if until is not None:
+            clauses.append("day < ?")
+            params.append(until.strftime('%Y-%m-%d'))
+        if place_id is not None:
+            clauses.append("place_id = ?")
+            params.append(place_id)
+        if sentiment is not None:
+            clauses.append("sentiment = ?")
+            params.append(sentiment)
+        return ' AND '.join(clauses), params
+
+    def counts(self, dimension, since=None, until=None, place_id=None, sentiment=None):
+        """
+        Counts per value of a dimension as a Series sorted by count.
+        `since`/`until` bound the fetch day (until is exclusive); `sentiment`
+        restricts to reviews with that sentiment label.
+        """
+        if dimension not in self.DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension!r}; choose from {self.DIMENSIONS}")
+        where, params = self._where(dimension, since, until, place_id, sentiment)
+        rows = self.conn.execute(
+            f"SELECT value, SUM(count) AS total FROM counts WHERE {where} "
+            f"GROUP BY value ORDER BY total DESC, value",
+            params
+        ).fetchall()
+        return pd.Series({value: total for value, total in rows}, dtype='int64')
+
+    def total(self, since=None, until=None, place_id=None, sentiment=None):
+        """Number of reviews matching the filters"""
+        return int(self.counts('reviews', since, until, place_id, sentiment).sum())
+
+    def average_rating(self, since=None, until=None, place_id=None):
+        ratings = self.counts('rating', since, until, place_id)
+        if ratings.sum() == 0:
+            return float('nan')
+        return float((ratings.index.astype(int) * ratings).sum() / ratings.sum())
+
+    def daily(self, dimension, since=None, until=None, place_id=None):
+        """Counts per fetch day (rows) and value (columns)"""
+        where, params = self._where(dimension, since, until, place_id)
+        rows = self.conn.execute(
+            f"SELECT day, value, SUM(count) FROM counts WHERE {where} GROUP BY day, value",
+            params
+        ).fetchall()
+        df = pd.DataFrame(rows, columns=['day', 'value', 'count'])
+        return df.pivot(index='day', columns='value', values='count').fillna(0).astype('int64')
+
+    def review_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM aggregated").fetchone()[0]
+
+    def rebuild(self, store=None):
+        """Recount everything from the review store"""
+        with self.conn:
+            self.conn.execute("DELETE FROM aggregated")
+            self.conn.execute("DELETE FROM counts")
+        return self.sync(store)
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain review count aggregates')
+    parser.add_argument('--rebuild', action='store_true', help='Recount from the review store')
+    args = parser.parse_args()
+
+    aggregates = AggregateStore()
+    if args.rebuild:
+        counted = aggregates.rebuild()
+    else:
+        counted = aggregates.sync()
+    print(f"✓ {counted} reviews aggregated ({aggregates.review_count()} total) in {aggregates.path}")
+
+if __name__ == "__main__":
+    main()
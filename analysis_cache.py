@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from config import Config
+from keywords import KeywordMatcher
+from category_engine import category_engine_fingerprint
+
+def model_fingerprint(stages=None, backend=None):
+    """Identifies the model configuration analysis results came from"""
+    stages = list(stages or Config.ANALYSIS_STAGES)
+    return '\n'.join([
+        str(AnalysisCache.FORMAT_VERSION),
+        Config.SENTIMENT_MODEL,
+        Config.EMOTION_MODEL,
+        Config.ZERO_SHOT_MODEL,
+        category_engine_fingerprint(stages),
+        backend or Config.INFERENCE_BACKEND,
+        '|'.join(Config.CATEGORIES),
+        '|'.join(stages),
+        KeywordMatcher().fingerprint if 'keywords' in stages else '',
+        Config.EMBEDDING_MODEL if 'embedding' in stages else ''
+    ])
+
+
+class AnalysisCache:
+    """
+    On-disk cache of per-review analysis results.
+    Entries are keyed by a hash of the review text plus the configured
+    models, backend, categories and analysis stages, so changing any of them
+    invalidates old results.
+    When the cache grows past `max_bytes`, least recently used entries
+    are evicted.
+    """
+
+    # Bump when the shape or preprocessing of analysis results changes
+    FORMAT_VERSION = 3
+
+    def __init__(self, path=None, max_bytes=None, stages=None, backend=None):
+        self.stages = list(stages or Config.ANALYSIS_STAGES)
+        self.backend = backend or Config.INFERENCE_BACKEND
+        self.path = path or Config.ANALYSIS_CACHE_FILE
+        self.max_bytes = max_bytes if max_bytes is not None else Config.ANALYSIS_CACHE_MAX_MB * 1024 * 1024
+        self.fingerprint = model_fingerprint(self.stages, self.backend)
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    def make_key(self, text):
+        digest = hashlib.sha256()
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(self.fingerprint.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: analysis} for the keys present in the cache"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(unique_keys), 500):
+            chunk = unique_keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, payload FROM analyses WHERE key IN ({placeholders})",
+                chunk
+            ).fetchall()
+            found.update({key: json.loads(payload) for key, payload in rows})
+
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE analyses SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            self.conn.commit()
+
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """Store (key, analysis) pairs and evict if over the size limit"""
+        now = time.time()
+        rows = []
+        for key, analysis in items:
+            payload = json.dumps(analysis)
+            rows.append((key, payload, len(payload), now))
+        if not rows:
+            return
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO analyses (key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        cursor = self.conn.execute("SELECT key, size FROM analyses ORDER BY last_used ASC")
+        to_delete = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            total -= size
+            evicted += 1
+
+        self.conn.executemany("DELETE FROM analyses WHERE key = ?", to_delete)
+        self.conn.commit()
+        return evicted
+
+    def stats(self):
+        entries, size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses"
+        ).fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'size_mb': size / (1024 * 1024)
+        }
+
+    def close(self):
+        self.conn.close()
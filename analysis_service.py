@@ -0,0 +1,195 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from config import Config
+from keywords import KeywordMatcher
+from category_engine import category_engine_fingerprint
+
+def service_signature(stages=None, backend=None):
+    """What a client needs to match for the service's results to be usable"""
+    stages = list(stages or Config.ANALYSIS_STAGES)
+    return {
+        'stages': stages,
+        'backend': backend or Config.INFERENCE_BACKEND,
+        'models': [Config.SENTIMENT_MODEL, Config.EMOTION_MODEL, Config.ZERO_SHOT_MODEL],
+        'category_engine': category_engine_fingerprint(stages),
+        'categories': list(Config.CATEGORIES),
+        'lexicon': KeywordMatcher().fingerprint if 'keywords' in stages else None,
+        'embedding_model': Config.EMBEDDING_MODEL if 'embedding' in stages else None
+    }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent analysis requests into micro-batches.
+    Requests are queued by the HTTP handler threads; a single worker
+    thread waits up to `max_wait` seconds for more texts (or until
+    `max_batch` texts are queued), analyzes them in one call and hands
+    each request its own slice of the results.
+    """
+
+    def __init__(self, analyzer, max_batch=None, max_wait=None):
+        self.analyzer = analyzer
+        self.max_batch = max_batch or Config.SERVICE_MAX_BATCH
+        self.max_wait = max_wait if max_wait is not None else Config.SERVICE_MAX_WAIT_MS / 1000
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.reviews = 0
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, texts):
+        """Block until the texts have been analyzed and return their results"""
+        pending = {'texts': texts, 'done': threading.Event(), 'results': None, 'error': None}
+        self.requests.put(pending)
+        pending['done'].wait()
+        if pending['error'] is not None:
+            raise pending['error']
+        return pending['results']
+
+    def _collect(self):
+        batch = [self.requests.get()]
+        size = len(batch[0]['texts'])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            size += len(pending['texts'])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for pending in batch for text in pending['texts']]
+            try:
+                results = self.analyzer.analyze_batch(texts)
+            except Exception as e:
+                for pending in batch:
+                    pending['error'] = e
+                    pending['done'].set()
+                continue
+
+            self.batches += 1
+            self.reviews += len(texts)
+            offset = 0
+            for pending in batch:
+                count = len(pending['texts'])
+                pending['results'] = results[offset:offset + count]
+                offset += count
+                pending['done'].set()
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self._send_json(404, {'error': 'not found'})
+            return
+        batcher = self.server.batcher
+        self._send_json(200, {
+            'status': 'ok',
+            'signature': self.server.signature,
+            'batches': batcher.batches,
+            'reviews': batcher.reviews
+        })
+
+    def do_POST(self):
+        if self.path != '/analyze':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            texts = json.loads(self.rfile.read(length))['texts']
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {'error': 'expected JSON body {"texts": [...]}'})
+            return
+        try:
+            results = self.server.batcher.submit(texts)
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+            return
+        self._send_json(200, {'results': results})
+
+    def log_message(self, format, *args):
+        # Keep the service log to startup and errors
+        pass
+
+
+def create_server(analyzer, host=None, port=None):
+    server = ThreadingHTTPServer((host or Config.SERVICE_HOST, port or Config.SERVICE_PORT),
+                                 AnalysisRequestHandler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher(analyzer)
+    server.signature = service_signature(analyzer.stages, analyzer.backend)
+    return server
+
+
+class AnalysisClient:
+    """Talks to a running analysis service over localhost HTTP"""
+
+    def __init__(self, host=None, port=None):
+        self.base_url = f"http://{host or Config.SERVICE_HOST}:{port or Config.SERVICE_PORT}"
+        self.session = requests.Session()
+
+    def is_available(self, stages=None, backend=None):
+        """True if a service is running with the same models and settings"""
+        try:
+            response = self.session.get(f"{self.base_url}/health", timeout=0.5)
+            response.raise_for_status()
+            return response.json().get('signature') == service_signature(stages, backend)
+        except (requests.RequestException, ValueError):
+            return False
+
+    def analyze(self, texts, progress=None, chunk_size=256):
+        """Same results as TransformerAnalyzer.analyze_batch"""
+        results = []
+        for start in range(0, len(texts), chunk_size):
+            chunk = texts[start:start + chunk_size]
+            response = self.session.post(f"{self.base_url}/analyze", json={'texts': chunk},
+                                         timeout=Config.SERVICE_TIMEOUT)
+            response.raise_for_status()
+            results.extend(response.json()['results'])
+            if progress is not None:
+                progress.update(len(chunk))
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve review analysis with warm models')
+    parser.add_argument('--host', default=Config.SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=Config.SERVICE_PORT)
+    parser.add_argument('--stages', type=lambda value: [s.strip() for s in value.split(',') if s.strip()],
+                        help='Comma-separated analysis stages to serve (default: all)')
+    args = parser.parse_args()
+
+    from analyze_reviews import TransformerAnalyzer
+
+    analyzer = TransformerAnalyzer(use_cache=False, use_dedup=False, stages=args.stages)
+    analyzer.load_models()
+
+    server = create_server(analyzer, args.host, args.port)
+    print(f"✓ Analysis service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down analysis service")
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,338 @@
+import json
+import time
+import hashlib
+import unicodedata
+from contextlib import contextmanager
 import pandas as pd
 import torch
 from transformers import (
     pipeline,
     AutoTokenizer,
+    AutoModel,
     AutoModelForSequenceClassification
 )
 from tqdm import tqdm
 from config import Config
+from analysis_cache import AnalysisCache, model_fingerprint
+from category_engine import FastCategoryClassifier, CategoryScoreCache, format_category_scores, score_model_key
+from keywords import KeywordMatcher
+from dedup import DedupIndex
+from model_bundle import find_bundle_model, load_model as load_bundled_model, load_tokenizer
+from telemetry import telemetry
 import warnings
 warnings.filterwarnings('ignore')
 
-class TransformerAnalyzer:
+class ReviewPreprocessor:
+    """
+    Normalizes reviews and tokenizes them once per tokenizer family.
+    Models whose tokenizers produce the same ids (the RoBERTa emotion
+    model and BART share a byte-level BPE vocabulary) share a single
+    tokenization pass. Ids are kept without special tokens so each model
+    truncates to its own max length when its inputs are built.
+    """
+    
     def __init__(self):
-        print("Loading Transformer models...")
-        print("This may take a few minutes on first run...")
-        
+        self.tokenizers = {}  # family key -> tokenizer
+        self.roles = {}       # role (sentiment, emotion, ...) -> family key
+    
+    @staticmethod
+    def normalize(text):
+        """Unicode-normalize and collapse whitespace"""
+        return ' '.join(unicodedata.normalize('NFKC', text).split())
+    
+    @staticmethod
+    def family_key(tokenizer):
+        """Tokenizers with the same normalizer, pre-tokenizer and vocab share a key"""
+        if getattr(tokenizer, 'is_fast', False):
+            spec = json.loads(tokenizer.backend_tokenizer.to_str())
+            for field in ('post_processor', 'padding', 'truncation', 'added_tokens'):
+                spec.pop(field, None)
+            payload = json.dumps(spec, sort_keys=True)
+        else:
+            payload = f"{type(tokenizer).__name__}:{tokenizer.name_or_path}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    def register(self, role, tokenizer):
+        key = self.family_key(tokenizer)
+        self.tokenizers.setdefault(key, tokenizer)
+        self.roles[role] = key
+    
+    def encode(self, texts, roles=None):
+        """
+        Tokenize normalized texts once per family.
+        Returns {role: [token ids per text]} for the requested roles.
+        """
+        roles = roles or list(self.roles)
+        encoded_families = {}
+        for role in roles:
+            key = self.roles[role]
+            if key not in encoded_families:
+                encoded_families[key] = self.tokenizers[key](
+                    list(texts),
+                    add_special_tokens=False,
+                    verbose=False
+                )['input_ids']
+        return {role: encoded_families[self.roles[role]] for role in roles}
+
+
+def model_max_length(tokenizer, model):
+    """Real max sequence length of a model, including special tokens"""
+    max_length = tokenizer.model_max_length
+    # Tokenizers without a configured limit report a huge sentinel value
+    if max_length > 100000:
+        max_length = getattr(model.config, 'max_position_embeddings', 512)
+    return max_length
+
+
+def split_batches(lengths, batch_size=None, max_tokens=None):
+    """
+    (start, end) ranges over sequences sorted by length: at most
+    `batch_size` sequences each, and at most `max_tokens` once padded
+    (a longer sequence still gets a batch of its own)
+    """
+    ranges, start = [], 0
+    while start < len(lengths):
+        end = start + 1
+        width = lengths[start]
+        while end < len(lengths) and (batch_size is None or end - start < batch_size):
+            width = max(width, lengths[end])
+            if max_tokens and (end - start + 1) * width > max_tokens:
+                break
+            end += 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+@contextmanager
+def torch_threads(threads):
+    """
+    Run with `threads` intra-op threads, never more than the process
+    already uses (parallel workers keep their share); unchanged when None
+    """
+    previous = torch.get_num_threads()
+    if threads:
+        torch.set_num_threads(min(threads, previous))
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+def pad_batch(sequences, pad_token_id, device):
+    """Right-pad encoded sequences to the longest one in the batch"""
+    width = max(len(ids) for ids in sequences)
+    input_ids = torch.full((len(sequences), width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+    for row, ids in enumerate(sequences):
+        input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, :len(ids)] = 1
+    return {
+        'input_ids': input_ids.to(device),
+        'attention_mask': attention_mask.to(device)
+    }
+
+
+class TransformerAnalyzer:
+    STAGES = Config.ALL_ANALYSIS_STAGES
+    
+    # role -> (pipeline task, Config model attribute, extra pipeline kwargs)
+    PIPELINES = {
         # Sentiment Analysis (BERT-based)
-        self.sentiment_analyzer = pipeline(
-            "sentiment-analysis",
-            model=Config.SENTIMENT_MODEL,
-            device=0 if torch.cuda.is_available() else -1
-        )
-        
+        'sentiment': ("sentiment-analysis", 'SENTIMENT_MODEL', {}),
         # Emotion Detection
-        self.emotion_analyzer = pipeline(
-            "text-classification",
-            model=Config.EMOTION_MODEL,
-            top_k=None,
-            device=0 if torch.cuda.is_available() else -1
-        )
-        
+        'emotion': ("text-classification", 'EMOTION_MODEL', {'top_k': None}),
         # Zero-shot Classification for category detection
-        self.category_classifier = pipeline(
-            "zero-shot-classification",
-            model=Config.ZERO_SHOT_MODEL,
-            device=0 if torch.cuda.is_available() else -1
+        'categories': ("zero-shot-classification", 'ZERO_SHOT_MODEL', {}),
+        # Sentence embeddings for similarity search (mean-pooled encoder states)
+        'embedding': ("feature-extraction", 'EMBEDDING_MODEL', {})
+    }
+    
+    BACKENDS = ['fp32', 'int8']
+    
+    def __init__(self, use_cache=None, stages=None, backend=None, use_dedup=None):
+        self.stages = list(stages or Config.ANALYSIS_STAGES)
+        self.backend = backend or Config.INFERENCE_BACKEND
+        unknown = [stage for stage in self.stages if stage not in self.STAGES]
+        if unknown:
+            raise ValueError(f"Unknown analysis stages: {', '.join(unknown)} "
+                             f"(choose from {', '.join(self.STAGES)})")
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Unknown inference backend: {self.backend} "
+                             f"(choose from {', '.join(self.BACKENDS)})")
+        
+        # Models are loaded on first use, so stages that don't run
+        # never pay for loading their model
+        self._pipelines = {}
+        self._fast_category_classifier = None
+        self._distilled_category_classifier = None
+        self._embedding_store = None
+        self.preprocessor = ReviewPreprocessor()
+        self.keyword_matcher = KeywordMatcher() if 'keywords' in self.stages else None
+        
+        print(f"Analysis stages: {', '.join(self.stages)} "
+              f"({self.backend} backend, models load on first use)")
+        
+        # Batch sizes and threads measured on this machine by autotune.py
+        self.tuning = None
+        if Config.AUTOTUNE_ENABLED:
+            from autotune import load_profile
+            self.tuning = load_profile(self.backend)
+        if self.tuning and self.tuning['interop_threads']:
+            try:
+                torch.set_num_interop_threads(self.tuning['interop_threads'])
+            except RuntimeError:
+                pass  # Fixed once torch has run parallel work in this process
+        # Reviews per length bucket; the tuned models split it further
+        tuned_sizes = [self._tuned(role).get('batch_size') for role in ('sentiment', 'emotion')]
+        self.bucket_size = max(filter(None, tuned_sizes), default=Config.BATCH_SIZE)
+        
+        if use_cache is None:
+            use_cache = Config.ANALYSIS_CACHE_ENABLED
+        self.cache = AnalysisCache(stages=self.stages, backend=self.backend) if use_cache else None
+        self.category_score_cache = (
+            CategoryScoreCache(model_key=score_model_key(self.backend))
+            if use_cache and Config.CATEGORY_SCORE_CACHE_ENABLED and 'categories' in self.stages else None
         )
         
-        print("✓ All models loaded successfully!\n")
+        if use_dedup is None:
+            use_dedup = Config.DEDUP_ENABLED
+        self.dedup = (DedupIndex(fingerprint=model_fingerprint(self.stages, self.backend))
+                      if use_dedup else None)
+    
+    def _tuned(self, role):
+        """Autotuned batch size/threads for a model ({} without a profile)"""
+        return self.tuning['models'].get(role, {}) if self.tuning else {}
+    
+    @staticmethod
+    def model_class(role):
+        return AutoModel if role == 'embedding' else AutoModelForSequenceClassification
+    
+    def _load_pipeline(self, role):
+        if role not in self._pipelines:
+            task, model_attr, kwargs = self.PIPELINES[role]
+            model_name = getattr(Config, model_attr)
+            # Exported bundles load offline with memory-mapped weights
+            bundled = find_bundle_model(role, model_name)
+            print(f"Loading {role} model ({model_name}{' from ' + bundled if bundled else ''})...")
+            start = time.perf_counter()
+            if self.backend == 'int8':
+                # Dynamically quantized models only run on CPU
+                from quantize_models import load_quantized_model
+                self._pipelines[role] = pipeline(
+                    task,
+                    model=load_quantized_model(model_name, self.model_class(role), source=bundled),
+                    tokenizer=load_tokenizer(bundled) if bundled else AutoTokenizer.from_pretrained(model_name),
+                    device=-1,
+                    **kwargs
+                )
+            elif bundled:
+                self._pipelines[role] = pipeline(
+                    task,
+                    model=load_bundled_model(bundled, self.model_class(role)),
+                    tokenizer=load_tokenizer(bundled),
+                    device=0 if torch.cuda.is_available() else -1,
+                    **kwargs
+                )
+            else:
+                self._pipelines[role] = pipeline(
+                    task,
+                    model=model_name,
+                    device=0 if torch.cuda.is_available() else -1,
+                    **kwargs
+                )
+            self.preprocessor.register(role, self._pipelines[role].tokenizer)
+            telemetry.record_model_load(role, time.perf_counter() - start)
+        return self._pipelines[role]
+    
+    @property
+    def sentiment_analyzer(self):
+        return self._load_pipeline('sentiment')
+    
+    @property
+    def emotion_analyzer(self):
+        return self._load_pipeline('emotion')
+    
+    @property
+    def embedding_model(self):
+        return self._load_pipeline('embedding')
+    
+    @property
+    def embedding_store(self):
+        if self._embedding_store is None:
+            from embedding_store import EmbeddingStore
+            self._embedding_store = EmbeddingStore()
+        return self._embedding_store
+    
+    @property
+    def category_classifier(self):
+        return self._load_pipeline('categories')
+    
+    @property
+    def fast_category_classifier(self):
+        """Batched category engine, or None when CATEGORY_ENGINE is 'pipeline'"""
+        if Config.CATEGORY_ENGINE != 'fast':
+            return None
+        if self._fast_category_classifier is None:
+            self._fast_category_classifier = FastCategoryClassifier(
+                self.category_classifier.model,
+                self.category_classifier.tokenizer,
+                batch_size=self._tuned('categories').get('batch_size')
+            )
+        return self._fast_category_classifier
+    
+    @property
+    def distilled_category_classifier(self):
+        """
+        Distilled category engine, or None when CATEGORY_ENGINE is not
+        'distilled' or no distilled model has been trained yet
+        """
+        if Config.CATEGORY_ENGINE != 'distilled':
+            return None
+        if self._distilled_category_classifier is None:
+            from distill_categories import load_distilled_classifier
+            start = time.perf_counter()
+            # False marks "looked, but nothing to load" so the lookup runs once
+            self._distilled_category_classifier = load_distilled_classifier() or False
+            telemetry.record_model_load('categories_distilled', time.perf_counter() - start)
+        return self._distilled_category_classifier or None
+    
+    def load_models(self):
+        """Eagerly load the models needed by the active stages"""
+        self._encoding_roles()
+        if 'categories' in self.stages:
+            # The zero-shot model is only loaded up front when the distilled
+            # engine is not available; otherwise it loads on the first fallback
+            if self.distilled_category_classifier is None:
+                self.category_classifier
+                self.fast_category_classifier
+    
+    def _encoding_roles(self):
+        """Models in the active stages that consume pre-tokenized reviews"""
+        roles = [role for role in ('sentiment', 'emotion') if role in self.stages]
+        if 'categories' in self.stages and Config.CATEGORY_ENGINE == 'fast':
+            roles.append('categories')
+        if 'embedding' in self.stages:
+            roles.append('embedding')
+        for role in roles:
+            self._load_pipeline(role)
+        return roles
     
     def analyze_sentiment(self, text):
         """Analyze sentiment using DistilBERT"""
         try:
-            result = self.sentiment_analyzer(text[:512])[0]  # Truncate to 512 tokens
-            return {
-                'sentiment_label': result['label'],
-                'sentiment_score': result['score']
-            }
+            encoded = self.preprocessor.encode([self.preprocessor.normalize(text)], ['sentiment'])
+            result = self._classify_encoded(self.sentiment_analyzer, encoded['sentiment'])[0][0]
+            return self._format_sentiment(result)
         except Exception as e:
             return {'sentiment_label': 'ERROR', 'sentiment_score': 0}
     
     def analyze_emotion(self, text):
         """Detect emotions using RoBERTa"""
         try:
-            results = self.emotion_analyzer(text[:512])[0]
-            # Get top 3 emotions
-            sorted_emotions = sorted(results, key=lambda x: x['score'], reverse=True)[:3]
-            return {
-                'primary_emotion': sorted_emotions[0]['label'],
-                'primary_emotion_score': sorted_emotions[0]['score'],
-                'secondary_emotion': sorted_emotions[1]['label'] if len(sorted_emotions) > 1 else None,
-                'secondary_emotion_score': sorted_emotions[1]['score'] if len(sorted_emotions) > 1 else 0,
-                'all_emotions': {e['label']: e['score'] for e in results}
-            }
+            encoded = self.preprocessor.encode([self.preprocessor.normalize(text)], ['emotion'])
+            results = self._classify_encoded(self.emotion_analyzer, encoded['emotion'])[0]
+            return self._format_emotion(results)
         except Exception as e:
             return {
                 'primary_emotion': 'ERROR',
@@ -75,42 +345,160 @@ class TransformerAnalyzer:
     def classify_categories(self, text):
         """Classify review into multiple categories using zero-shot"""
         try:
-            result = self.category_classifier(
-                text[:512],
-                Config.CATEGORIES,
-                multi_label=True
-            )
-            
-            # Get categories with score > 0.5
-            relevant_categories = [
-                label for label, score in zip(result['labels'], result['scores'])
-                if score > 0.5
-            ]
-            
-            return {
-                'categories': relevant_categories[:3],  # Top 3 categories
-                'category_scores': dict(zip(result['labels'][:3], result['scores'][:3]))
-            }
+            text = self.preprocessor.normalize(text)
+            if self.distilled_category_classifier is not None:
+                return self._distilled_categories([text])[0]
+            return self.zero_shot_categories([text])[0]
         except Exception as e:
             return {'categories': [], 'category_scores': {}}
     
-    def extract_key_phrases(self, text):
-        """Simple keyword extraction (can be enhanced with NER)"""
-        # Common positive/negative indicators
-        positive_keywords = ['great', 'excellent', 'amazing', 'love', 'best', 'wonderful',
-                           'friendly', 'helpful', 'clean', 'quality', 'recommend']
-        negative_keywords = ['bad', 'terrible', 'worst', 'hate', 'poor', 'rude',
-                           'dirty', 'expensive', 'slow', 'disappointed', 'avoid']
+    def zero_shot_categories(self, texts, premises=None):
+        """
+        Categories of normalized texts from the zero-shot model (batched
+        pairs with the 'fast' engine, otherwise the pipeline), regardless
+        of whether the distilled engine is active. `premises` are the
+        texts tokenized for the fast engine, when already at hand.
+        """
+        return [format_category_scores(scores) for scores in self.zero_shot_scores(texts, premises)]
+    
+    def zero_shot_scores(self, texts, premises=None):
+        """
+        {category: entailment score} per normalized text. Scores of
+        (review, hypothesis) pairs seen before come from the score cache,
+        so after a change to CATEGORIES only the new hypotheses run.
+        """
+        hypotheses = {category: Config.CATEGORY_HYPOTHESIS_TEMPLATE.format(category)
+                      for category in Config.CATEGORIES}
+        cache = self.category_score_cache
+        keys = [CategoryScoreCache.review_key(text) for text in texts]
+        cached = cache.get_many(keys) if cache is not None else {}
+        
+        # Group reviews by the categories they miss (usually all or none)
+        scores, missing = [], {}
+        for i, key in enumerate(keys):
+            found = {category: cached[(key, hypothesis)]
+                     for category, hypothesis in hypotheses.items() if (key, hypothesis) in cached}
+            scores.append(found)
+            if len(found) < len(hypotheses):
+                missing.setdefault(tuple(c for c in hypotheses if c not in found), []).append(i)
         
-        text_lower = text.lower()
-        found_positive = [word for word in positive_keywords if word in text_lower]
-        found_negative = [word for word in negative_keywords if word in text_lower]
+        fresh = []
+        for categories, rows in missing.items():
+            batch_premises = [premises[i] for i in rows] if premises is not None else None
+            for i, values in zip(rows, self._score_categories([texts[i] for i in rows], list(categories),
+                                                              batch_premises)):
+                scores[i].update(values)
+                fresh.extend((keys[i], hypotheses[category], values[category]) for category in categories)
         
+        if cache is not None and fresh:
+            cache.put_many(fresh)
+        telemetry.count('category_pairs_cached', len(texts) * len(hypotheses) - len(fresh))
+        return scores
+    
+    def _score_categories(self, texts, categories, premises=None):
+        """Zero-shot {category: score} for some of the categories, per normalized text"""
+        tuned = self._tuned('categories')
+        if Config.CATEGORY_ENGINE == 'fast':
+            classifier = self.fast_category_classifier
+            if premises is None:
+                premises = self.preprocessor.encode(texts, ['categories'])['categories'] if texts else []
+            with torch_threads(tuned.get('threads')):
+                return classifier.score_encoded(premises, categories)
+        results = []
+        for start in range(0, len(texts), Config.BATCH_SIZE):
+            batch = texts[start:start + Config.BATCH_SIZE]
+            # The pipeline truncates the review to the model's max length itself
+            with torch_threads(tuned.get('threads')):
+                output = self.category_classifier(
+                    batch,
+                    categories,
+                    multi_label=True,
+                    hypothesis_template=Config.CATEGORY_HYPOTHESIS_TEMPLATE,
+                    batch_size=tuned.get('batch_size', len(batch))
+                )
+            results.extend(dict(zip(result['labels'], result['scores']))
+                           for result in (output if isinstance(output, list) else [output]))
+        return results
+    
+    def _distilled_categories(self, texts):
+        """Distilled engine results, with uncertain reviews re-scored by zero-shot"""
+        with telemetry.model_call('categories', len(texts)):
+            results, uncertain = self.distilled_category_classifier.classify_batch(texts)
+        if uncertain:
+            texts = [texts[i] for i in uncertain]
+            self.category_classifier  # load outside the timed call
+            with telemetry.model_call('categories_zero_shot', len(texts)):
+                fallback = self.zero_shot_categories(texts)
+            for i, result in zip(uncertain, fallback):
+                results[i] = result
+            telemetry.count('categories_fallback', len(texts))
+        return results
+    
+    @torch.no_grad()
+    def _classify_encoded(self, classifier, token_ids, batch_size=None, max_batch_tokens=None):
+        """
+        Run a text-classification model on pre-tokenized reviews.
+        Each review is truncated to the model's max length and each forward
+        pass is padded only to its longest member; `batch_size` and
+        `max_batch_tokens` (autotuned) split the reviews into several passes.
+        Returns, per review, the softmaxed labels sorted by score like the
+        pipeline with top_k=None.
+        """
+        tokenizer, model = classifier.tokenizer, classifier.model
+        budget = model_max_length(tokenizer, model) - tokenizer.num_special_tokens_to_add()
+        sequences = [tokenizer.build_inputs_with_special_tokens(ids[:budget]) for ids in token_ids]
+        
+        probs = []
+        for start, end in split_batches([len(ids) for ids in sequences], batch_size, max_batch_tokens):
+            inputs = pad_batch(sequences[start:end], tokenizer.pad_token_id, model.device)
+            probs.extend(model(**inputs).logits.softmax(dim=-1).tolist())
+        
+        id2label = model.config.id2label
+        return [
+            sorted(
+                ({'label': id2label[i], 'score': score} for i, score in enumerate(row)),
+                key=lambda x: x['score'],
+                reverse=True
+            )
+            for row in probs
+        ]
+    
+    @torch.no_grad()
+    def _embed_encoded(self, extractor, token_ids):
+        """L2-normalized mean of the last hidden states over each review's tokens"""
+        tokenizer, model = extractor.tokenizer, extractor.model
+        budget = model_max_length(tokenizer, model) - tokenizer.num_special_tokens_to_add()
+        sequences = [tokenizer.build_inputs_with_special_tokens(ids[:budget]) for ids in token_ids]
+        
+        inputs = pad_batch(sequences, tokenizer.pad_token_id, model.device)
+        hidden = model(**inputs).last_hidden_state
+        mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+        vectors = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return torch.nn.functional.normalize(vectors, dim=-1).cpu().tolist()
+    
+    @staticmethod
+    def _format_sentiment(result):
         return {
-            'positive_keywords': found_positive[:5],
-            'negative_keywords': found_negative[:5]
+            'sentiment_label': result['label'],
+            'sentiment_score': result['score']
         }
     
+    @staticmethod
+    def _format_emotion(results):
+        # Get top 3 emotions
+        sorted_emotions = sorted(results, key=lambda x: x['score'], reverse=True)[:3]
+        return {
+            'primary_emotion': sorted_emotions[0]['label'],
+            'primary_emotion_score': sorted_emotions[0]['score'],
+            'secondary_emotion': sorted_emotions[1]['label'] if len(sorted_emotions) > 1 else None,
+            'secondary_emotion_score': sorted_emotions[1]['score'] if len(sorted_emotions) > 1 else 0,
+            'all_emotions': {e['label']: e['score'] for e in results}
+        }
+    
+    def extract_key_phrases(self, text):
+        """Positive/negative keywords from the configured lexicons"""
+        return self.keyword_matcher.extract(text)
+    
     def analyze_review(self, text):
         """Complete analysis of a single review"""
         if not text or len(text.strip()) < 10:
@@ -118,43 +506,316 @@ class TransformerAnalyzer:
         
         analysis = {}
         
+        roles = self._encoding_roles()
+        if roles:
+            encoded = self.preprocessor.encode([self.preprocessor.normalize(text)], roles[:1])
+            analysis['token_count'] = len(encoded[roles[0]][0])
+        
         # Sentiment
-        sentiment_result = self.analyze_sentiment(text)
-        analysis.update(sentiment_result)
+        if 'sentiment' in self.stages:
+            analysis.update(self.analyze_sentiment(text))
         
         # Emotion
-        emotion_result = self.analyze_emotion(text)
-        analysis.update(emotion_result)
+        if 'emotion' in self.stages:
+            analysis.update(self.analyze_emotion(text))
         
         # Categories
-        category_result = self.classify_categories(text)
-        analysis.update(category_result)
+        if 'categories' in self.stages:
+            analysis.update(self.classify_categories(text))
         
         # Keywords
-        keywords = self.extract_key_phrases(text)
-        analysis.update(keywords)
+        if 'keywords' in self.stages:
+            analysis.update(self.extract_key_phrases(text))
+        
+        # Embedding (a review without a vector is left out of the embedding store)
+        if 'embedding' in self.stages:
+            try:
+                encoded = self.preprocessor.encode([self.preprocessor.normalize(text)], ['embedding'])
+                analysis['embedding'] = self._embed_encoded(self.embedding_model, encoded['embedding'])[0]
+            except Exception:
+                analysis['embedding'] = None
         
         return analysis
     
-    def analyze_all_reviews(self, df):
-        """Analyze all reviews in the dataframe"""
+    def _analyze_bucket(self, texts, encoded):
+        """Run the active stages over a whole bucket of pre-tokenized reviews"""
+        analyses = [{} for _ in texts]
+        
+        roles = list(encoded)
+        if roles:
+            for analysis, ids in zip(analyses, encoded[roles[0]]):
+                analysis['token_count'] = len(ids)
+        
+        def tokens(role):
+            return sum(len(ids) for ids in encoded.get(role, []))
+        
+        # Models are resolved (and loaded on first use) before each call is
+        # timed, so load time is not counted as latency
+        if 'sentiment' in self.stages:
+            classifier = self.sentiment_analyzer
+            tuned = self._tuned('sentiment')
+            with torch_threads(tuned.get('threads')), \
+                    telemetry.model_call('sentiment', len(texts), tokens('sentiment')):
+                sentiments = self._classify_encoded(classifier, encoded['sentiment'],
+                                                    tuned.get('batch_size'), tuned.get('max_batch_tokens'))
+            for analysis, labels in zip(analyses, sentiments):
+                analysis.update(self._format_sentiment(labels[0]))
+        
+        if 'emotion' in self.stages:
+            classifier = self.emotion_analyzer
+            tuned = self._tuned('emotion')
+            with torch_threads(tuned.get('threads')), \
+                    telemetry.model_call('emotion', len(texts), tokens('emotion')):
+                emotions = self._classify_encoded(classifier, encoded['emotion'],
+                                                  tuned.get('batch_size'), tuned.get('max_batch_tokens'))
+            for analysis, labels in zip(analyses, emotions):
+                analysis.update(self._format_emotion(labels))
+        
+        if 'categories' in self.stages and self.distilled_category_classifier is not None:
+            for analysis, category in zip(analyses, self._distilled_categories(texts)):
+                analysis.update(category)
+        elif 'categories' in self.stages:
+            # Load the model outside the timed call
+            self.fast_category_classifier or self.category_classifier
+            with telemetry.model_call('categories', len(texts), tokens('categories')):
+                categories = self.zero_shot_categories(texts, encoded.get('categories'))
+            for analysis, category in zip(analyses, categories):
+                analysis.update(category)
+        
+        if 'embedding' in self.stages:
+            extractor = self.embedding_model
+            with telemetry.model_call('embedding', len(texts), tokens('embedding')):
+                vectors = self._embed_encoded(extractor, encoded['embedding'])
+            for analysis, vector in zip(analyses, vectors):
+                analysis['embedding'] = vector
+        
+        return analyses
+    
+    def analyze_batch(self, texts, batch_size=None, progress=None):
+        """
+        Analyze a list of reviews with length-bucketed batching.
+        Reviews are normalized and tokenized once, sorted by token count
+        and grouped into buckets of `batch_size`, so each forward pass pads
+        to a similar length. Results are returned in the original order
+        (None for reviews too short to analyze, as in analyze_review).
+        """
+        batch_size = batch_size or self.bucket_size
+        results = [None] * len(texts)
+        
+        valid = [i for i, text in enumerate(texts)
+                 if isinstance(text, str) and len(text.strip()) >= 10]
+        if progress is not None:
+            progress.update(len(texts) - len(valid))
+        if not valid:
+            return results
+        
+        normalized = [self.preprocessor.normalize(texts[i]) for i in valid]
+        roles = self._encoding_roles()
+        encoded = self.preprocessor.encode(normalized, roles) if roles else {}
+        if roles:
+            token_counts = [len(ids) for ids in encoded[roles[0]]]
+            telemetry.count('tokens', sum(token_counts))
+        else:
+            token_counts = [len(text) for text in normalized]
+        order = sorted(range(len(valid)), key=lambda j: token_counts[j])
+        
+        for start in range(0, len(order), batch_size):
+            bucket = order[start:start + batch_size]
+            try:
+                analyses = self._analyze_bucket(
+                    [normalized[j] for j in bucket],
+                    {role: [ids[j] for j in bucket] for role, ids in encoded.items()}
+                )
+            except Exception as e:
+                # Fall back to per-review analysis so one bad review
+                # only loses its own result
+                print(f"⚠ Batch of {len(bucket)} reviews failed ({type(e).__name__}): {e}; retrying per review")
+                analyses = [self.analyze_review(texts[valid[j]]) for j in bucket]
+            for j, analysis in zip(bucket, analyses):
+                results[valid[j]] = analysis
+            if progress is not None:
+                progress.update(len(bucket))
+        
+        # Keywords are matched over the whole batch in a single pass
+        if 'keywords' in self.stages:
+            with telemetry.model_call('keywords', len(normalized)):
+                matches = self.keyword_matcher.extract_many(normalized)
+            for i, keywords in zip(valid, matches):
+                if results[i] is not None:
+                    results[i].update(keywords)
+        
+        return results
+    
+    def _analyze_uncached(self, texts, workers=1, use_service=False, progress=None):
+        if not texts:
+            return []
+        if use_service:
+            from analysis_service import AnalysisClient
+            client = AnalysisClient()
+            if client.is_available(self.stages, self.backend):
+                print(f"Using analysis service at {client.base_url}")
+                return client.analyze(texts, progress=progress)
+        if workers > 1:
+            from parallel_analysis import analyze_texts_sharded
+            return analyze_texts_sharded(texts, workers, stages=self.stages,
+                                         backend=self.backend, progress=progress)
+        return self.analyze_batch(texts, progress=progress)
+    
+    def _cached(self, texts, progress=None):
+        """(cache keys, cached analysis or None) per review"""
+        if self.cache is None:
+            return [None] * len(texts), [None] * len(texts)
+        keys = [self.cache.make_key(text) if isinstance(text, str) else None
+                for text in texts]
+        cached = self.cache.get_many([key for key in keys if key is not None])
+        results = [cached.get(key) for key in keys]
+        if progress is not None:
+            progress.update(sum(result is not None for result in results))
+        return keys, results
+    
+    def _cache_fresh(self, keys, indices, analyses):
+        if self.cache is None:
+            return
+        self.cache.put_many({keys[i]: analysis for i, analysis in zip(indices, analyses)
+                             if analysis and keys[i] is not None and not self._has_errors(analysis)}.items())
+    
+    def _analyze_with_cache(self, texts, workers=1, use_service=False, progress=None):
+        """Serve cached analyses and run inference only on cache misses"""
+        keys, results = self._cached(texts, progress)
+        missing = [i for i, result in enumerate(results) if result is None]
+        
+        fresh = self._analyze_uncached([texts[i] for i in missing], workers, use_service, progress)
+        for i, analysis in zip(missing, fresh):
+            results[i] = analysis
+        self._cache_fresh(keys, missing, fresh)
+        
+        return results
+    
+    def _analyze_deduplicated(self, texts, workers=1, use_service=False, progress=None, review_keys=None):
+        """
+        Run inference only on one review per near-duplicate cluster.
+        Returns (analyses, matches). The exact cache is checked first;
+        cache misses that are near-duplicates reuse the analysis of their
+        cluster's representative (see DedupIndex.match). `review_keys`
+        identify reviews that were indexed before.
+        """
+        if self.dedup is None:
+            return self._analyze_with_cache(texts, workers, use_service, progress), [None] * len(texts)
+        
+        keys, results = self._cached(texts, progress)
+        normalized = [self.preprocessor.normalize(text) if isinstance(text, str) else None
+                      for text in texts]
+        matches = self.dedup.match(normalized, review_keys)
+        reusable = [results[i] is None and match is not None
+                    and (match['source'] == 'batch' or match['payload'] is not None)
+                    for i, match in enumerate(matches)]
+        run = [i for i, result in enumerate(results) if result is None and not reusable[i]]
+        
+        fresh = self._analyze_uncached([texts[i] for i in run], workers, use_service, progress)
+        for i, analysis in zip(run, fresh):
+            results[i] = analysis
+        self._cache_fresh(keys, run, fresh)
+        for i, match in enumerate(matches):
+            if not reusable[i]:
+                continue
+            source = results[match['representative']] if match['source'] == 'batch' else match['payload']
+            results[i] = dict(source) if source else None
+        
+        if progress is not None:
+            progress.update(sum(reusable))
+        # Reviews indexed before are not near-duplicates of themselves
+        telemetry.count('dedup_reused', sum(reuse and match['source'] != 'known'
+                                            for reuse, match in zip(reusable, matches)))
+        self.dedup.record(matches, [None if analysis and self._has_errors(analysis) else analysis
+                                    for analysis in results])
+        return results, matches
+    
+    @staticmethod
+    def _has_errors(analysis):
+        return 'ERROR' in (analysis.get('sentiment_label'), analysis.get('primary_emotion'))
+    
+    def analyze_all_reviews(self, df, workers=None, use_service=None):
+        """
+        Analyze all reviews in the dataframe.
+        Cache misses go to a running analysis service when one matches
+        this analyzer's settings, otherwise they are analyzed in-process
+        (in a process pool when workers > 1).
+        """
         print("Analyzing reviews with Transformers...")
-        print("This will take a few minutes...\n")
+        print(f"Batch size: {self.bucket_size} (length-bucketed)")
+        if self.tuning:
+            from autotune import describe
+            print(f"Autotuned for this machine: {describe(self.tuning)}")
+        print()
         
-        results = []
-        for idx, row in tqdm(df.iterrows(), total=len(df)):
-            analysis = self.analyze_review(row['text'])
-            if analysis:
-                results.append(analysis)
-            else:
-                results.append({})
+        reused_before = telemetry.counters['dedup_reused']
+        with tqdm(total=len(df)) as progress:
+            df = self.analyze_dataframe(df, workers, use_service, progress)
         
-        # Create new columns for analysis results
-        for key in results[0].keys():
-            if key not in ['categories', 'category_scores', 'all_emotions', 
-                          'positive_keywords', 'negative_keywords']:
-                df[key] = [r.get(key) for r in results]
+        if self.cache is not None:
+            stats = self.cache.stats()
+            print(f"\nAnalysis cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['entries']} entries, {stats['size_mb']:.1f} MB)")
+        if self.dedup is not None:
+            reused = telemetry.counters['dedup_reused'] - reused_before
+            print(f"Near-duplicates: {reused} reviews reused the analysis of a similar review")
+        
+        return df
+    
+    def analyze_dataframe(self, df, workers=None, use_service=None, progress=None):
+        """Add analysis columns to `df` without printing (used per chunk when streaming)"""
+        workers = workers or Config.ANALYSIS_WORKERS
+        if use_service is None:
+            use_service = Config.ANALYSIS_SERVICE_ENABLED
+        
+        review_keys = None
+        if self.dedup is not None and {'time', 'author_name'} <= set(df.columns):
+            from review_store import review_ids
+            review_keys = review_ids(df).tolist()
+        analyses, matches = self._analyze_deduplicated(df['text'].tolist(), workers, use_service, progress,
+                                                       review_keys)
+        results = [analysis or {} for analysis in analyses]
+        # Vectors go to the embedding store, not into the DataFrame
+        embeddings = [result.pop('embedding', None) for result in results]
+        
+        # Column order follows the first successfully analyzed review
+        keys = next((list(r.keys()) for r in results if r), [])
+        
+        # Create new columns for analysis results. Nested results stay
+        # native lists/dicts; the CSV export writes them as str(...)
+        for key in keys:
+            if key in ['categories', 'positive_keywords', 'negative_keywords']:
+                df[key] = [r.get(key, []) for r in results]
+            elif key in ['category_scores', 'all_emotions']:
+                df[key] = [r.get(key, {}) for r in results]
             else:
-                df[key] = [str(r.get(key, {})) for r in results]
+                df[key] = [r.get(key) for r in results]
+        
+        if self.dedup is not None:
+            # Every analyzed review is in a cluster; similarity is only set
+            # for near-duplicates, whose analysis was reused
+            df['duplicate_cluster'] = [match['cluster_id'] if match else None for match in matches]
+            df['duplicate_similarity'] = [match['similarity'] if match else None for match in matches]
+        
+        if 'embedding' in self.stages:
+            self._store_embeddings(df, embeddings)
         
         return df
+    
+    def _store_embeddings(self, df, embeddings):
+        """Append the reviews' vectors to the embedding store, keyed by review id"""
+        from review_store import review_ids
+        from embedding_store import text_key
+        rows = [i for i, vector in enumerate(embeddings) if vector is not None]
+        if not rows:
+            return
+        subset = df.iloc[rows].copy()
+        if 'time' in subset.columns and 'author_name' in subset.columns:
+            subset['review_id'] = review_ids(subset)
+        else:
+            subset['review_id'] = subset['text'].map(text_key)
+        store = self.embedding_store
+        store.add(subset, [embeddings[i] for i in rows], model=Config.EMBEDDING_MODEL)
+        if store.needs_reindex():
+            print(f"Rebuilding the similarity index ({len(store)} reviews)...")
+            store.build_index()
@@ -0,0 +1,325 @@
+import os
+import re
+import json
+import time
+import platform
+import argparse
+import multiprocessing
+from datetime import datetime
+import torch
+from config import Config
+
+# Candidate settings; thread counts are powers of two up to the core count
+BATCH_SIZES = [1, 4, 8, 16, 32, 64]
+TOKEN_BUDGETS = [None, 8192, 4096, 2048]
+# Zero-shot batches count (review, hypothesis) pairs
+PAIR_BATCH_SIZES = [8, 16, 32, 64, 128]
+ROLES = ['sentiment', 'emotion', 'categories']
+
+
+def _cpu_model():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def hardware_signature():
+    """What a tuning result depends on: CPU model, cores, accelerator and torch"""
+    return {
+        'cpu': _cpu_model(),
+        'cores': os.cpu_count(),
+        'device': torch.cuda.get_device_name(0) if torch.cuda.is_available() else 'cpu',
+        'torch': torch.__version__.split('+')[0]
+    }
+
+
+def profile_path(signature=None):
+    """One profile per kind of machine, so every runner of a type shares it"""
+    signature = signature or hardware_signature()
+    name = f"{signature['cpu']}-{signature['cores']}c-{signature['device']}-torch{signature['torch']}"
+    return os.path.join(Config.AUTOTUNE_DIR, re.sub(r'[^A-Za-z0-9.]+', '-', name).strip('-').lower() + '.json')
+
+
+def _configured(role):
+    """Model name and, for categories, the category engine a tuning entry must match"""
+    from analyze_reviews import TransformerAnalyzer
+    model = getattr(Config, TransformerAnalyzer.PIPELINES[role][1])
+    engine = Config.CATEGORY_ENGINE if role == 'categories' else None
+    return model, engine
+
+
+def default_roles():
+    """
+    Models on the analysis hot path: the zero-shot model only with the
+    'fast' or 'pipeline' engine ('distilled' sends just the reviews it is
+    unsure about to zero-shot)
+    """
+    return [role for role in ROLES if role != 'categories' or Config.CATEGORY_ENGINE in ('fast', 'pipeline')]
+
+
+def load_profile(backend=None):
+    """
+    This machine's tuned settings, limited to the configured models and
+    backend: {'interop_threads', 'path', 'models': {role: settings}}, or
+    None when there is no profile.
+    """
+    path = profile_path()
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        profile = json.load(f)
+    backend = backend or Config.INFERENCE_BACKEND
+    models = {}
+    for role, entry in profile['models'].items():
+        model, engine = _configured(role)
+        if entry['model'] == model and entry['backend'] == backend and entry.get('engine') == engine:
+            models[role] = entry
+    if not models:
+        return None
+    return {'interop_threads': profile.get('interop_threads'), 'path': path, 'models': models}
+
+
+def _thread_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    return counts + ([cores] if counts[-1] != cores else [])
+
+
+def _sample_texts(limit):
+    """Normalized reviews from the history (or the raw CSV) for timing"""
+    import pandas as pd
+    from review_store import ReviewStore
+    from analyze_reviews import ReviewPreprocessor
+
+    store = ReviewStore()
+    if store.exists():
+        texts = store.read(columns=['text'])['text']
+    else:
+        texts = pd.read_csv(Config.RAW_REVIEWS_FILE)['text']
+    texts = [ReviewPreprocessor.normalize(t) for t in texts.dropna() if len(t.strip()) >= 10]
+    if len(texts) > limit:
+        texts = pd.Series(texts).sample(limit, random_state=0).tolist()
+    return texts
+
+
+def _timed(batches, run):
+    """Throughput and per-batch latency of run(batch) over the batches, after one warm-up batch"""
+    run(batches[0])
+    latencies = []
+    start = time.perf_counter()
+    for batch in batches:
+        batch_start = time.perf_counter()
+        run(batch)
+        latencies.append(time.perf_counter() - batch_start)
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'reviews_per_sec': round(sum(len(batch) for batch in batches) / seconds, 2),
+        'p50_batch_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'p95_batch_ms': round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000, 1)
+    }
+
+
+def _runner(analyzer, role, texts):
+    """trial(settings) -> measurements for one model on the sample"""
+    from analyze_reviews import torch_threads
+    from category_engine import FastCategoryClassifier
+
+    if role in ('sentiment', 'emotion'):
+        classifier = analyzer._load_pipeline(role)
+        # Buckets of similar length, as analyze_batch forms them
+        encoded = sorted(analyzer.preprocessor.encode(texts, [role])[role], key=len)
+
+        def trial(settings):
+            batches = [encoded[i:i + settings['batch_size']] for i in range(0, len(encoded), settings['batch_size'])]
+            with torch_threads(settings['threads']):
+                return _timed(batches, lambda batch: analyzer._classify_encoded(
+                    classifier, batch, max_batch_tokens=settings['max_batch_tokens']))
+        return trial
+
+    pipeline = analyzer.category_classifier
+    if Config.CATEGORY_ENGINE == 'fast':
+        premises = sorted(analyzer.preprocessor.encode(texts, ['categories'])['categories'], key=len)
+
+        def trial(settings):
+            fast = FastCategoryClassifier(pipeline.model, pipeline.tokenizer, batch_size=settings['batch_size'])
+            batches = [premises[i:i + Config.BATCH_SIZE] for i in range(0, len(premises), Config.BATCH_SIZE)]
+            with torch_threads(settings['threads']):
+                return _timed(batches, fast.score_encoded)
+        return trial
+
+    def trial(settings):
+        batches = [texts[i:i + Config.BATCH_SIZE] for i in range(0, len(texts), Config.BATCH_SIZE)]
+        with torch_threads(settings['threads']):
+            return _timed(batches, lambda batch: pipeline(batch, Config.CATEGORIES, multi_label=True,
+                                                         batch_size=settings['batch_size']))
+    return trial
+
+
+def _best(results, max_latency_ms):
+    allowed = [r for r in results if not max_latency_ms or r['p95_batch_ms'] <= max_latency_ms] or results
+    return max(allowed, key=lambda r: r['reviews_per_sec'])
+
+
+def tune_model(analyzer, role, texts, max_latency_ms=None):
+    """
+    Coordinate sweep for one model: threads, then batch size, then the
+    padded-token budget per forward pass. Returns (best, all trials).
+    """
+    trial = _runner(analyzer, role, texts)
+    settings = {'threads': torch.get_num_threads(),
+                'batch_size': Config.BATCH_SIZE if role != 'categories' else Config.CATEGORY_PAIR_BATCH_SIZE,
+                'max_batch_tokens': None}
+    sweeps = [('threads', _thread_counts()),
+              ('batch_size', BATCH_SIZES if role != 'categories' else PAIR_BATCH_SIZES)]
+    if role != 'categories':
+        sweeps.append(('max_batch_tokens', TOKEN_BUDGETS))
+
+    trials = []
+    for name, candidates in sweeps:
+        results = []
+        for value in candidates:
+            candidate = dict(settings, **{name: value})
+            result = dict(candidate, **trial(candidate))
+            results.append(result)
+            print(f"  {role:<10} threads={result['threads']:<3} batch={result['batch_size']:<4} "
+                  f"tokens={result['max_batch_tokens'] or '-':<5} {result['reviews_per_sec']:>8.1f} reviews/s "
+                  f"p95 {result['p95_batch_ms']:.0f} ms")
+        trials.extend(results)
+        best = _best(results, max_latency_ms)
+        settings = {key: best[key] for key in settings}
+    return _best(trials, max_latency_ms), trials
+
+
+def _sweep(config_values, roles, texts, interop, backend, max_latency_ms):
+    """Run every model's sweep in this (fresh) process with `interop` inter-op threads"""
+    for name, value in config_values.items():
+        setattr(Config, name, value)
+    # Inter-op threads can only be set before any parallel work
+    torch.set_num_interop_threads(interop)
+    Config.AUTOTUNE_ENABLED = False
+
+    from analyze_reviews import TransformerAnalyzer
+    analyzer = TransformerAnalyzer(use_cache=False, use_dedup=False, stages=['sentiment', 'emotion', 'categories'],
+                                   backend=backend)
+    print(f"\nInter-op threads: {interop}")
+    tuned = {}
+    for role in roles:
+        # Zero-shot scores every category per review, so it gets fewer reviews
+        sample = texts if role != 'categories' else texts[:max(8, len(texts) // 4)]
+        best, _ = tune_model(analyzer, role, sample, max_latency_ms)
+        model, engine = _configured(role)
+        tuned[role] = dict(best, model=model, backend=backend, engine=engine, sample=len(sample))
+    return tuned
+
+
+def autotune(roles=None, limit=128, interop_candidates=(1, 2), max_latency_ms=None, backend=None):
+    """Sweep each model on this machine and save the profile; returns its path"""
+    roles = roles or default_roles()
+    if 'categories' in roles and Config.CATEGORY_ENGINE not in ('fast', 'pipeline'):
+        print(f"⚠ CATEGORY_ENGINE={Config.CATEGORY_ENGINE}: tuning the zero-shot pipeline it falls back "
+              f"to for uncertain reviews only")
+    backend = backend or Config.INFERENCE_BACKEND
+    texts = _sample_texts(limit)
+    if not texts:
+        raise ValueError("No reviews to tune on (fetch or import reviews first)")
+    print(f"Autotuning {', '.join(roles)} on {len(texts)} reviews ({backend} backend, {_cpu_model()}, "
+          f"{os.cpu_count()} cores)")
+
+    # Every inter-op setting needs a fresh torch runtime
+    config_values = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    context = multiprocessing.get_context('spawn')
+    candidates = {}
+    for interop in interop_candidates:
+        with context.Pool(1) as pool:
+            candidates[interop] = pool.apply(_sweep, (config_values, roles, texts, interop, backend,
+                                                      max_latency_ms))
+
+    # The inter-op setting is process-wide: pick the one with the lowest
+    # total time per review across the models
+    def seconds_per_review(tuned):
+        return sum(1 / entry['reviews_per_sec'] for entry in tuned.values())
+    interop = min(candidates, key=lambda n: seconds_per_review(candidates[n]))
+
+    path = profile_path()
+    profile = {'host': hardware_signature(), 'created_at': datetime.now().isoformat(timespec='seconds'),
+               'interop_threads': interop, 'models': {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            # Keep the models that were not tuned this time
+            profile['models'] = {key: entry for key, entry in json.load(f)['models'].items()
+                                 if key not in roles}
+    profile['models'].update(candidates[interop])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def describe(profile):
+    """
+    One line per profile. Tuned threads above this process's torch thread
+    count (e.g. in --workers processes) are capped when applied, and say so.
+    """
+    available = torch.get_num_threads()
+    parts = []
+    for role, entry in profile['models'].items():
+        name = f"{role} ({entry['engine']} fallback)" if entry.get('engine') == 'distilled' else role
+        tokens = f" / {entry['max_batch_tokens']} tokens" if entry.get('max_batch_tokens') else ''
+        capped = f" (capped to {available} here)" if entry['threads'] > available else ''
+        parts.append(f"{name} batch {entry['batch_size']}{tokens} x {entry['threads']} threads{capped}")
+    return '; '.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune batch sizes and torch threads for this machine')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Sweep the models and save the profile')
+    run_parser.add_argument('--limit', type=int, default=128, help='Reviews to time per model')
+    run_parser.add_argument('--roles', type=lambda value: [r.strip() for r in value.split(',') if r.strip()],
+                            help=f"Comma-separated models to tune (default: {','.join(ROLES)}; "
+                                 f"categories only with CATEGORY_ENGINE=fast or pipeline)")
+    run_parser.add_argument('--interop', type=lambda value: [int(n) for n in value.split(',')], default=[1, 2],
+                            help='Inter-op thread counts to try (default: 1,2)')
+    run_parser.add_argument('--max-latency-ms', type=float,
+                            help='Only pick settings whose p95 batch latency stays below this')
+    run_parser.add_argument('--if-missing', action='store_true',
+                            help='Skip when this machine already has a profile for the configured models')
+    subparsers.add_parser('show', help="Show this machine's profile")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        existing = load_profile()
+        if args.if_missing and existing and set(args.roles or default_roles()) <= set(existing['models']):
+            print(f"⏭ {existing['path']} already tunes the configured models")
+            return
+        try:
+            path = autotune(args.roles, args.limit, args.interop, args.max_latency_ms)
+        except ValueError as e:
+            print(f"⚠ {e}")
+            return
+        profile = load_profile()
+        print(f"\n✓ Profile saved to {path}: {describe(profile)}, "
+              f"{profile['interop_threads']} inter-op thread(s)")
+    else:
+        profile = load_profile()
+        if profile is None:
+            print(f"No profile for this machine ({profile_path()}); run: python autotune.py run")
+            return
+        print(f"{profile['path']}\n{describe(profile)}, {profile['interop_threads']} inter-op thread(s)")
+        for role, entry in profile['models'].items():
+            print(f"  {role:<10} {entry['reviews_per_sec']:.1f} reviews/s, p95 batch {entry['p95_batch_ms']:.0f} ms "
+                  f"({entry['model']})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+from datetime import datetime, timedelta
+import pandas as pd
+from config import Config
+
+# Stage name in the results -> analysis stage run on its own
+ANALYSIS_STAGES = {
+    'analyze_sentiment': 'sentiment',
+    'analyze_emotion': 'emotion',
+    'classify_categories': 'categories',
+    'extract_key_phrases': 'keywords'
+}
+
+FILLER = ("the a was is and very really quite store staff service price wait parking product "
+          "order line visit today again time place people manager counter shelf").split()
+
+EMOTIONS = ['anger', 'disgust', 'fear', 'joy', 'neutral', 'sadness', 'surprise']
+
+
+def _lexicon_words():
+    from keywords import load_lexicon
+    return (load_lexicon(Config.POSITIVE_LEXICON_FILE), load_lexicon(Config.NEGATIVE_LEXICON_FILE))
+
+
+def make_corpus(n, seed=0):
+    """Synthetic reviews with the raw_reviews.csv columns; ratings follow the review's tone"""
+    rng = random.Random(seed)
+    positive, negative = _lexicon_words()
+    now = datetime.now()
+    rows = []
+    for i in range(n):
+        rating = rng.choice([1, 2, 3, 4, 5, 5, 4])
+        tone = positive if rating >= 4 else negative if rating <= 2 else positive + negative
+        length = rng.choice([8, 15, 25, 40, 60, 120])
+        words = [rng.choice(tone) if rng.random() < 0.2 else rng.choice(FILLER) for _ in range(length)]
+        place = rng.randrange(3)
+        rows.append({
+            'place_id': f"synthetic-place-{place}",
+            'place_name': f"Synthetic Store {place}",
+            'author_name': f"Reviewer {i}",
+            'rating': rating,
+            'text': ' '.join(words).capitalize() + '.',
+            'time': now - timedelta(days=rng.randrange(365), minutes=rng.randrange(1440)),
+            'relative_time': 'a month ago',
+            'language': 'en',
+            'profile_photo_url': None,
+            'fetched_at': now - timedelta(days=rng.randrange(30))
+        })
+    return pd.DataFrame(rows)
+
+
+def build_tiny_models(path, seed=0):
+    """
+    Small randomly initialized models with the same architectures and
+    tokenizer classes as the configured ones, built from configs so no
+    download is needed. Returns {role: model directory}.
+    """
+    from tokenizers import ByteLevelBPETokenizer, BertWordPieceTokenizer
+    from transformers import (
+        DistilBertTokenizerFast, RobertaTokenizerFast, BartTokenizerFast,
+        DistilBertConfig, RobertaConfig, BartConfig,
+        DistilBertForSequenceClassification, RobertaForSequenceClassification,
+        BartForSequenceClassification
+    )
+    import torch
+
+    dirs = {role: os.path.join(path, role) for role in ('sentiment', 'emotion', 'zeroshot')}
+    if all(os.path.exists(os.path.join(d, 'config.json')) for d in dirs.values()):
+        return dirs
+
+    print(f"Building tiny benchmark models in {path}...")
+    torch.manual_seed(seed)
+    rng = random.Random(seed)
+    positive, negative = _lexicon_words()
+    vocabulary = FILLER + positive + negative + [word for category in Config.CATEGORIES for word in category.split()]
+    corpus = [' '.join(rng.choice(vocabulary) for _ in range(30)) for _ in range(2000)]
+
+    vocab_dir = os.path.join(path, 'vocab')
+    os.makedirs(vocab_dir, exist_ok=True)
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(corpus, vocab_size=1000, special_tokens=['<s>', '<pad>', '</s>', '<unk>', '<mask>'])
+    bpe.save_model(vocab_dir)
+    wordpiece = BertWordPieceTokenizer(lowercase=True)
+    wordpiece.train_from_iterator(corpus, vocab_size=1000)
+    wordpiece.save_model(vocab_dir)
+
+    max_length = 512
+    bert_tokenizer = DistilBertTokenizerFast(os.path.join(vocab_dir, 'vocab.txt'), model_max_length=max_length)
+    bpe_files = (os.path.join(vocab_dir, 'vocab.json'), os.path.join(vocab_dir, 'merges.txt'))
+    roberta_tokenizer = RobertaTokenizerFast(*bpe_files, model_max_length=max_length)
+    bart_tokenizer = BartTokenizerFast(*bpe_files, model_max_length=max_length)
+
+    def labels(names):
+        return {'id2label': dict(enumerate(names)), 'label2id': {name: i for i, name in enumerate(names)}}
+
+    models = {
+        'sentiment': (DistilBertForSequenceClassification(DistilBertConfig(
+            vocab_size=len(bert_tokenizer), dim=64, hidden_dim=128, n_layers=2, n_heads=2,
+            max_position_embeddings=max_length, **labels(['NEGATIVE', 'POSITIVE']))), bert_tokenizer),
+        'emotion': (RobertaForSequenceClassification(RobertaConfig(
+            vocab_size=len(roberta_tokenizer), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+            num_attention_heads=2, max_position_embeddings=max_length + 2, pad_token_id=1,
+            **labels(EMOTIONS))), roberta_tokenizer),
+        'zeroshot': (BartForSequenceClassification(BartConfig(
+            vocab_size=len(bart_tokenizer), d_model=64, encoder_layers=1, decoder_layers=1,
+            encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=128, decoder_ffn_dim=128,
+            max_position_embeddings=max_length, pad_token_id=1, bos_token_id=0, eos_token_id=2,
+            **labels(['contradiction', 'neutral', 'entailment']))), bart_tokenizer)
+    }
+    for role, (model, tokenizer) in models.items():
+        model.save_pretrained(dirs[role])
+        tokenizer.save_pretrained(dirs[role])
+    return dirs
+
+
+def _timed(function):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function()
+    return result, time.perf_counter() - start
+
+
+def _stage_result(seconds, reviews):
+    return {'seconds': round(seconds, 4), 'reviews_per_sec': round(reviews / seconds, 1) if seconds else None}
+
+
+def benchmark_size(n, seed=0):
+    """Time every stage on a synthetic corpus of n reviews; returns {stage: timing}"""
+    from analyze_reviews import TransformerAnalyzer
+    from review_store import ReviewStore
+    from aggregates import AggregateStore
+    from visualize_results import ResultsVisualizer
+    from generate_weekly_report import generate_weekly_report
+
+    df = make_corpus(n, seed)
+    texts = df['text'].tolist()
+    timings = {}
+    analyses = [{} for _ in texts]
+
+    for name, stage in ANALYSIS_STAGES.items():
+        analyzer, _ = _timed(lambda: TransformerAnalyzer(use_cache=False, use_dedup=False, stages=[stage]))
+        _, load_seconds = _timed(analyzer.load_models)
+        # Warm up so first-call overheads are not timed
+        _timed(lambda: analyzer.analyze_batch(texts[:Config.BATCH_SIZE]))
+        results, seconds = _timed(lambda: analyzer.analyze_batch(texts))
+        timings[name] = dict(_stage_result(seconds, n), load_seconds=round(load_seconds, 4))
+        for analysis, result in zip(analyses, results):
+            analysis.update(result or {})
+
+    # Reports read the persisted history, as in main.py --visualize
+    for key in next((list(a.keys()) for a in analyses if a), []):
+        df[key] = [analysis.get(key) for analysis in analyses]
+    store = ReviewStore()
+    aggregates = AggregateStore()
+    _, seconds = _timed(lambda: (store.write(df), aggregates.update(df)))
+    timings['persist'] = _stage_result(seconds, n)
+
+    Config.setup_directories()
+    columns = ['rating', 'sentiment_label', 'sentiment_score', 'time']
+    if n <= Config.DASHBOARD_MAX_POINTS:
+        columns.append('text')
+    visualizer = ResultsVisualizer(store.read(columns=columns), aggregates)
+    for name, function in [('create_dashboard', visualizer.create_dashboard),
+                           ('generate_summary_report', visualizer.generate_summary_report),
+                           ('generate_weekly_report', generate_weekly_report)]:
+        _, seconds = _timed(function)
+        timings[name] = _stage_result(seconds, n)
+    return timings
+
+
+def run_benchmarks(sizes, seed=0, models_dir=None):
+    """
+    Run the benchmark at each corpus size with tiny local models.
+    Every size runs in a fresh temporary working directory, so the
+    store, caches and reports start empty and nothing in data/ changes.
+    """
+    models_dir = os.path.abspath(models_dir or os.path.join(Config.BENCHMARK_DIR, 'models'))
+    models = build_tiny_models(models_dir, seed)
+    Config.SENTIMENT_MODEL = models['sentiment']
+    Config.EMOTION_MODEL = models['emotion']
+    Config.ZERO_SHOT_MODEL = models['zeroshot']
+
+    import torch
+    results = {
+        'created_at': datetime.now().isoformat(),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'cpu_count': os.cpu_count(),
+            'torch_threads': torch.get_num_threads()
+        },
+        'settings': {
+            'batch_size': Config.BATCH_SIZE,
+            'backend': Config.INFERENCE_BACKEND,
+            'category_engine': Config.CATEGORY_ENGINE,
+            'seed': seed
+        },
+        'sizes': {}
+    }
+
+    cwd = os.getcwd()
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                print(f"Benchmarking {n} reviews...")
+                results['sizes'][str(n)] = benchmark_size(n, seed)
+            finally:
+                os.chdir(cwd)
+        for stage, timing in results['sizes'][str(n)].items():
+            print(f"  {stage:<26} {timing['seconds']:>9.3f}s  {timing['reviews_per_sec'] or 0:>10.1f} reviews/sec")
+    return results
+
+
+def compare(base, new, threshold=0.10):
+    """
+    Stage timings of two runs. A stage regresses when it is more than
+    `threshold` (a fraction) slower in `new`. Returns (rows, regressions).
+    """
+    rows, regressions = [], []
+    for size, stages in new['sizes'].items():
+        for stage, timing in stages.items():
+            before = base['sizes'].get(size, {}).get(stage)
+            if not before or not before['seconds']:
+                continue
+            change = timing['seconds'] / before['seconds'] - 1
+            row = (size, stage, before['seconds'], timing['seconds'], change)
+            rows.append(row)
+            if change > threshold:
+                regressions.append(row)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline throughput benchmark on a synthetic corpus')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run the benchmark and write JSON results')
+    run_parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma-separated corpus sizes (default: 1000,10000,100000)')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--output', help='Results file (default: benchmarks/results-<timestamp>.json)')
+
+    compare_parser = subparsers.add_parser('compare', help='Flag stage regressions between two runs')
+    compare_parser.add_argument('base', help='Baseline results JSON')
+    compare_parser.add_argument('new', help='New results JSON')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='Slowdown fraction counted as a regression (default: 0.10)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+        output = args.output or os.path.join(Config.BENCHMARK_DIR, f"results-{datetime.now():%Y%m%d-%H%M%S}.json")
+        output = os.path.abspath(output)
+        results = run_benchmarks(sizes, args.seed)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Benchmark results saved to {output}")
+        return
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows, regressions = compare(base, new, args.threshold)
+
+    print(f"{'size':>8}  {'stage':<26} {'base':>9} {'new':>9} {'change':>8}")
+    for size, stage, before, after, change in rows:
+        flag = '  ⚠ regression' if change > args.threshold else ''
+        print(f"{size:>8}  {stage:<26} {before:>8.3f}s {after:>8.3f}s {change:>+7.1%}{flag}")
+    if regressions:
+        print(f"\n⚠ {len(regressions)} stage(s) slower by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\n✓ No regressions above {args.threshold:.0%}")
+
+if __name__ == "__main__":
+    main()
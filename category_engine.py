@@ -0,0 +1,336 @@
+import os
+import sqlite3
+import hashlib
+import argparse
+import torch
+import pandas as pd
+from config import Config
+
+def category_engine_fingerprint(stages=None):
+    """Identifies the configured category engine (and distilled artifact), for caching results"""
+    stages = stages or Config.ANALYSIS_STAGES
+    if Config.CATEGORY_ENGINE != 'distilled' or 'categories' not in stages:
+        return Config.CATEGORY_ENGINE
+    from distill_categories import distilled_fingerprint
+    return f"distilled:{distilled_fingerprint()}"
+
+
+class FastCategoryClassifier:
+    """
+    Batched zero-shot category classification.
+    Scores every (review, hypothesis) pair directly with the NLI model
+    instead of going through the zero-shot pipeline one review at a time.
+    Hypotheses are tokenized once and reused for every review, pairs from
+    many reviews share a batch, and an optional cheap first pass on
+    truncated reviews prunes hypotheses before full-length scoring.
+    Scores use the same entailment-vs-contradiction softmax as the
+    pipeline with multi_label=True.
+    """
+
+    def __init__(self, model, tokenizer, categories=None, batch_size=None,
+                 prune_top_k=None, prune_max_tokens=None):
+        self.model = model.eval()
+        self.tokenizer = tokenizer
+        self.categories = list(categories or Config.CATEGORIES)
+        self.batch_size = batch_size or Config.CATEGORY_PAIR_BATCH_SIZE
+        self.prune_top_k = Config.CATEGORY_PRUNE_TOP_K if prune_top_k is None else prune_top_k
+        self.prune_max_tokens = prune_max_tokens or Config.CATEGORY_PRUNE_MAX_TOKENS
+        self.device = next(model.parameters()).device
+
+        label2id = {label.lower(): idx for label, idx in model.config.label2id.items()}
+        self.entailment_id = next(
+            (idx for label, idx in label2id.items() if label.startswith('entail')), -1
+        )
+        self.contradiction_id = next(
+            (idx for label, idx in label2id.items() if label.startswith('contra')), 0
+        )
+
+        self.max_length = min(tokenizer.model_max_length,
+                              getattr(model.config, 'max_position_embeddings', tokenizer.model_max_length))
+        self.pair_overhead = tokenizer.num_special_tokens_to_add(pair=True)
+
+        # Hypothesis side is identical for every review, so encode it once
+        self.hypothesis_ids = [
+            tokenizer.encode(Config.CATEGORY_HYPOTHESIS_TEMPLATE.format(category),
+                             add_special_tokens=False)
+            for category in self.categories
+        ]
+
+    def _encode_premises(self, texts):
+        return self.tokenizer(list(texts), add_special_tokens=False)['input_ids']
+
+    def _build_pair(self, premise_ids, hypothesis_ids, max_premise_tokens=None):
+        limit = self.max_length - self.pair_overhead - len(hypothesis_ids)
+        if max_premise_tokens is not None:
+            limit = min(limit, max_premise_tokens)
+        return self.tokenizer.build_inputs_with_special_tokens(
+            premise_ids[:max(limit, 1)], hypothesis_ids
+        )
+
+    def _pad(self, sequences):
+        """Right-pad a batch of encoded pairs to its longest member"""
+        width = max(len(ids) for ids in sequences)
+        input_ids = torch.full((len(sequences), width), self.tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), width), dtype=torch.long)
+        for row, ids in enumerate(sequences):
+            input_ids[row, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[row, :len(ids)] = 1
+        return {
+            'input_ids': input_ids.to(self.device),
+            'attention_mask': attention_mask.to(self.device)
+        }
+
+    @torch.no_grad()
+    def _score_pairs(self, pairs):
+        """Entailment probability for each encoded pair, batched by length"""
+        scores = [0.0] * len(pairs)
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i]))
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            logits = self.model(**self._pad([pairs[i] for i in batch])).logits
+            entail_contr = logits[:, [self.contradiction_id, self.entailment_id]]
+            probs = entail_contr.softmax(dim=-1)[:, 1].tolist()
+            for i, prob in zip(batch, probs):
+                scores[i] = prob
+
+        return scores
+
+    def score_batch(self, texts):
+        """Return one {category: score} dict per review"""
+        return self.score_encoded(self._encode_premises(texts))
+
+    def score_encoded(self, premises, categories=None):
+        """
+        Same as score_batch for reviews already tokenized with this
+        model's tokenizer (token ids without special tokens), optionally
+        for a subset of the categories
+        """
+        categories = list(categories or self.categories)
+        hypothesis_ids = [self.hypothesis_ids[self.categories.index(category)] for category in categories]
+        n_categories = len(categories)
+
+        prune = 0 < self.prune_top_k < n_categories
+        first_pass_limit = self.prune_max_tokens if prune else None
+
+        pairs = [
+            self._build_pair(premise, hypothesis, first_pass_limit)
+            for premise in premises
+            for hypothesis in hypothesis_ids
+        ]
+        flat_scores = self._score_pairs(pairs)
+        scores = [
+            dict(zip(categories, flat_scores[i * n_categories:(i + 1) * n_categories]))
+            for i in range(len(premises))
+        ]
+
+        if prune:
+            # Rescore only the most promising hypotheses at full length,
+            # and only for reviews the first pass actually truncated
+            rescore = []
+            for i, premise in enumerate(premises):
+                if len(premise) <= self.prune_max_tokens:
+                    continue
+                top = sorted(categories, key=scores[i].get, reverse=True)[:self.prune_top_k]
+                rescore.extend((i, category) for category in top)
+
+            full_pairs = [
+                self._build_pair(premises[i], hypothesis_ids[categories.index(category)])
+                for i, category in rescore
+            ]
+            for (i, category), score in zip(rescore, self._score_pairs(full_pairs)):
+                scores[i][category] = score
+
+        return scores
+
+    def classify_batch(self, texts):
+        """Same output shape as TransformerAnalyzer.classify_categories"""
+        return self.classify_encoded(self._encode_premises(texts))
+
+    def classify_encoded(self, premises):
+        return [format_category_scores(category_scores) for category_scores in self.score_encoded(premises)]
+
+
+def format_category_scores(category_scores):
+    """Categories scoring above 0.5 (top 3) and the three best scores, from {category: score}"""
+    ranked = sorted(category_scores.items(), key=lambda item: item[1], reverse=True)
+    return {
+        'categories': [label for label, score in ranked if score > 0.5][:3],
+        'category_scores': dict(ranked[:3]),
+        'category_source': 'zero-shot'
+    }
+
+
+def score_model_key(backend=None):
+    """Identifies what produced zero-shot scores: model, backend and engine (with its pruning)"""
+    engine = 'pipeline'
+    if Config.CATEGORY_ENGINE == 'fast':
+        engine = 'fast'
+        if Config.CATEGORY_PRUNE_TOP_K:
+            engine += f":prune{Config.CATEGORY_PRUNE_TOP_K}x{Config.CATEGORY_PRUNE_MAX_TOKENS}"
+    return f"{Config.ZERO_SHOT_MODEL}|{backend or Config.INFERENCE_BACKEND}|{engine}"
+
+
+class CategoryScoreCache:
+    """
+    Zero-shot entailment scores per (review, hypothesis, model).
+    With multi_label=True every (review, hypothesis) pair is scored on its
+    own, so scores stay valid when other categories are added, renamed or
+    removed; only pairs with new hypothesis texts need inference.
+    """
+
+    def __init__(self, path=None, model_key=None):
+        self.path = path or Config.CATEGORY_SCORE_CACHE_FILE
+        self.model_key = model_key or score_model_key()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS scores (
+                review TEXT NOT NULL,
+                hypothesis TEXT NOT NULL,
+                model TEXT NOT NULL,
+                score REAL NOT NULL,
+                PRIMARY KEY (review, hypothesis, model)
+            ) WITHOUT ROWID"""
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def review_key(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+    def get_many(self, review_keys):
+        """{(review key, hypothesis): score} for the cached pairs of these reviews"""
+        found = {}
+        review_keys = list(dict.fromkeys(review_keys))
+        for start in range(0, len(review_keys), 500):
+            chunk = review_keys[start:start + 500]
+            for review, hypothesis, score in self.conn.execute(
+                f"SELECT review, hypothesis, score FROM scores "
+                f"WHERE model = ? AND review IN ({','.join('?' * len(chunk))})", [self.model_key] + chunk
+            ):
+                found[(review, hypothesis)] = score
+        return found
+
+    def put_many(self, rows):
+        """Store (review key, hypothesis, score) triples"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO scores (review, hypothesis, model, score) VALUES (?, ?, ?, ?)",
+                [(review, hypothesis, self.model_key, score) for review, hypothesis, score in rows]
+            )
+
+    def stats(self):
+        pairs, reviews = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT review) FROM scores WHERE model = ?", (self.model_key,)
+        ).fetchone()
+        return {'pairs': pairs, 'reviews': reviews}
+
+    def close(self):
+        self.conn.close()
+
+
+def backfill_categories(analyzer):
+    """
+    Recompute categories for the whole review history with the current
+    CATEGORIES, scoring only the (review, hypothesis) pairs that are not
+    cached yet. The Parquet store is rewritten file by file and the daily
+    aggregates are rebuilt. Returns the number of reviews relabeled.
+    """
+    from review_store import ReviewStore
+    from aggregates import AggregateStore
+    from analyze_reviews import ReviewPreprocessor
+
+    store = ReviewStore()
+    relabeled = 0
+
+    def relabel(df):
+        nonlocal relabeled
+        valid = [i for i, text in enumerate(df['text']) if isinstance(text, str) and len(text.strip()) >= 10]
+        results = analyzer.zero_shot_categories([ReviewPreprocessor.normalize(df['text'].iloc[i]) for i in valid])
+        for column in ('categories', 'category_scores', 'category_source'):
+            values = df[column].astype(object).tolist()
+            for i, result in zip(valid, results):
+                values[i] = result[column]
+            df[column] = values
+        relabeled += len(valid)
+        print(f"  {relabeled} reviews relabeled")
+        return df
+
+    store.rewrite(relabel)
+    AggregateStore().rebuild(store)
+    return relabeled
+
+
+def compare_engines(analyzer, texts):
+    """
+    Score the same reviews with the zero-shot pipeline and the fast engine
+    and report how far apart their category scores and labels are.
+    """
+    fast = FastCategoryClassifier(analyzer.category_classifier.model,
+                                  analyzer.category_classifier.tokenizer)
+    fast_scores = fast.score_batch(texts)
+
+    diffs = []
+    label_matches = 0
+    top1_matches = 0
+    for text, fast_result in zip(texts, fast_scores):
+        result = analyzer.category_classifier(text, Config.CATEGORIES, multi_label=True)
+        pipeline_result = dict(zip(result['labels'], result['scores']))
+        diffs.extend(abs(pipeline_result[c] - fast_result[c]) for c in Config.CATEGORIES)
+
+        pipeline_labels = {c for c, s in pipeline_result.items() if s > 0.5}
+        fast_labels = {c for c, s in fast_result.items() if s > 0.5}
+        label_matches += pipeline_labels == fast_labels
+        top1_matches += max(pipeline_result, key=pipeline_result.get) == max(fast_result, key=fast_result.get)
+
+    n = max(len(texts), 1)
+    return {
+        'reviews': len(texts),
+        'mean_abs_score_diff': sum(diffs) / max(len(diffs), 1),
+        'max_abs_score_diff': max(diffs, default=0.0),
+        'label_set_agreement': label_matches / n,
+        'top1_agreement': top1_matches / n
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare category engines')
+    parser.add_argument('--limit', type=int, default=50, help='Number of reviews to compare')
+    parser.add_argument('--backfill', action='store_true',
+                        help='Recompute categories for the stored history with the current CATEGORIES, '
+                             'reusing cached zero-shot scores')
+    args = parser.parse_args()
+
+    from analyze_reviews import TransformerAnalyzer
+
+    if args.backfill:
+        analyzer = TransformerAnalyzer(use_cache=True, use_dedup=False, stages=['categories'])
+        cache = analyzer.category_score_cache or CategoryScoreCache()
+        before = cache.stats()
+        relabeled = backfill_categories(analyzer)
+        after = cache.stats()
+        print(f"✓ {relabeled} reviews relabeled with {len(Config.CATEGORIES)} categories; "
+              f"{after['pairs'] - before['pairs']} new (review, category) pairs scored, "
+              f"{after['pairs']} cached")
+        return relabeled
+
+    df = pd.read_csv(Config.RAW_REVIEWS_FILE)
+    texts = [t for t in df['text'].dropna().tolist() if len(t.strip()) >= 10][:args.limit]
+
+    analyzer = TransformerAnalyzer(use_cache=False, use_dedup=False)
+    report = compare_engines(analyzer, texts)
+
+    print("=" * 60)
+    print("CATEGORY ENGINE COMPARISON (fast vs pipeline)")
+    print("=" * 60)
+    print(f"Reviews compared: {report['reviews']}")
+    print(f"Prune top-k: {Config.CATEGORY_PRUNE_TOP_K or 'off'}")
+    print(f"Mean |score diff|: {report['mean_abs_score_diff']:.4f}")
+    print(f"Max |score diff|: {report['max_abs_score_diff']:.4f}")
+    print(f"Category set agreement: {report['label_set_agreement']:.1%}")
+    print(f"Top-1 category agreement: {report['top1_agreement']:.1%}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -7,17 +7,164 @@ class Config:
     # API Configuration
     GOOGLE_API_KEY = os.getenv('GOOGLE_PLACES_API_KEY')
     PLACE_ID = os.getenv('PLACE_ID')
+    # Comma-separated list of places to track; falls back to PLACE_ID
+    PLACE_IDS = [
+        place_id.strip() for place_id in (os.getenv('PLACE_IDS') or PLACE_ID or '').split(',')
+        if place_id.strip()
+    ]
+    PLACES_API_URL = os.getenv('PLACES_API_URL', 'https://maps.googleapis.com/maps/api/place')
+    
+    # Fetcher: concurrent requests, per-request timeout (seconds), retries
+    # with exponential backoff, and a token-bucket limit (requests/second,
+    # 0 = unlimited)
+    FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', 4))
+    FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 10))
+    FETCH_MAX_RETRIES = int(os.getenv('FETCH_MAX_RETRIES', 3))
+    FETCH_BACKOFF_BASE = float(os.getenv('FETCH_BACKOFF_BASE', 0.5))
+    FETCH_RATE_LIMIT = float(os.getenv('FETCH_RATE_LIMIT', 5))
+    FETCH_BURST = int(os.getenv('FETCH_BURST', 5))
+    
+    # Places API Details (with reviews) price per request, in USD
+    PLACES_COST_PER_REQUEST = float(os.getenv('PLACES_COST_PER_REQUEST', 0.017))
+    # Adaptive fetch schedule: each place is fetched again once about
+    # SCHEDULE_TARGET_NEW_REVIEWS new reviews are expected from its observed
+    # velocity, within the min/max interval, and intervals stretch so the
+    # remaining budget lasts the remaining days. SCHEDULE_RUN_INTERVAL_HOURS
+    # is how often the workflow runs
+    FETCH_SCHEDULE_ENABLED = os.getenv('FETCH_SCHEDULE', '1') != '0'
+    SCHEDULE_TARGET_NEW_REVIEWS = float(os.getenv('SCHEDULE_TARGET_NEW_REVIEWS', 3))
+    SCHEDULE_MIN_INTERVAL_HOURS = float(os.getenv('SCHEDULE_MIN_INTERVAL_HOURS', 6))
+    SCHEDULE_MAX_INTERVAL_HOURS = float(os.getenv('SCHEDULE_MAX_INTERVAL_HOURS', 168))
+    SCHEDULE_RUN_INTERVAL_HOURS = float(os.getenv('SCHEDULE_RUN_INTERVAL_HOURS', 6))
     
     # File paths
     DATA_DIR = 'data'
     RAW_REVIEWS_FILE = os.path.join(DATA_DIR, 'raw_reviews.csv')
     ANALYZED_REVIEWS_FILE = os.path.join(DATA_DIR, 'analyzed_reviews.csv')
+    # Columnar history of analyzed reviews, partitioned by fetch date
+    REVIEW_STORE_DIR = os.path.join(DATA_DIR, 'reviews')
     VISUALIZATIONS_DIR = 'visualizations'
+    MODELS_DIR = 'models'
+    QUANTIZED_MODELS_DIR = os.path.join(MODELS_DIR, 'quantized')
+    # Local model bundles (model_bundle.py export): safetensors weights,
+    # tokenizers and a manifest per version, loaded offline with
+    # memory-mapped weights. MODEL_BUNDLE pins a bundle directory; by
+    # default the newest bundle holding the configured model is used
+    MODEL_BUNDLES_DIR = os.path.join(MODELS_DIR, 'bundles')
+    MODEL_BUNDLE = os.getenv('MODEL_BUNDLE', '')
+    MODEL_BUNDLE_ENABLED = os.getenv('MODEL_BUNDLES', '1') != '0'
+    CACHE_DIR = os.path.join(DATA_DIR, 'cache')
+    # API budget (api_usage.json), the append-only usage ledger with its
+    # running totals, and the adaptive fetch schedule
+    USAGE_DIR = 'usage_tracking'
+    USAGE_FILE = os.path.join(USAGE_DIR, 'api_usage.json')
+    USAGE_LEDGER_FILE = os.path.join(USAGE_DIR, 'api_ledger.jsonl')
+    USAGE_TOTALS_FILE = os.path.join(USAGE_DIR, 'api_ledger_totals.json')
+    FETCH_SCHEDULE_FILE = os.path.join(USAGE_DIR, 'fetch_schedule.json')
+    # Per-run performance telemetry, next to usage_tracking/api_usage.json;
+    # only the newest TELEMETRY_KEEP_RUNS run files are kept
+    TELEMETRY_DIR = os.path.join(USAGE_DIR, 'runs')
+    TELEMETRY_KEEP_RUNS = int(os.getenv('TELEMETRY_KEEP_RUNS', 120))
+    # Benchmark results and the tiny models they run on (benchmark.py)
+    BENCHMARK_DIR = 'benchmarks'
+    ANALYSIS_CACHE_FILE = os.path.join(CACHE_DIR, 'analysis_cache.sqlite')
+    # Change detection: review-set fingerprints per place, plus raw Places
+    # API responses reused for RESPONSE_CACHE_TTL seconds
+    FETCH_STATE_FILE = os.path.join(CACHE_DIR, 'fetch_state.json')
+    RESPONSE_CACHE_DIR = os.path.join(CACHE_DIR, 'places')
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 3600))
+    # Streaming mode (main.py --stream): reviews are analyzed and persisted
+    # in chunks of this size, with progress checkpointed after each chunk
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 1000))
+    STREAM_CHECKPOINT_FILE = os.path.join(CACHE_DIR, 'stream_checkpoint.json')
+    # Per-day review counts for reports and the dashboard, updated as
+    # reviews are analyzed (rebuilt from REVIEW_STORE_DIR when missing)
+    AGGREGATES_FILE = os.path.join(CACHE_DIR, 'aggregates.sqlite')
+    DEDUP_INDEX_FILE = os.path.join(CACHE_DIR, 'dedup_index.sqlite')
+    CATEGORY_SCORE_CACHE_FILE = os.path.join(CACHE_DIR, 'category_scores.sqlite')
+    # Versioned distilled category classifiers (distill_categories.py),
+    # kept with the caches so scheduled runs restore them
+    DISTILLED_MODELS_DIR = os.path.join(CACHE_DIR, 'distilled')
+    # Review embeddings for similarity search (embedding_store.py): one
+    # float32 vector per review in a memory-mapped file plus an IVF index
+    # that is rebuilt once EMBEDDING_REINDEX_ROWS reviews were added
+    EMBEDDING_STORE_DIR = os.path.join(DATA_DIR, 'embeddings')
+    EMBEDDING_NPROBE = int(os.getenv('EMBEDDING_NPROBE', 16))
+    EMBEDDING_REINDEX_ROWS = int(os.getenv('EMBEDDING_REINDEX_ROWS', 10000))
+    
+    # Watch mode (main.py --watch): poll every WATCH_INTERVAL seconds with
+    # models kept loaded and alert on new NEGATIVE reviews or reviews in
+    # WATCH_ALERT_CATEGORIES. Sinks (comma-separated): stdout, file
+    # (WATCH_ALERT_FILE), webhook (WATCH_WEBHOOK_URL) or module:Class
+    WATCH_INTERVAL = float(os.getenv('WATCH_INTERVAL', 300))
+    WATCH_ALERT_CATEGORIES = [
+        category.strip() for category in os.getenv('WATCH_ALERT_CATEGORIES', '').split(',')
+        if category.strip()
+    ]
+    WATCH_ALERT_SINKS = [
+        sink.strip() for sink in os.getenv('WATCH_ALERT_SINKS', 'stdout').split(',') if sink.strip()
+    ]
+    WATCH_ALERT_FILE = os.path.join(DATA_DIR, 'alerts.jsonl')
+    WATCH_WEBHOOK_URL = os.getenv('WATCH_WEBHOOK_URL', '')
     
     # Model configuration
     SENTIMENT_MODEL = 'distilbert-base-uncased-finetuned-sst-2-english'
     EMOTION_MODEL = 'j-hartmann/emotion-english-distilroberta-base'
     ZERO_SHOT_MODEL = 'facebook/bart-large-mnli'
+    # Sentence encoder for the optional 'embedding' stage
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+    
+    # Inference backend: 'fp32' runs the original models, 'int8' applies
+    # dynamic int8 quantization (CPU only, weights cached in models/quantized)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'fp32')
+    
+    # Batched inference: reviews are sorted by token length and grouped
+    # into buckets of this size so padding is shared within a batch
+    BATCH_SIZE = int(os.getenv('ANALYSIS_BATCH_SIZE', 16))
+    
+    # Per-machine profiles from autotune.py (batch size, padded tokens per
+    # forward pass and torch threads per model), applied automatically
+    # when one matches this host and the configured models; AUTOTUNE=0
+    # ignores them
+    AUTOTUNE_ENABLED = os.getenv('AUTOTUNE', '1') != '0'
+    AUTOTUNE_DIR = os.path.join(CACHE_DIR, 'autotune')
+    
+    # Analysis stages to run (comma-separated), e.g. 'sentiment,keywords'.
+    # Models for stages that are not selected are never loaded. The
+    # 'embedding' stage (similarity search) is opt-in.
+    ALL_ANALYSIS_STAGES = ['sentiment', 'emotion', 'categories', 'keywords', 'embedding']
+    ANALYSIS_STAGES = [
+        stage.strip() for stage in
+        os.getenv('ANALYSIS_STAGES', 'sentiment,emotion,categories,keywords').split(',')
+        if stage.strip()
+    ]
+    
+    # Worker processes for analysis (1 = in-process); each worker gets
+    # cpu_count // workers torch threads
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 1))
+    
+    # Warm-model analysis service (python analysis_service.py); analysis
+    # uses it when it is running and falls back to in-process otherwise
+    ANALYSIS_SERVICE_ENABLED = os.getenv('ANALYSIS_SERVICE', '1') != '0'
+    SERVICE_HOST = os.getenv('ANALYSIS_SERVICE_HOST', '127.0.0.1')
+    SERVICE_PORT = int(os.getenv('ANALYSIS_SERVICE_PORT', 8765))
+    SERVICE_MAX_BATCH = int(os.getenv('ANALYSIS_SERVICE_MAX_BATCH', 64))
+    SERVICE_MAX_WAIT_MS = int(os.getenv('ANALYSIS_SERVICE_MAX_WAIT_MS', 20))
+    SERVICE_TIMEOUT = int(os.getenv('ANALYSIS_SERVICE_TIMEOUT', 600))
+    
+    # Analysis cache: reviews already scored with the same models and
+    # categories are served from disk instead of re-running inference
+    ANALYSIS_CACHE_ENABLED = os.getenv('ANALYSIS_CACHE', '1') != '0'
+    ANALYSIS_CACHE_MAX_MB = int(os.getenv('ANALYSIS_CACHE_MAX_MB', 256))
+    
+    # Near-duplicate detection: reviews whose estimated Jaccard similarity
+    # (MinHash over word 3-shingles) to an analyzed review reaches the
+    # threshold reuse its analysis. DEDUP_NUM_PERM must be a multiple of
+    # DEDUP_BANDS; more bands find more candidates at lower similarity
+    DEDUP_ENABLED = os.getenv('DEDUP', '1') != '0'
+    DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', 0.85))
+    DEDUP_NUM_PERM = int(os.getenv('DEDUP_NUM_PERM', 64))
+    DEDUP_BANDS = int(os.getenv('DEDUP_BANDS', 16))
     
     # Categories for zero-shot classification
     CATEGORIES = [
@@ -33,6 +180,47 @@ class Config:
         'online ordering'
     ]
     
+    # Category engine: 'pipeline' runs the zero-shot pipeline per review,
+    # 'fast' batches (review, hypothesis) pairs across reviews, 'distilled'
+    # runs a TF-IDF classifier trained on zero-shot labels and sends
+    # reviews it is unsure about to the zero-shot pipeline (zero-shot only
+    # until a model has been trained)
+    CATEGORY_ENGINE = os.getenv('CATEGORY_ENGINE', 'distilled')
+    # Artifact for the distilled engine (default: latest in DISTILLED_MODELS_DIR);
+    # a review is uncertain when any category probability is within the margin of 0.5
+    DISTILLED_CATEGORY_MODEL = os.getenv('DISTILLED_CATEGORY_MODEL', '')
+    DISTILLED_UNCERTAINTY_MARGIN = float(os.getenv('DISTILLED_UNCERTAINTY_MARGIN', 0.25))
+    CATEGORY_HYPOTHESIS_TEMPLATE = 'This example is {}.'
+    # Zero-shot scores per (review, hypothesis, model), so adding or
+    # renaming a category only scores the new hypotheses (off with ANALYSIS_CACHE=0)
+    CATEGORY_SCORE_CACHE_ENABLED = os.getenv('CATEGORY_SCORE_CACHE', '1') != '0'
+    CATEGORY_PAIR_BATCH_SIZE = int(os.getenv('CATEGORY_PAIR_BATCH_SIZE', 64))
+    # Optional pruning for the fast engine: score truncated reviews first,
+    # then rescore only the top-k categories at full length (0 = off)
+    CATEGORY_PRUNE_TOP_K = int(os.getenv('CATEGORY_PRUNE_TOP_K', 0))
+    CATEGORY_PRUNE_MAX_TOKENS = int(os.getenv('CATEGORY_PRUNE_MAX_TOKENS', 64))
+    
+    # Keyword lexicons (one term or phrase per line); keywords preceded by
+    # a negator within KEYWORD_NEGATION_WINDOW words flip polarity
+    LEXICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicons')
+    POSITIVE_LEXICON_FILE = os.getenv('POSITIVE_LEXICON_FILE', os.path.join(LEXICON_DIR, 'positive.txt'))
+    NEGATIVE_LEXICON_FILE = os.getenv('NEGATIVE_LEXICON_FILE', os.path.join(LEXICON_DIR, 'negative.txt'))
+    KEYWORD_NEGATION_WINDOW = int(os.getenv('KEYWORD_NEGATION_WINDOW', 3))
+    KEYWORD_LIMIT = 5
+    
+    # Dashboard: above DASHBOARD_MAX_POINTS reviews the per-review panels
+    # are binned into daily rollups and density bins. plotly.js is written
+    # once as visualizations/plotly.min.js and shared by every report
+    # ('cdn' links it instead, 'inline' embeds it in each file)
+    DASHBOARD_MAX_POINTS = int(os.getenv('DASHBOARD_MAX_POINTS', 5000))
+    # DASHBOARD_PLOTLYJS setting -> plotly's include_plotlyjs argument
+    PLOTLYJS_MODES = {'inline': True, 'cdn': 'cdn', 'directory': 'directory'}
+    DASHBOARD_PLOTLYJS = os.getenv('DASHBOARD_PLOTLYJS', 'directory')
+    if DASHBOARD_PLOTLYJS not in PLOTLYJS_MODES:
+        raise ValueError(f"DASHBOARD_PLOTLYJS must be one of {', '.join(PLOTLYJS_MODES)}, "
+                         f"got {DASHBOARD_PLOTLYJS!r}")
+    DASHBOARD_PLOTLYJS = PLOTLYJS_MODES[DASHBOARD_PLOTLYJS]
+    
     # Create directories if they don't exist
     @staticmethod
     def setup_directories():
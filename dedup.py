@@ -0,0 +1,322 @@
+import os
+import re
+import json
+import zlib
+import sqlite3
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from config import Config
+
+_WORD = re.compile(r"\w+")
+# Permutations are (a * h + b) mod p over 32-bit shingle hashes
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def shingles(text, size=3):
+    """Word n-grams of a lowercased review (the whole review if it is shorter)"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def cluster_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+class MinHasher:
+    """MinHash signatures: the estimated Jaccard similarity is the share of equal values"""
+
+    def __init__(self, num_perm, seed=1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2**32, num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 2**32, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles(text)), dtype=np.uint64)
+        return (((hashes[:, None] * self.a + self.b) % _PRIME) & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def similarity(left, right):
+        return float(np.mean(left == right))
+
+
+class DedupIndex:
+    """
+    Near-duplicate index of analyzed reviews (MinHash + LSH banding).
+    Each cluster of near-identical reviews keeps its representative's
+    MinHash signature and analysis. Incoming reviews whose estimated
+    Jaccard similarity to a representative (word 3-shingles) reaches
+    `threshold` join its cluster and reuse its analysis instead of
+    running the models; the others become new representatives. Analyses
+    are only reused when they came from the same model configuration.
+    Every indexed review is remembered by its key (review id, or its
+    normalized text), so a review fetched again is recognized as itself
+    rather than counted as a duplicate of its own cluster.
+    """
+
+    def __init__(self, path=None, fingerprint='', threshold=None, num_perm=None, bands=None):
+        self.path = path or Config.DEDUP_INDEX_FILE
+        self.fingerprint = fingerprint
+        self.threshold = threshold if threshold is not None else Config.DEDUP_THRESHOLD
+        self.num_perm = num_perm or Config.DEDUP_NUM_PERM
+        self.bands = bands or Config.DEDUP_BANDS
+        if self.num_perm % self.bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({self.num_perm}) must be a multiple of DEDUP_BANDS ({self.bands})")
+        self.rows = self.num_perm // self.bands
+        self.hasher = MinHasher(self.num_perm)
+
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)")
+        settings = f"{self.num_perm}/{self.bands}"
+        stored = self.conn.execute("SELECT value FROM settings WHERE name = 'minhash'").fetchone()
+        if stored and stored[0] != settings:
+            # Signatures from other settings cannot be compared
+            print(f"⚠ Dedup index {self.path} used MinHash settings {stored[0]}; rebuilding it")
+            self.conn.execute("DROP TABLE IF EXISTS clusters")
+            self.conn.execute("DROP TABLE IF EXISTS bands")
+            self.conn.execute("DROP TABLE IF EXISTS members")
+        self.conn.execute("INSERT OR REPLACE INTO settings (name, value) VALUES ('minhash', ?)", (settings,))
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS clusters (
+                cluster_id TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                members INTEGER NOT NULL,
+                fingerprint TEXT,
+                payload TEXT
+            )"""
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER, bucket INTEGER, cluster_id TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, bucket)")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS members (
+                review_key TEXT PRIMARY KEY,
+                cluster_id TEXT NOT NULL,
+                similarity REAL
+            ) WITHOUT ROWID"""
+        )
+        self.conn.commit()
+
+    def _buckets(self, signature):
+        return [
+            int.from_bytes(hashlib.blake2b(signature[band * self.rows:(band + 1) * self.rows].tobytes(),
+                                           digest_size=8).digest(), 'little', signed=True)
+            for band in range(self.bands)
+        ]
+
+    def _indexed_candidates(self, buckets):
+        """{text index: [cluster ids]} of indexed clusters sharing a band bucket"""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (position INTEGER, band INTEGER, bucket INTEGER)")
+        self.conn.execute("DELETE FROM lookup")
+        self.conn.executemany(
+            "INSERT INTO lookup (position, band, bucket) VALUES (?, ?, ?)",
+            [(i, band, bucket) for i, row in enumerate(buckets) if row is not None
+             for band, bucket in enumerate(row)]
+        )
+        candidates = {}
+        for position, cluster_id in self.conn.execute(
+            """SELECT DISTINCT lookup.position, bands.cluster_id FROM lookup
+               JOIN bands ON bands.band = lookup.band AND bands.bucket = lookup.bucket"""
+        ):
+            candidates.setdefault(position, []).append(cluster_id)
+        # End the implicit transaction, which would otherwise keep the
+        # index locked against writers in other processes
+        self.conn.commit()
+        return candidates
+
+    def _members(self, review_keys):
+        """{review key: (cluster id, similarity)} of reviews already indexed"""
+        found = {}
+        review_keys = list(dict.fromkeys(review_keys))
+        for start in range(0, len(review_keys), 500):
+            chunk = review_keys[start:start + 500]
+            for review_key, cluster_id, similarity in self.conn.execute(
+                f"SELECT review_key, cluster_id, similarity FROM members "
+                f"WHERE review_key IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                found[review_key] = (cluster_id, similarity)
+        return found
+
+    def _clusters(self, cluster_ids):
+        found = {}
+        cluster_ids = list(cluster_ids)
+        for start in range(0, len(cluster_ids), 500):
+            chunk = cluster_ids[start:start + 500]
+            for cluster_id, signature, fingerprint, payload in self.conn.execute(
+                f"SELECT cluster_id, signature, fingerprint, payload FROM clusters "
+                f"WHERE cluster_id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                found[cluster_id] = {
+                    'signature': np.frombuffer(signature, dtype=np.uint32),
+                    'payload': json.loads(payload) if payload and fingerprint == self.fingerprint else None
+                }
+        return found
+
+    def match(self, texts, review_keys=None):
+        """
+        Assign each normalized review to a cluster. `review_keys` identify
+        the reviews (default: their normalized text). Returns, per text,
+        None for texts that are not analyzed, or a dict with:
+          cluster_id      - id of the cluster (its representative's id)
+          similarity      - estimated similarity to the representative (None for representatives)
+          source          - 'new' (this review is a representative), 'batch' (near-duplicate of
+                            `representative`, an earlier index in `texts`), 'index' (near-duplicate
+                            of an already analyzed review; `payload` is its analysis, or None
+                            when it came from other models) or 'known' (this review, or one with
+                            the same text, is already indexed; `payload` as for 'index')
+        """
+        signatures = [self.hasher.signature(text) if isinstance(text, str) and len(text.strip()) >= 10
+                      else None for text in texts]
+        if review_keys is None:
+            review_keys = [cluster_key(text) if signature is not None else None
+                           for text, signature in zip(texts, signatures)]
+        known = self._members([key for key in review_keys if key is not None])
+        # A representative's cluster id is the key of its normalized text
+        same_text = {cluster_key(text) for text, signature in zip(texts, signatures) if signature is not None}
+        indexed_texts = set(self._clusters(same_text))
+        buckets = [self._buckets(signature) if signature is not None else None for signature in signatures]
+        candidates = self._indexed_candidates(buckets)
+        indexed = self._clusters({cluster_id for ids in candidates.values() for cluster_id in ids}
+                                 | {cluster_id for cluster_id, _ in known.values()} | indexed_texts)
+
+        matches = []
+        batch_buckets = {}  # (band, bucket) -> indices of representatives in this batch
+        for i, (text, signature) in enumerate(zip(texts, signatures)):
+            if signature is None:
+                matches.append(None)
+                continue
+
+            cluster_id, similarity = known.get(review_keys[i], (None, None))
+            if cluster_id is None and cluster_key(text) in indexed_texts:
+                cluster_id = cluster_key(text)
+            if cluster_id in indexed:
+                matches.append({'cluster_id': cluster_id, 'similarity': similarity, 'source': 'known',
+                                'representative': None, 'payload': indexed[cluster_id]['payload'],
+                                'review_key': review_keys[i]})
+                continue
+
+            best = None
+            for cluster_id in candidates.get(i, []):
+                similarity = self.hasher.similarity(signature, indexed[cluster_id]['signature'])
+                if similarity >= self.threshold and (best is None or similarity > best['similarity']):
+                    best = {'cluster_id': cluster_id, 'similarity': similarity, 'source': 'index',
+                            'representative': None, 'payload': indexed[cluster_id]['payload']}
+            for j in {j for key in enumerate(buckets[i]) for j in batch_buckets.get(key, [])}:
+                similarity = self.hasher.similarity(signature, signatures[j])
+                if similarity >= self.threshold and (best is None or similarity > best['similarity']):
+                    best = {'cluster_id': matches[j]['cluster_id'], 'similarity': similarity,
+                            'source': 'batch', 'representative': j, 'payload': None}
+
+            if best is None:
+                best = {'cluster_id': cluster_key(text), 'similarity': None, 'source': 'new',
+                        'representative': None, 'payload': None}
+                for key in enumerate(buckets[i]):
+                    batch_buckets.setdefault(key, []).append(i)
+            best['signature'] = signature
+            best['buckets'] = buckets[i]
+            best['review_key'] = review_keys[i]
+            matches.append(best)
+        return matches
+
+    def record(self, matches, analyses):
+        """
+        Index new representatives with their analyses and count the new
+        members of each cluster (reviews already indexed are not counted again)
+        """
+        new_clusters, new_bands, new_members, refreshed, members = [], [], [], [], {}
+        for match, analysis in zip(matches, analyses):
+            if match is None:
+                continue
+            if match['source'] == 'new':
+                if not analysis:
+                    continue
+                new_clusters.append((match['cluster_id'], match['signature'].tobytes(),
+                                     self.fingerprint, json.dumps(analysis)))
+                new_bands.extend((band, bucket, match['cluster_id'])
+                                 for band, bucket in enumerate(match['buckets']))
+            elif match['source'] != 'known':
+                members[match['cluster_id']] = members.get(match['cluster_id'], 0) + 1
+            new_members.append((match['review_key'], match['cluster_id'], match['similarity']))
+            if match['source'] in ('index', 'known') and match['payload'] is None and analysis:
+                # Analyzed because the stored analysis came from other models
+                refreshed.append((self.fingerprint, json.dumps(analysis), match['cluster_id']))
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO clusters (cluster_id, signature, members, fingerprint, payload) "
+                "VALUES (?, ?, 1, ?, ?)", new_clusters
+            )
+            self.conn.executemany("INSERT INTO bands (band, bucket, cluster_id) VALUES (?, ?, ?)", new_bands)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO members (review_key, cluster_id, similarity) VALUES (?, ?, ?)", new_members
+            )
+            self.conn.executemany("UPDATE clusters SET fingerprint = ?, payload = ? WHERE cluster_id = ?",
+                                  refreshed)
+            self.conn.executemany("UPDATE clusters SET members = members + ? WHERE cluster_id = ?",
+                                  [(count, cluster_id) for cluster_id, count in members.items()])
+
+    def stats(self):
+        clusters, reviews, duplicated = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(members), 0), COALESCE(SUM(members > 1), 0) FROM clusters"
+        ).fetchone()
+        return {'clusters': clusters, 'reviews': reviews, 'clusters_with_duplicates': duplicated}
+
+    def close(self):
+        self.conn.close()
+
+
+def duplicate_clusters(df, min_size=2):
+    """Clusters of near-duplicate reviews in analyzed reviews, largest first"""
+    if 'duplicate_cluster' not in df.columns:
+        return pd.DataFrame(columns=['cluster', 'reviews', 'places', 'sample'])
+    df = df[df['duplicate_cluster'].notna()]
+    places = df['place_name'] if 'place_name' in df.columns else df.get('place_id', pd.Series('', index=df.index))
+    clusters = pd.DataFrame({
+        'cluster': df['duplicate_cluster'],
+        'place': places.fillna('').astype(str),
+        'text': df['text']
+    }).groupby('cluster').agg(
+        reviews=('text', 'size'),
+        places=('place', 'nunique'),
+        sample=('text', 'first')
+    ).reset_index()
+    clusters = clusters[clusters['reviews'] >= min_size]
+    return clusters.sort_values(['reviews', 'places'], ascending=False).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report clusters of near-duplicate reviews')
+    parser.add_argument('--top', type=int, default=20, help='Number of clusters to show')
+    parser.add_argument('--min-size', type=int, default=2, help='Smallest cluster to show')
+    args = parser.parse_args()
+
+    from review_store import ReviewStore
+
+    index = DedupIndex()
+    stats = index.stats()
+    print(f"Dedup index: {stats['reviews']} reviews in {stats['clusters']} clusters "
+          f"({stats['clusters_with_duplicates']} with near-duplicates)")
+
+    df = ReviewStore().read(columns=['place_id', 'place_name', 'text', 'duplicate_cluster'])
+    clusters = duplicate_clusters(df, args.min_size).head(args.top)
+    if clusters.empty:
+        print("✓ No near-duplicate clusters in the review history")
+        return clusters
+
+    print(f"\n{'cluster':<17} {'reviews':>7} {'places':>6}  sample")
+    for row in clusters.itertuples(index=False):
+        sample = ' '.join(str(row.sample).split())
+        flag = '  ⚠ across places' if row.places > 1 else ''
+        print(f"{row.cluster:<17} {row.reviews:>7} {row.places:>6}  "
+              f"{sample[:60] + '...' if len(sample) > 60 else sample}{flag}")
+    return clusters
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+import os
+import re
+import glob
+import time
+import argparse
+from datetime import datetime
+import joblib
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.multiclass import OneVsRestClassifier
+from sklearn.pipeline import FeatureUnion, make_pipeline
+from sklearn.preprocessing import MultiLabelBinarizer
+from config import Config
+
+# Bump when the artifact layout changes; older artifacts are not loaded
+ARTIFACT_FORMAT = 1
+
+
+def artifact_path(version):
+    return os.path.join(Config.DISTILLED_MODELS_DIR, f"categories-v{version}.joblib")
+
+
+def _artifact_version(path):
+    match = re.search(r'categories-v(\d+)\.joblib$', path)
+    return int(match.group(1)) if match else 0
+
+
+def latest_artifact():
+    """Configured artifact, else the highest version in DISTILLED_MODELS_DIR (None if none)"""
+    if Config.DISTILLED_CATEGORY_MODEL:
+        return Config.DISTILLED_CATEGORY_MODEL
+    paths = glob.glob(os.path.join(Config.DISTILLED_MODELS_DIR, 'categories-v*.joblib'))
+    return max(paths, key=_artifact_version) if paths else None
+
+
+def distilled_fingerprint():
+    """Identifies the artifact the 'distilled' engine would use, for caching results"""
+    path = latest_artifact()
+    return os.path.basename(path) if path and os.path.exists(path) else 'zero-shot'
+
+
+class DistilledCategoryClassifier:
+    """
+    Multi-label category classifier distilled from the zero-shot model.
+    Word and character TF-IDF features feed one logistic regression per
+    category, trained on the categories zero-shot assigned to past
+    reviews. A review is "uncertain" when any category probability lies
+    within `margin` of 0.5; those are meant to be sent to zero-shot.
+    """
+
+    def __init__(self, model, categories, margin=None, metadata=None):
+        self.model = model
+        self.categories = list(categories)
+        self.margin = Config.DISTILLED_UNCERTAINTY_MARGIN if margin is None else margin
+        self.metadata = metadata or {}
+
+    @classmethod
+    def train(cls, texts, labels, categories=None):
+        """Fit on texts and their zero-shot category lists"""
+        categories = list(categories or Config.CATEGORIES)
+        targets = MultiLabelBinarizer(classes=categories).fit_transform(
+            [[label for label in row if label in categories] for row in labels]
+        )
+        features = FeatureUnion([
+            ('words', TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True,
+                                      max_features=50000)),
+            ('chars', TfidfVectorizer(analyzer='char_wb', ngram_range=(3, 5), min_df=2,
+                                      sublinear_tf=True, max_features=50000))
+        ])
+        model = make_pipeline(
+            features,
+            OneVsRestClassifier(LogisticRegression(C=4.0, max_iter=1000))
+        )
+        model.fit(list(texts), targets)
+        return cls(model, categories)
+
+    @classmethod
+    def load(cls, path, margin=None):
+        artifact = joblib.load(path)
+        if artifact.get('format') != ARTIFACT_FORMAT:
+            raise ValueError(f"{path} has artifact format {artifact.get('format')}, "
+                             f"expected {ARTIFACT_FORMAT}; retrain it")
+        return cls(artifact['model'], artifact['categories'], margin, artifact['metadata'])
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        joblib.dump({
+            'format': ARTIFACT_FORMAT,
+            'categories': self.categories,
+            'metadata': self.metadata,
+            'model': self.model
+        }, path)
+        return path
+
+    def score_batch(self, texts):
+        """Return one {category: probability} dict per review"""
+        if not texts:
+            return []
+        probs = self.model.predict_proba(list(texts))
+        return [dict(zip(self.categories, row.tolist())) for row in probs]
+
+    def is_uncertain(self, scores):
+        return any(abs(score - 0.5) < self.margin for score in scores.values())
+
+    def classify_batch(self, texts):
+        """
+        Same output shape as TransformerAnalyzer.classify_categories, plus
+        the indices of reviews whose prediction is uncertain.
+        """
+        results, uncertain = [], []
+        for i, category_scores in enumerate(self.score_batch(texts)):
+            ranked = sorted(category_scores.items(), key=lambda item: item[1], reverse=True)
+            results.append({
+                'categories': [label for label, score in ranked if score > 0.5][:3],
+                'category_scores': dict(ranked[:3]),
+                'category_source': 'distilled'
+            })
+            if self.is_uncertain(category_scores):
+                uncertain.append(i)
+        return results, uncertain
+
+
+def load_distilled_classifier():
+    """The classifier for the 'distilled' engine, or None when no usable artifact exists"""
+    path = latest_artifact()
+    if not path or not os.path.exists(path):
+        print("⚠ No distilled category model found; using zero-shot "
+              "(train one with: python distill_categories.py train)")
+        return None
+    classifier = DistilledCategoryClassifier.load(path)
+    if classifier.categories != list(Config.CATEGORIES):
+        print(f"⚠ {path} was trained on different categories; using zero-shot")
+        return None
+    print(f"Using distilled category model {os.path.basename(path)} "
+          f"(uncertain reviews go to zero-shot)")
+    return classifier
+
+
+def pseudo_labels(analyzer=None, limit=None, relabel=False):
+    """
+    (texts, category lists) to train on. By default these are the
+    categories zero-shot already assigned to the review history; reviews
+    labeled by the distilled model itself are left out. With `relabel`,
+    zero-shot is re-run over the history texts instead.
+    """
+    from review_store import ReviewStore
+
+    store = ReviewStore()
+    if store.exists():
+        df = store.read(columns=['text', 'categories', 'category_source'])
+    else:
+        df = pd.read_csv(Config.ANALYZED_REVIEWS_FILE if os.path.exists(Config.ANALYZED_REVIEWS_FILE)
+                         else Config.RAW_REVIEWS_FILE)
+    df = df[df['text'].map(lambda text: isinstance(text, str) and len(text.strip()) >= 10)]
+    if not relabel and 'categories' in df.columns:
+        if 'category_source' in df.columns:
+            df = df[df['category_source'].fillna('zero-shot') == 'zero-shot']
+        df = df[df['categories'].notna()]
+    df = df.drop_duplicates('text')
+    if limit:
+        df = df.sample(n=min(limit, len(df)), random_state=0)
+
+    from analyze_reviews import ReviewPreprocessor
+    texts = [ReviewPreprocessor.normalize(text) for text in df['text']]
+    if relabel or 'categories' not in df.columns:
+        from analyze_reviews import TransformerAnalyzer
+        analyzer = analyzer or TransformerAnalyzer(use_cache=False, use_dedup=False, stages=['categories'])
+        print(f"Labeling {len(texts)} reviews with zero-shot...")
+        labels = [result['categories'] for result in analyzer.zero_shot_categories(texts)]
+    else:
+        from review_store import _parse_literal
+        labels = [list(_parse_literal(value)) for value in df['categories']]
+    return texts, labels
+
+
+def agreement(reference, predicted):
+    """Category-set agreement, top-1 agreement and micro F1 between two result lists"""
+    n = max(len(reference), 1)
+    true_positives = sum(len(set(a['categories']) & set(b['categories']))
+                         for a, b in zip(reference, predicted))
+    reference_labels = sum(len(a['categories']) for a in reference)
+    predicted_labels = sum(len(b['categories']) for b in predicted)
+
+    def top1(result):
+        return result['categories'][0] if result['categories'] else None
+
+    return {
+        'label_set_agreement': sum(set(a['categories']) == set(b['categories'])
+                                   for a, b in zip(reference, predicted)) / n,
+        'top1_agreement': sum(top1(a) == top1(b) for a, b in zip(reference, predicted)) / n,
+        'micro_f1': (2 * true_positives / (reference_labels + predicted_labels)
+                     if reference_labels + predicted_labels else 1.0)
+    }
+
+
+def prune_artifacts(keep):
+    """Delete all but the `keep` newest artifact versions"""
+    paths = sorted(glob.glob(os.path.join(Config.DISTILLED_MODELS_DIR, 'categories-v*.joblib')),
+                   key=_artifact_version)
+    for path in paths[:-keep] if keep > 0 else []:
+        os.remove(path)
+
+
+def train(limit=None, holdout=0.2, relabel=False, min_reviews=50):
+    """Train, evaluate on a holdout split and save the next artifact version"""
+    texts, labels = pseudo_labels(limit=limit, relabel=relabel)
+    if len(texts) < min_reviews:
+        raise ValueError(f"Only {len(texts)} labeled reviews; at least {min_reviews} are needed "
+                         f"(run the analysis with CATEGORY_ENGINE=fast or pipeline first)")
+
+    order = pd.Series(range(len(texts))).sample(frac=1.0, random_state=0).tolist()
+    n_holdout = int(len(texts) * holdout)
+    test, fit = order[:n_holdout], order[n_holdout:]
+
+    start = time.perf_counter()
+    classifier = DistilledCategoryClassifier.train([texts[i] for i in fit], [labels[i] for i in fit])
+    train_seconds = time.perf_counter() - start
+
+    metrics = {}
+    if test:
+        predicted, uncertain = classifier.classify_batch([texts[i] for i in test])
+        reference = [{'categories': labels[i][:3]} for i in test]
+        confident = [j for j in range(len(test)) if j not in set(uncertain)]
+        metrics = agreement(reference, predicted)
+        metrics['confident_share'] = len(confident) / len(test)
+        metrics['confident_label_set_agreement'] = agreement(
+            [reference[j] for j in confident], [predicted[j] for j in confident]
+        )['label_set_agreement'] if confident else None
+
+    existing = glob.glob(os.path.join(Config.DISTILLED_MODELS_DIR, 'categories-v*.joblib'))
+    version = max((_artifact_version(path) for path in existing), default=0) + 1
+    classifier.metadata = {
+        'version': version,
+        'trained_at': datetime.now().isoformat(),
+        'teacher': Config.ZERO_SHOT_MODEL,
+        'train_reviews': len(fit),
+        'holdout_reviews': len(test),
+        'train_seconds': round(train_seconds, 2),
+        'holdout_metrics': metrics
+    }
+    return classifier.save(artifact_path(version)), classifier
+
+
+def compare(analyzer, texts, classifier):
+    """
+    Categorize the same reviews with zero-shot, the distilled model alone
+    and the distilled model with zero-shot fallback; report agreement
+    with zero-shot and time per review.
+    """
+    analyzer.zero_shot_categories(texts[:1])  # load the model before timing
+
+    start = time.perf_counter()
+    teacher = analyzer.zero_shot_categories(texts)
+    teacher_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    student, uncertain = classifier.classify_batch(texts)
+    student_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hybrid = list(student)
+    for i, result in zip(uncertain, analyzer.zero_shot_categories([texts[i] for i in uncertain])):
+        hybrid[i] = result
+    hybrid_seconds = student_seconds + time.perf_counter() - start
+
+    n = max(len(texts), 1)
+    return {
+        'reviews': len(texts),
+        'fallback_share': len(uncertain) / n,
+        'zero_shot_ms_per_review': teacher_seconds / n * 1000,
+        'distilled_ms_per_review': student_seconds / n * 1000,
+        'hybrid_ms_per_review': hybrid_seconds / n * 1000,
+        'distilled_speedup': teacher_seconds / student_seconds if student_seconds else None,
+        'hybrid_speedup': teacher_seconds / hybrid_seconds if hybrid_seconds else None,
+        'distilled': agreement(teacher, student),
+        'hybrid': agreement(teacher, hybrid)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distill the zero-shot category model into a fast classifier')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='Train a new artifact version from the review history')
+    train_parser.add_argument('--limit', type=int, help='Train on at most this many reviews')
+    train_parser.add_argument('--holdout', type=float, default=0.2, help='Share of reviews held out for evaluation')
+    train_parser.add_argument('--relabel', action='store_true',
+                              help='Re-run zero-shot on the history instead of using stored categories')
+    train_parser.add_argument('--keep', type=int, default=3, help='Artifact versions to keep')
+
+    report_parser = subparsers.add_parser('report', help='Agreement and speedup against zero-shot')
+    report_parser.add_argument('--input', default=Config.RAW_REVIEWS_FILE, help='CSV with a text column')
+    report_parser.add_argument('--limit', type=int, default=100, help='Number of reviews to compare')
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        try:
+            path, classifier = train(args.limit, args.holdout, args.relabel)
+        except ValueError as e:
+            print(f"⚠ {e}")
+            return None
+        prune_artifacts(args.keep)
+        metadata = classifier.metadata
+        print(f"✓ Distilled category model saved to {path}")
+        print(f"Trained on {metadata['train_reviews']} reviews in {metadata['train_seconds']:.1f}s "
+              f"({metadata['holdout_reviews']} held out)")
+        for key, value in metadata['holdout_metrics'].items():
+            print(f"{key}: {value:.1%}" if value is not None else f"{key}: -")
+        return path
+
+    from analyze_reviews import ReviewPreprocessor, TransformerAnalyzer
+
+    classifier = load_distilled_classifier()
+    if classifier is None:
+        return None
+    df = pd.read_csv(args.input)
+    texts = [ReviewPreprocessor.normalize(t) for t in df['text'].dropna().tolist()
+             if len(t.strip()) >= 10][:args.limit]
+
+    report = compare(TransformerAnalyzer(use_cache=False, use_dedup=False, stages=['categories']), texts, classifier)
+
+    print("=" * 60)
+    print("DISTILLED vs ZERO-SHOT CATEGORIES")
+    print("=" * 60)
+    print(f"Reviews compared: {report['reviews']}")
+    print(f"Sent to zero-shot (uncertain): {report['fallback_share']:.1%}")
+    print(f"zero-shot: {report['zero_shot_ms_per_review']:.2f} ms/review | "
+          f"distilled: {report['distilled_ms_per_review']:.2f} ms/review "
+          f"({report['distilled_speedup'] or 0:.0f}x) | "
+          f"with fallback: {report['hybrid_ms_per_review']:.2f} ms/review "
+          f"({report['hybrid_speedup'] or 0:.1f}x)")
+    for engine in ('distilled', 'hybrid'):
+        metrics = report[engine]
+        print(f"{engine}: category set agreement {metrics['label_set_agreement']:.1%}, "
+              f"top-1 {metrics['top1_agreement']:.1%}, micro F1 {metrics['micro_f1']:.3f}")
+    return report
+
+if __name__ == "__main__":
+    main()
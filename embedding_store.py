@@ -0,0 +1,339 @@
+import os
+import json
+import sqlite3
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from config import Config
+
+# Rows scanned per step when reading the memory-mapped vectors, so
+# resident memory stays bounded however large the store grows
+SCAN_ROWS = 65536
+
+
+def text_key(text):
+    """Key for reviews without the fields a review id is built from"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Append-only store of one float32 vector per review.
+    Vectors are L2-normalized and appended to a raw memory-mapped file
+    (vectors.f32, row i = i-th stored review); review ids and the
+    sentiment/categories shown with search results live in SQLite. A
+    crash between the two leaves extra vector rows, which are truncated
+    on open. An IVF index (k-means centroids plus row lists, build_index)
+    narrows a search to the `nprobe` closest lists; rows added since the
+    last build are scanned exactly.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.EMBEDDING_STORE_DIR
+        os.makedirs(self.path, exist_ok=True)
+        self.vectors_file = os.path.join(self.path, 'vectors.f32')
+        self.meta_file = os.path.join(self.path, 'meta.json')
+        self.meta = {'dim': None, 'model': None, 'indexed_rows': 0}
+        if os.path.exists(self.meta_file):
+            with open(self.meta_file) as f:
+                self.meta = json.load(f)
+
+        self.conn = sqlite3.connect(os.path.join(self.path, 'reviews.sqlite'))
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS reviews (
+                row INTEGER PRIMARY KEY,
+                review_id TEXT UNIQUE NOT NULL,
+                place_id TEXT,
+                rating INTEGER,
+                sentiment_label TEXT,
+                sentiment_score REAL,
+                categories TEXT,
+                text TEXT
+            )"""
+        )
+        self.conn.commit()
+
+        # Drop vector rows whose metadata was never committed
+        if self.meta['dim'] and os.path.exists(self.vectors_file):
+            expected = len(self) * self.meta['dim'] * 4
+            if os.path.getsize(self.vectors_file) > expected:
+                os.truncate(self.vectors_file, expected)
+        self._ivf = None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    def _save_meta(self):
+        tmp_path = f"{self.meta_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self.meta_file)
+
+    def vectors(self):
+        """Read-only memory map of all stored vectors (n x dim)"""
+        n = len(self)
+        if n == 0:
+            return np.zeros((0, self.meta['dim'] or 0), dtype=np.float32)
+        return np.memmap(self.vectors_file, dtype=np.float32, mode='r', shape=(n, self.meta['dim']))
+
+    def contains(self, review_ids):
+        """The subset of `review_ids` already stored"""
+        found = set()
+        review_ids = list(review_ids)
+        for start in range(0, len(review_ids), 500):
+            chunk = review_ids[start:start + 500]
+            found.update(row[0] for row in self.conn.execute(
+                f"SELECT review_id FROM reviews WHERE review_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return found
+
+    def add(self, df, vectors, model=None):
+        """
+        Append vectors for the reviews in `df` (a review_id column plus
+        optional place_id, rating, sentiment and categories) that are not
+        stored yet. Returns the number of vectors added.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(df) == 0:
+            return 0
+        if self.meta['dim'] is None:
+            self.meta.update(dim=int(vectors.shape[1]), model=model)
+            self._save_meta()
+        elif vectors.shape[1] != self.meta['dim'] or (model and self.meta['model'] not in (None, model)):
+            raise ValueError(f"Store {self.path} holds {self.meta['dim']}-d vectors from "
+                             f"{self.meta['model']}; rebuild it to switch embedding models")
+
+        df = df.reset_index(drop=True)
+        seen = self.contains(df['review_id'])
+        keep = []
+        for i, review_id in enumerate(df['review_id']):
+            if review_id not in seen:
+                seen.add(review_id)
+                keep.append(i)
+        if not keep:
+            return 0
+
+        def column(name):
+            return df[name] if name in df.columns else pd.Series([None] * len(df))
+
+        start = len(self)
+        rows = []
+        for offset, i in enumerate(keep):
+            categories = column('categories').iloc[i]
+            rows.append((
+                start + offset,
+                df['review_id'].iloc[i],
+                column('place_id').iloc[i],
+                None if pd.isna(column('rating').iloc[i]) else int(column('rating').iloc[i]),
+                column('sentiment_label').iloc[i],
+                None if pd.isna(column('sentiment_score').iloc[i]) else float(column('sentiment_score').iloc[i]),
+                json.dumps(list(categories)) if isinstance(categories, (list, tuple, np.ndarray)) else categories,
+                column('text').iloc[i]
+            ))
+
+        with open(self.vectors_file, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors[keep]).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO reviews (row, review_id, place_id, rating, sentiment_label,
+                                        sentiment_score, categories, text)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", rows
+            )
+        return len(rows)
+
+    def build_index(self, nlist=None, sample=50000, iterations=10, seed=0):
+        """
+        Cluster the vectors with spherical k-means (on a sample) and
+        write the IVF index: centroids, row ids grouped by list and list
+        offsets, as .npy files that are memory-mapped at query time.
+        """
+        vectors = self.vectors()
+        n = len(vectors)
+        if n == 0:
+            return 0
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        rng = np.random.RandomState(seed)
+        training = np.asarray(vectors[np.sort(rng.choice(n, min(n, max(sample, nlist)), replace=False))])
+
+        centroids = training[rng.choice(len(training), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(training @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, training)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            # Re-seed empty lists with random training vectors
+            sums[empty] = training[rng.choice(len(training), int(empty.sum()))]
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assignment = np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + SCAN_ROWS]) @ centroids.T, axis=1)
+            for start in range(0, n, SCAN_ROWS)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+
+        np.save(os.path.join(self.path, 'ivf_centroids.npy'), centroids.astype(np.float32))
+        np.save(os.path.join(self.path, 'ivf_rows.npy'), order.astype(np.int64))
+        np.save(os.path.join(self.path, 'ivf_offsets.npy'), offsets.astype(np.int64))
+        self.meta['indexed_rows'] = n
+        self.meta['nlist'] = nlist
+        self._save_meta()
+        self._ivf = None
+        return nlist
+
+    def needs_reindex(self):
+        """True once the rows added since the last index build are worth indexing"""
+        unindexed = len(self) - self.meta.get('indexed_rows', 0)
+        return unindexed >= Config.EMBEDDING_REINDEX_ROWS and unindexed >= 0.2 * len(self)
+
+    def _index(self):
+        if self._ivf is None and self.meta.get('indexed_rows'):
+            self._ivf = {
+                name: np.load(os.path.join(self.path, f"ivf_{name}.npy"), mmap_mode='r')
+                for name in ('centroids', 'rows', 'offsets')
+            }
+        return self._ivf
+
+    def search(self, query, k=10, nprobe=None):
+        """Top-k (row, cosine similarity) pairs for a normalized query vector"""
+        vectors = self.vectors()
+        n = len(vectors)
+        if n == 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        ivf = self._index()
+
+        if ivf is None:
+            candidates = np.arange(n)
+        else:
+            nprobe = min(nprobe or Config.EMBEDDING_NPROBE, len(ivf['centroids']))
+            probe = np.argpartition(-(ivf['centroids'] @ query), nprobe - 1)[:nprobe]
+            candidates = np.concatenate(
+                [ivf['rows'][ivf['offsets'][c]:ivf['offsets'][c + 1]] for c in probe]
+                + [np.arange(self.meta['indexed_rows'], n)]
+            )
+            # Sorted rows turn the gather into a forward pass over the file
+            candidates.sort()
+
+        scores = np.concatenate([
+            np.asarray(vectors[candidates[start:start + SCAN_ROWS]]) @ query
+            for start in range(0, len(candidates), SCAN_ROWS)
+        ]) if len(candidates) else np.zeros(0, dtype=np.float32)
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def row_of(self, review_id):
+        found = self.conn.execute("SELECT row FROM reviews WHERE review_id = ?", (review_id,)).fetchone()
+        return found[0] if found else None
+
+    def lookup(self, rows):
+        """Stored review fields for rows, in the given order"""
+        rows = list(rows)
+        if not rows:
+            return pd.DataFrame()
+        found = pd.read_sql_query(
+            f"SELECT * FROM reviews WHERE row IN ({','.join('?' * len(rows))})", self.conn, params=rows
+        ).set_index('row')
+        found['categories'] = found['categories'].map(lambda value: json.loads(value) if value else [])
+        return found.loc[[row for row in rows if row in found.index]].reset_index()
+
+    def query(self, query, k=10, nprobe=None, exclude_row=None):
+        """Top-k similar reviews with their stored sentiment and categories"""
+        hits = [(row, score) for row, score in self.search(query, k + (exclude_row is not None), nprobe)
+                if row != exclude_row][:k]
+        results = self.lookup([row for row, _ in hits])
+        if len(results):
+            results.insert(1, 'similarity', [score for _, score in hits])
+        return results
+
+    def close(self):
+        self.conn.close()
+
+
+def _embedding_analyzer():
+    from analyze_reviews import TransformerAnalyzer
+    return TransformerAnalyzer(use_cache=False, use_dedup=False, stages=['embedding'])
+
+
+def backfill(store, batch_size=1000):
+    """Embed stored reviews that have no vector yet, reading the history in batches"""
+    from review_store import ReviewStore
+
+    history = ReviewStore()
+    if not history.exists():
+        return 0
+    df = history.read(columns=['review_id', 'place_id', 'rating', 'text', 'sentiment_label',
+                               'sentiment_score', 'categories'])
+    df = df[~df['review_id'].isin(store.contains(df['review_id']))]
+    df = df[df['text'].map(lambda text: isinstance(text, str) and len(text.strip()) >= 10)]
+    if df.empty:
+        return 0
+
+    analyzer = _embedding_analyzer()
+    added = 0
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        analyses = analyzer.analyze_batch(batch['text'].tolist())
+        embedded = [i for i, analysis in enumerate(analyses) if analysis and 'embedding' in analysis]
+        added += store.add(batch.iloc[embedded], [analyses[i]['embedding'] for i in embedded],
+                           model=Config.EMBEDDING_MODEL)
+        print(f"  {start + len(batch)}/{len(df)} reviews embedded")
+    return added
+
+
+def _print_results(results):
+    if results.empty:
+        print("No reviews in the embedding store yet (run: python embedding_store.py build)")
+        return
+    for row in results.itertuples(index=False):
+        text = ' '.join(str(row.text).split())
+        print(f"{row.similarity:.3f}  {row.rating or '-'}★ {row.sentiment_label or '-':<8} "
+              f"[{', '.join(row.categories)}]\n       {text[:100] + '...' if len(text) > 100 else text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Review embedding store and similarity search')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Embed stored reviews that have no vector, then index')
+    build_parser.add_argument('--batch-size', type=int, default=1000)
+    index_parser = subparsers.add_parser('index', help='Rebuild the nearest-neighbour index')
+    index_parser.add_argument('--nlist', type=int, help='Number of IVF lists (default: sqrt of the store size)')
+    query_parser = subparsers.add_parser('query', help='Reviews similar to a text')
+    query_parser.add_argument('text')
+    similar_parser = subparsers.add_parser('similar', help='Reviews similar to a stored review')
+    similar_parser.add_argument('review_id')
+    for sub in (query_parser, similar_parser):
+        sub.add_argument('-k', type=int, default=10, help='Number of results')
+        sub.add_argument('--nprobe', type=int, help=f'IVF lists to search (default: {Config.EMBEDDING_NPROBE})')
+    args = parser.parse_args()
+
+    store = EmbeddingStore()
+    if args.command == 'build':
+        added = backfill(store, args.batch_size)
+        nlist = store.build_index()
+        print(f"✓ {added} reviews embedded; {len(store)} vectors indexed in {nlist} lists at {store.path}")
+    elif args.command == 'index':
+        nlist = store.build_index(args.nlist)
+        print(f"✓ {len(store)} vectors indexed in {nlist} lists")
+    elif args.command == 'query':
+        query = _embedding_analyzer().analyze_batch([args.text])[0]
+        if query is None:
+            print("⚠ Query text is too short to embed")
+            return
+        _print_results(store.query(query['embedding'], args.k, args.nprobe))
+    else:
+        row = store.row_of(args.review_id)
+        if row is None:
+            print(f"⚠ Review {args.review_id} is not in the embedding store")
+            return
+        _print_results(store.query(store.vectors()[row], args.k, args.nprobe, exclude_row=row))
+
+if __name__ == "__main__":
+    main()
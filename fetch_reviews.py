@@ -1,56 +1,211 @@
+import os
+import json
+import hashlib
 import requests
 import pandas as pd
 import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from config import Config
 
+class PlacesAPIError(Exception):
+    """Error response from the Places API"""
+
+    # Statuses worth retrying; anything else (NOT_FOUND, REQUEST_DENIED,
+    # INVALID_REQUEST, ...) fails the place immediately
+    RETRYABLE_STATUSES = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+
+    def __init__(self, status, retryable=None):
+        super().__init__(f"API Error: {status}")
+        self.status = status
+        self.retryable = status in self.RETRYABLE_STATUSES if retryable is None else retryable
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests per second (0 = unlimited), bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        if rate < 0:
+            raise ValueError(f"FETCH_RATE_LIMIT must be >= 0 requests/second (0 = unlimited), got {rate}")
+        if rate and capacity < 1:
+            raise ValueError(f"FETCH_BURST must be at least 1, got {capacity}")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
 class ReviewsFetcher:
-    def __init__(self):
+    def __init__(self, place_ids=None, base_url=None, response_cache=True):
         self.api_key = Config.GOOGLE_API_KEY
-        self.place_id = Config.PLACE_ID
-        self.base_url = "https://maps.googleapis.com/maps/api/place"
-        
-    def get_place_details(self):
-        """Fetch place details including reviews"""
+        self.place_ids = list(Config.PLACE_IDS if place_ids is None else place_ids)
+        self.place_id = self.place_ids[0] if self.place_ids else None
+        self.base_url = base_url or Config.PLACES_API_URL
+        self.response_cache = response_cache
+
+        # One pooled session shared by all fetch threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=Config.FETCH_CONCURRENCY,
+                              pool_maxsize=Config.FETCH_CONCURRENCY)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.rate_limiter = TokenBucket(Config.FETCH_RATE_LIMIT, Config.FETCH_BURST)
+        self.api_calls = 0
+        self._calls_lock = threading.Lock()
+
+        # Place details and failures of the last fetch, for the fetch scheduler
+        self.results = {}
+        self.errors = {}
+
+        # Change detection: fingerprints of the last processed review sets
+        self.fingerprints = {}
+        self.changed_places = []
+        self.has_changes = True
+
+    def _request(self, url, params):
+        self.rate_limiter.acquire()
+        with self._calls_lock:
+            self.api_calls += 1
+        response = self.session.get(url, params=params, timeout=Config.FETCH_TIMEOUT)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise PlacesAPIError(f"HTTP {response.status_code}", retryable=True)
+        if not response.ok:
+            raise PlacesAPIError(f"HTTP {response.status_code}", retryable=False)
+        return response.json()
+
+    @staticmethod
+    def _response_cache_file(place_id):
+        safe_name = hashlib.sha1(place_id.encode('utf-8')).hexdigest()
+        return os.path.join(Config.RESPONSE_CACHE_DIR, f"{safe_name}.json")
+
+    def _cached_response(self, place_id):
+        """Place details cached less than RESPONSE_CACHE_TTL seconds ago"""
+        path = self._response_cache_file(place_id)
+        if not self.response_cache or Config.RESPONSE_CACHE_TTL <= 0 or not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > Config.RESPONSE_CACHE_TTL:
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def _store_response(self, place_id, result):
+        os.makedirs(Config.RESPONSE_CACHE_DIR, exist_ok=True)
+        with open(self._response_cache_file(place_id), 'w') as f:
+            json.dump(result, f)
+
+    def get_place_details(self, place_id=None):
+        """
+        Fetch place details including reviews, retrying transient failures.
+        Responses younger than RESPONSE_CACHE_TTL are served from disk.
+        """
+        place_id = place_id or self.place_id
+        cached = self._cached_response(place_id)
+        if cached is not None:
+            return cached
+
+        result = self._get_place_details(place_id)
+        self._store_response(place_id, result)
+        return result
+
+    def _get_place_details(self, place_id):
         url = f"{self.base_url}/details/json"
         params = {
-            'place_id': self.place_id,
+            'place_id': place_id,
             'fields': 'name,rating,reviews,user_ratings_total',
             'key': self.api_key,
             'reviews_sort': 'newest'  # or 'most_relevant'
         }
-        
-        response = requests.get(url, params=params)
-        data = response.json()
-        
-        if data['status'] == 'OK':
-            return data['result']
-        else:
-            raise Exception(f"API Error: {data['status']}")
-    
-    def fetch_and_save_reviews(self):
+
+        for attempt in range(Config.FETCH_MAX_RETRIES + 1):
+            try:
+                data = self._request(url, params)
+                if data['status'] == 'OK':
+                    return data['result']
+                raise PlacesAPIError(data['status'])
+            except (PlacesAPIError, requests.ConnectionError, requests.Timeout) as e:
+                retryable = getattr(e, 'retryable', True)
+                if not retryable or attempt == Config.FETCH_MAX_RETRIES:
+                    raise
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, Config.FETCH_BACKOFF_BASE * 2 ** attempt))
+
+    def _fetch_place(self, place_id):
+        try:
+            return place_id, self.get_place_details(place_id), None
+        except Exception as e:
+            return place_id, None, e
+
+    def fetch_all_places(self):
         """
-        Fetch reviews and save to CSV
-        Note: Google Places API returns max 5 reviews per request
-        To get more, you'd need to use pagination or scraping
+        Fetch every configured place concurrently.
+        Returns ({place_id: result}, {place_id: error}); one place failing
+        does not affect the others.
         """
-        print("Fetching reviews from Google Places API...")
-        result = self.get_place_details()
-        
-        reviews = result.get('reviews', [])
-        place_name = result.get('name')
-        overall_rating = result.get('rating')
-        total_reviews = result.get('user_ratings_total')
-        
-        print(f"\nPlace: {place_name}")
-        print(f"Overall Rating: {overall_rating}")
-        print(f"Total Reviews on Google: {total_reviews}")
-        print(f"Reviews fetched: {len(reviews)}")
-        
-        # Convert to DataFrame
-        reviews_data = []
-        for review in reviews:
-            reviews_data.append({
+        if not self.place_ids:
+            raise ValueError("No place IDs configured: set PLACE_IDS or PLACE_ID")
+
+        results, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=Config.FETCH_CONCURRENCY) as pool:
+            for place_id, result, error in pool.map(self._fetch_place, self.place_ids):
+                if error is None:
+                    results[place_id] = result
+                else:
+                    errors[place_id] = error
+        return results, errors
+
+    @staticmethod
+    def review_fingerprint(result):
+        """Hash of a place's review set; changes when any review is added or edited"""
+        reviews = sorted(
+            (str(review.get('author_name')), str(review.get('time')), str(review.get('rating')),
+             review.get('text') or '')
+            for review in result.get('reviews', [])
+        )
+        return hashlib.sha256(json.dumps(reviews).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _load_state():
+        if not os.path.exists(Config.FETCH_STATE_FILE):
+            return {}
+        with open(Config.FETCH_STATE_FILE) as f:
+            return json.load(f)
+
+    def save_state(self):
+        """
+        Record the fingerprints of this run's review sets. Call once the
+        fetched reviews have been fully processed, so a failed run is
+        retried instead of being skipped next time.
+        """
+        state = self._load_state()
+        state.update(self.fingerprints)
+        os.makedirs(os.path.dirname(Config.FETCH_STATE_FILE), exist_ok=True)
+        with open(Config.FETCH_STATE_FILE, 'w') as f:
+            json.dump(state, f, indent=2)
+
+    @staticmethod
+    def _reviews_to_rows(place_id, result):
+        rows = []
+        for review in result.get('reviews', []):
+            rows.append({
+                'place_id': place_id,
+                'place_name': result.get('name'),
                 'author_name': review.get('author_name'),
                 'rating': review.get('rating'),
                 'text': review.get('text'),
@@ -60,12 +215,56 @@ class ReviewsFetcher:
                 'profile_photo_url': review.get('profile_photo_url'),
                 'fetched_at': datetime.now()
             })
-        
+        return rows
+
+    def fetch_and_save_reviews(self):
+        """
+        Fetch reviews for all configured places and save them to one CSV
+        Note: Google Places API returns max 5 reviews per request
+        To get more, you'd need to use pagination or scraping
+        """
+        print(f"Fetching reviews from Google Places API for {len(self.place_ids)} place(s)...")
+        results, errors = self.fetch_all_places()
+        self.results, self.errors = results, errors
+
+        # Convert to DataFrame
+        reviews_data = []
+        for place_id in self.place_ids:
+            if place_id not in results:
+                continue
+            result = results[place_id]
+            rows = self._reviews_to_rows(place_id, result)
+            reviews_data.extend(rows)
+
+            print(f"\nPlace: {result.get('name')}")
+            print(f"Overall Rating: {result.get('rating')}")
+            print(f"Total Reviews on Google: {result.get('user_ratings_total')}")
+            print(f"Reviews fetched: {len(rows)}")
+
+        for place_id, error in errors.items():
+            print(f"\n⚠ Failed to fetch {place_id}: {error}")
+        if not results:
+            raise Exception(f"All {len(errors)} place(s) failed to fetch")
+
         df = pd.DataFrame(reviews_data)
-        
+
+        # Compare against the review sets of the last processed run
+        previous = self._load_state()
+        self.fingerprints = {place_id: self.review_fingerprint(result)
+                             for place_id, result in results.items()}
+        self.changed_places = [place_id for place_id, fingerprint in self.fingerprints.items()
+                               if previous.get(place_id) != fingerprint]
+        self.has_changes = bool(self.changed_places)
+        if not self.has_changes:
+            print(f"\n✓ No new or changed reviews for {len(results)} place(s) "
+                  f"({self.api_calls} API calls)")
+            return df
+        print(f"\n✓ Changed places: {', '.join(self.changed_places)}")
+
         # Save to CSV
         Config.setup_directories()
         df.to_csv(Config.RAW_REVIEWS_FILE, index=False)
-        print(f"\n✓ Reviews saved to {Config.RAW_REVIEWS_FILE}")
-        
+        print(f"\n✓ {len(df)} reviews from {len(results)} place(s) saved to {Config.RAW_REVIEWS_FILE} "
+              f"({self.api_calls} API calls)")
+
         return df
@@ -0,0 +1,313 @@
+import os
+import json
+import math
+import argparse
+from datetime import datetime, timedelta
+from config import Config
+
+
+def load_usage():
+    """
+    Budget settings from api_usage.json. On first use the defaults are
+    written to it, starting at the first ledger entry (or now), so every
+    later reader sees the same budget period. Per-day counts kept in the
+    file by older versions are moved to the ledger once.
+    """
+    if not os.path.exists(Config.USAGE_FILE):
+        usage = {
+            'start_date': UsageLedger().totals()['first'] or datetime.now().isoformat(),
+            'budget': 450,
+            'days_total': 90
+        }
+        save_usage(usage)
+        return usage
+    with open(Config.USAGE_FILE) as f:
+        usage = json.load(f)
+    if 'daily_calls' in usage:
+        ledger = UsageLedger()
+        for day in usage.pop('daily_calls'):
+            ledger.append(day['requests'], at=datetime.fromisoformat(day['date']), note='imported')
+        save_usage(usage)
+    return usage
+
+
+def save_usage(usage):
+    os.makedirs(os.path.dirname(Config.USAGE_FILE) or '.', exist_ok=True)
+    with open(Config.USAGE_FILE, 'w') as f:
+        json.dump(usage, f, indent=2)
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class UsageLedger:
+    """
+    Append-only record of Places API usage, one JSON line per fetch.
+    Running totals live in a small side file that every append updates,
+    so reading them never rescans the ledger. The totals remember the
+    ledger size they cover and are rebuilt from the ledger when it has
+    changed behind their back (or the totals file is missing).
+    """
+
+    def __init__(self, path=None, totals_path=None):
+        self.path = path or Config.USAGE_LEDGER_FILE
+        self.totals_path = totals_path or Config.USAGE_TOTALS_FILE
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _rebuild_totals(self):
+        totals = {'entries': 0, 'requests': 0, 'cost': 0.0, 'first': None, 'last': None}
+        for entry in self.entries():
+            totals['entries'] += 1
+            totals['requests'] += entry['requests']
+            totals['cost'] += entry['cost']
+            totals['first'] = totals['first'] or entry['at']
+            totals['last'] = entry['at']
+        totals['cost'] = round(totals['cost'], 4)
+        totals['ledger_bytes'] = self._size()
+        _write_json(self.totals_path, totals)
+        return totals
+
+    def totals(self):
+        """{'entries', 'requests', 'cost', 'first', 'last'} over the whole ledger"""
+        if os.path.exists(self.totals_path):
+            with open(self.totals_path) as f:
+                totals = json.load(f)
+            if totals.get('ledger_bytes') == self._size():
+                return totals
+        return self._rebuild_totals()
+
+    def append(self, requests, places=(), at=None, note=None):
+        """Record `requests` API calls; returns the new entry"""
+        totals = self.totals()
+        entry = {
+            'at': (at or datetime.now()).isoformat(),
+            'requests': int(requests),
+            'cost': round(requests * Config.PLACES_COST_PER_REQUEST, 4),
+            'places': list(places)
+        }
+        if note:
+            entry['note'] = note
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+        totals['entries'] += 1
+        totals['requests'] += entry['requests']
+        totals['cost'] = round(totals['cost'] + entry['cost'], 4)
+        totals['first'] = totals['first'] or entry['at']
+        totals['last'] = entry['at']
+        totals['ledger_bytes'] = self._size()
+        _write_json(self.totals_path, totals)
+        return entry
+
+    def daily(self):
+        """{date: {'requests', 'cost'}} for reports (reads the whole ledger)"""
+        days = {}
+        for entry in self.entries():
+            day = days.setdefault(entry['at'][:10], {'requests': 0, 'cost': 0.0})
+            day['requests'] += entry['requests']
+            day['cost'] = round(day['cost'] + entry['cost'], 4)
+        return days
+
+
+class FetchScheduler:
+    """
+    Decides which places to fetch on each run.
+    Each place's review velocity (new reviews per day) is estimated from
+    the posting times of the reviews the API returns, smoothed across
+    fetches. A place is fetched again once SCHEDULE_TARGET_NEW_REVIEWS new
+    reviews are expected (the API only returns the 5 newest), within
+    [SCHEDULE_MIN_INTERVAL_HOURS, SCHEDULE_MAX_INTERVAL_HOURS]. When the
+    planned request rate would overspend the remaining budget over the
+    remaining days, every interval is stretched to fit; a run never
+    fetches more places than the remaining budget can pay for, retries
+    included. A place whose fetch fails is retried after
+    SCHEDULE_MIN_INTERVAL_HOURS, doubling with each further failure up to
+    SCHEDULE_MAX_INTERVAL_HOURS.
+    """
+
+    # Weight of the newest velocity estimate against the running one
+    SMOOTHING = 0.5
+
+    def __init__(self, place_ids=None, ledger=None, state_path=None, now=None):
+        self.place_ids = list(Config.PLACE_IDS if place_ids is None else place_ids)
+        self.ledger = ledger or UsageLedger()
+        self.state_path = state_path or Config.FETCH_SCHEDULE_FILE
+        self.now = now or datetime.now()
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+
+    def budget(self):
+        """Remaining budget, days and the request rate it allows"""
+        usage = load_usage()
+        spent = self.ledger.totals()['cost']
+        start = datetime.fromisoformat(usage['start_date'])
+        days_left = usage['days_total'] - (self.now - start).total_seconds() / 86400
+        remaining = usage['budget'] - spent
+        requests_left = max(0, math.floor(remaining / Config.PLACES_COST_PER_REQUEST + 1e-9))
+        return {
+            'budget': usage['budget'],
+            'spent': spent,
+            'remaining': remaining,
+            'days_left': days_left,
+            'requests_left': requests_left,
+            # The final day paces like a full day
+            'daily_requests': requests_left / max(days_left, 1)
+        }
+
+    def velocity_interval(self, place_id):
+        """Hours between fetches for a place's review velocity alone"""
+        rate = self.state.get(place_id, {}).get('rate')
+        if rate is None:
+            return Config.SCHEDULE_MIN_INTERVAL_HOURS
+        if rate <= 0:
+            return Config.SCHEDULE_MAX_INTERVAL_HOURS
+        hours = Config.SCHEDULE_TARGET_NEW_REVIEWS / rate * 24
+        return min(max(hours, Config.SCHEDULE_MIN_INTERVAL_HOURS), Config.SCHEDULE_MAX_INTERVAL_HOURS)
+
+    def intervals(self, budget=None):
+        """{place_id: hours between fetches}, stretched to fit the budget"""
+        budget = budget or self.budget()
+        intervals = {place_id: self.velocity_interval(place_id) for place_id in self.place_ids}
+        planned = sum(24 / hours for hours in intervals.values())
+        if planned > budget['daily_requests'] > 0:
+            stretch = planned / budget['daily_requests']
+            intervals = {place_id: hours * stretch for place_id, hours in intervals.items()}
+        return intervals
+
+    def retry_interval(self, place_id):
+        """Hours before retrying a place whose last fetches failed (None if the last one succeeded)"""
+        failures = self.state.get(place_id, {}).get('failures', 0)
+        if not failures:
+            return None
+        return min(Config.SCHEDULE_MIN_INTERVAL_HOURS * 2 ** (failures - 1), Config.SCHEDULE_MAX_INTERVAL_HOURS)
+
+    def due_places(self, force=False):
+        """
+        Places to fetch now, most overdue first. `force` ignores the
+        intervals but not the budget.
+        """
+        budget = self.budget()
+        intervals = self.intervals(budget)
+        # Runs happen every SCHEDULE_RUN_INTERVAL_HOURS; a place due before
+        # the middle of the next gap is fetched on this run
+        tolerance = Config.SCHEDULE_RUN_INTERVAL_HOURS / 2
+
+        overdue = {}
+        for place_id in self.place_ids:
+            place = self.state.get(place_id, {})
+            interval = intervals[place_id]
+            last = place.get('last_fetched')
+            # Failing places back off from their last attempt
+            if self.retry_interval(place_id) is not None:
+                interval = self.retry_interval(place_id)
+                last = place['last_attempted']
+            if last is None:
+                overdue[place_id] = math.inf
+                continue
+            elapsed = (self.now - datetime.fromisoformat(last)).total_seconds() / 3600
+            if force or elapsed + tolerance >= interval:
+                overdue[place_id] = elapsed / interval
+        due = sorted(overdue, key=overdue.get, reverse=True)
+
+        # Worst case every fetch uses all of its retries
+        affordable = budget['requests_left'] // (1 + Config.FETCH_MAX_RETRIES)
+        if len(due) > affordable:
+            print(f"⚠ Budget allows {affordable} of {len(due)} due place(s) "
+                  f"(${budget['remaining']:.2f} left)")
+            due = due[:affordable]
+        return due
+
+    def observe(self, results, errors=None):
+        """
+        Update velocities from fetched place details ({place_id: result})
+        and schedule the places' next fetch; places that failed
+        ({place_id: error}) are retried with a growing backoff.
+        """
+        for place_id, error in (errors or {}).items():
+            place = self.state.setdefault(place_id, {'rate': None, 'fetches': 0, 'newest_review': None})
+            place['failures'] = place.get('failures', 0) + 1
+            place['last_attempted'] = self.now.isoformat()
+            place['last_error'] = str(error)
+            place['next_fetch'] = (
+                self.now + timedelta(hours=self.retry_interval(place_id))
+            ).isoformat(timespec='minutes')
+
+        for place_id, result in results.items():
+            place = self.state.setdefault(place_id, {'rate': None, 'fetches': 0, 'newest_review': None})
+            times = sorted(review['time'] for review in result.get('reviews', []) if review.get('time'))
+            newest = place.get('newest_review')
+            place['new_reviews'] = sum(1 for t in times if newest is None or t > newest)
+
+            # n reviews posted between the oldest returned one and now
+            window_days = (self.now.timestamp() - times[0]) / 86400 if times else None
+            observed = len(times) / window_days if window_days and window_days > 0 else 0.0
+            place['rate'] = (observed if place['rate'] is None
+                             else self.SMOOTHING * observed + (1 - self.SMOOTHING) * place['rate'])
+            place['newest_review'] = times[-1] if times else newest
+            place['last_fetched'] = place['last_attempted'] = self.now.isoformat()
+            place['fetches'] += 1
+            place['failures'] = 0
+            place.pop('last_error', None)
+            place['name'] = result.get('name', place.get('name'))
+
+        intervals = self.intervals()
+        for place_id in results:
+            self.state[place_id]['next_fetch'] = (
+                self.now + timedelta(hours=intervals.get(place_id, Config.SCHEDULE_MIN_INTERVAL_HOURS))
+            ).isoformat(timespec='minutes')
+
+    def save(self):
+        _write_json(self.state_path, self.state)
+
+    def summary_table(self):
+        intervals = self.intervals()
+        lines = [f"{'place':<30} {'reviews/day':>11} {'every h':>8} {'fetches':>8}  next fetch"]
+        for place_id in self.place_ids:
+            place = self.state.get(place_id, {})
+            rate = place.get('rate')
+            line = (
+                f"{(place.get('name') or place_id)[:30]:<30} "
+                f"{format(rate, '.2f') if rate is not None else '-':>11} "
+                f"{intervals[place_id]:>8.1f} {place.get('fetches', 0):>8}  "
+                f"{place.get('next_fetch', 'next run').replace('T', ' ')}"
+            )
+            if place.get('failures'):
+                line += f"  (retry after {place['failures']} failure(s): {place.get('last_error')})"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the adaptive fetch schedule and budget')
+    parser.parse_args()
+
+    scheduler = FetchScheduler()
+    budget = scheduler.budget()
+    print(f"Budget: ${budget['spent']:.2f} spent of ${budget['budget']:.2f}, "
+          f"{budget['days_left']:.1f} days left "
+          f"(up to {budget['daily_requests']:.0f} requests/day)")
+    print(scheduler.summary_table())
+    due = scheduler.due_places()
+    print(f"\nDue on the next run: {', '.join(due) if due else 'none'}")
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
-import pandas as pd
 from datetime import datetime, timedelta
 import os
+from config import Config
+from review_store import ReviewStore
+from aggregates import AggregateStore
 
 def generate_weekly_report():
-    # Load all analyzed data
-    df = pd.read_csv('data/analyzed_reviews.csv')
-    df['fetched_at'] = pd.to_datetime(df['fetched_at'])
+    store = ReviewStore()
+    if not store.exists() and os.path.exists(Config.ANALYZED_REVIEWS_FILE):
+        # One-time migration of the legacy CSV history into the store
+        store.import_csv(Config.ANALYZED_REVIEWS_FILE)
     
-    # Filter last 7 days
-    week_ago = datetime.now() - timedelta(days=7)
-    df_week = df[df['fetched_at'] > week_ago]
+    aggregates = AggregateStore()
+    aggregates.sync(store)
+    
+    # Last 7 fetch days, and the 7 days before for comparison
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    week_start = today - timedelta(days=6)
+    prev_week_start = week_start - timedelta(days=7)
     
     report = []
     report.append("="*70)
@@ -17,39 +24,31 @@ def generate_weekly_report():
     report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     report.append("="*70)
     
-    report.append(f"\\nTotal Reviews This Week: {len(df_week)}")
-    report.append(f"Total Reviews Overall: {len(df)}")
+    report.append(f"\\nTotal Reviews This Week: {aggregates.total(since=week_start)}")
+    report.append(f"Total Reviews Overall: {aggregates.total()}")
     
     # Week over week comparison
-    two_weeks_ago = datetime.now() - timedelta(days=14)
-    df_prev_week = df[(df['fetched_at'] > two_weeks_ago) & (df['fetched_at'] <= week_ago)]
+    def positive_share(sentiments):
+        return sentiments.get('POSITIVE', 0) / sentiments.sum() if sentiments.sum() else 0
+    
+    sentiment_week = aggregates.counts('sentiment', since=week_start)
+    sentiment_prev_week = aggregates.counts('sentiment', since=prev_week_start, until=week_start)
     
-    if len(df_prev_week) > 0:
-        sentiment_change = (
-            df_week['sentiment_label'].value_counts(normalize=True).get('POSITIVE', 0) -
-            df_prev_week['sentiment_label'].value_counts(normalize=True).get('POSITIVE', 0)
-        ) * 100
+    if aggregates.total(since=prev_week_start, until=week_start) > 0:
+        sentiment_change = (positive_share(sentiment_week) - positive_share(sentiment_prev_week)) * 100
         report.append(f"\\nSentiment Change: {sentiment_change:+.1f}%")
     
     # Top issues this week
     report.append("\\n--- TOP CONCERNS THIS WEEK ---")
-    if len(df_week[df_week['sentiment_label'] == 'NEGATIVE']) > 0:
-        negative_week = df_week[df_week['sentiment_label'] == 'NEGATIVE']
-        report.append(f"Negative reviews: {len(negative_week)}")
+    negative_week = aggregates.total(since=week_start, sentiment='NEGATIVE')
+    if negative_week > 0:
+        report.append(f"Negative reviews: {negative_week}")
         
-        # Extract keywords from negative reviews
-        import ast
-        from collections import Counter
-        all_keywords = []
-        for keywords in negative_week['negative_keywords'].dropna():
-            try:
-                keywords = ast.literal_eval(keywords) if isinstance(keywords, str) else keywords
-                all_keywords.extend(keywords)
-            except:
-                continue
+        # Keywords from negative reviews
+        all_keywords = aggregates.counts('negative_keyword', since=week_start, sentiment='NEGATIVE')
         
-        if all_keywords:
-            for keyword, count in Counter(all_keywords).most_common(5):
+        if len(all_keywords):
+            for keyword, count in all_keywords.head(5).items():
                 report.append(f"  - {keyword}: {count} mentions")
     
     # Save report
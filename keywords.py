@@ -0,0 +1,129 @@
+import re
+import hashlib
+import argparse
+from bisect import bisect_right
+from config import Config
+
+# Words that flip the polarity of a keyword that follows within the
+# negation window ("not clean", "never friendly", "wasn't bad")
+NEGATORS = {'not', 'no', 'never', 'hardly', 'barely', 'without', 'nothing', 'nobody', 'none'}
+
+# Negation does not carry across these (review boundaries are joined with \0)
+_CLAUSE_END = re.compile(r"[.!?;:,\n\0]|\bbut\b")
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+
+def load_lexicon(path):
+    """Terms from a lexicon file: one per line, blank lines and # comments ignored"""
+    with open(path, encoding='utf-8') as f:
+        terms = [line.split('#', 1)[0].strip().lower() for line in f]
+    return list(dict.fromkeys(term for term in terms if term))
+
+
+def _trie_pattern(terms):
+    """
+    Regex alternation built from a character trie of the terms, so shared
+    prefixes are matched once instead of trying every term in turn.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        end = '' in node
+        branches = [re.escape(char).replace(r'\ ', r'\s+') + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            # Prefer the longer term; fall back to the shorter one
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Single-pass positive/negative keyword extraction.
+    Both lexicons are compiled into one word-boundary regex. A whole
+    column of reviews is joined and scanned in one pass; matches are
+    mapped back to their review by offset. A keyword preceded by a
+    negator within `negation_window` words of the same clause is
+    reported under the opposite polarity as "not <keyword>".
+    """
+
+    def __init__(self, positive=None, negative=None, negation_window=None, limit=None):
+        self.positive = positive if positive is not None else load_lexicon(Config.POSITIVE_LEXICON_FILE)
+        self.negative = negative if negative is not None else load_lexicon(Config.NEGATIVE_LEXICON_FILE)
+        self.negation_window = (negation_window if negation_window is not None
+                                else Config.KEYWORD_NEGATION_WINDOW)
+        self.limit = limit if limit is not None else Config.KEYWORD_LIMIT
+
+        # A term in both lexicons counts as negative
+        self.polarity = {term: 'positive_keywords' for term in self.positive}
+        self.polarity.update({term: 'negative_keywords' for term in self.negative})
+        self.pattern = re.compile(r"(?<![\w'])" + _trie_pattern(self.polarity) + r"(?![\w'])")
+
+    @property
+    def fingerprint(self):
+        """Identifies the lexicons and settings, for caching results"""
+        digest = hashlib.sha1()
+        for polarity in ('positive_keywords', 'negative_keywords'):
+            digest.update(polarity.encode('utf-8'))
+            digest.update('\n'.join(sorted(t for t, p in self.polarity.items() if p == polarity)).encode('utf-8'))
+        digest.update(f"{self.negation_window}|{self.limit}|{'|'.join(sorted(NEGATORS))}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def _is_negated(self, text, start):
+        window = text[max(0, start - 80):start]
+        clause_ends = list(_CLAUSE_END.finditer(window))
+        if clause_ends:
+            window = window[clause_ends[-1].end():]
+        words = _WORD.findall(window)[-self.negation_window:] if self.negation_window else []
+        return any(word in NEGATORS or word.endswith("n't") for word in words)
+
+    def extract_many(self, texts):
+        """Keywords for every review in `texts`, in one scan of the joined column"""
+        results = [{'positive_keywords': [], 'negative_keywords': []} for _ in texts]
+        lowered = [text.lower().replace('\0', ' ') if isinstance(text, str) else '' for text in texts]
+        joined = '\0'.join(lowered)
+
+        starts, offset = [], 0
+        for text in lowered:
+            starts.append(offset)
+            offset += len(text) + 1
+
+        for match in self.pattern.finditer(joined):
+            term = ' '.join(match.group().split())
+            polarity = self.polarity[term]
+            if self._is_negated(joined, match.start()):
+                polarity = 'negative_keywords' if polarity == 'positive_keywords' else 'positive_keywords'
+                term = f"not {term}"
+            found = results[bisect_right(starts, match.start()) - 1][polarity]
+            if term not in found and len(found) < self.limit:
+                found.append(term)
+        return results
+
+    def extract(self, text):
+        return self.extract_many([text])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract review keywords with the configured lexicons')
+    parser.add_argument('text', nargs='+', help='Review text(s) to match')
+    args = parser.parse_args()
+
+    matcher = KeywordMatcher()
+    print(f"{len(matcher.positive)} positive / {len(matcher.negative)} negative terms "
+          f"(lexicon {matcher.fingerprint})")
+    for text, keywords in zip(args.text, matcher.extract_many(args.text)):
+        print(f"\n{text}\n  + {', '.join(keywords['positive_keywords']) or '-'}"
+              f"\n  - {', '.join(keywords['negative_keywords']) or '-'}")
+
+if __name__ == "__main__":
+    main()
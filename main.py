@@ -1,9 +1,114 @@
+import os
+import sys
 import argparse
-from fetch_reviews import ReviewsFetcher
-from analyze_reviews import TransformerAnalyzer
-from visualize_results import ResultsVisualizer
 from config import Config
-import pandas as pd
+from telemetry import telemetry
+
+# Heavy modules (pandas, torch, transformers, plotly) are imported inside
+# the steps that use them, so --fetch and --visualize never load torch.
+
+def run_fetch(force=False):
+    """
+    Fetch the places that are due (all places with FETCH_SCHEDULE=0),
+    recording the API calls in the usage ledger
+    """
+    import pandas as pd
+    from fetch_reviews import ReviewsFetcher
+    from fetch_scheduler import FetchScheduler, UsageLedger
+    scheduler = FetchScheduler() if Config.FETCH_SCHEDULE_ENABLED else None
+    fetcher = ReviewsFetcher(scheduler.due_places(force) if scheduler else None)
+    if not fetcher.place_ids:
+        print("⏭ No places are due for a fetch on this run")
+        fetcher.has_changes = False
+        return fetcher, pd.DataFrame()
+    try:
+        with telemetry.stage('fetch'):
+            df = fetcher.fetch_and_save_reviews()
+    except Exception:
+        # Scheduled places that all failed are retried with a backoff on
+        # later runs; a run with nothing fetched has no changes
+        if not scheduler or fetcher.results or set(fetcher.errors) != set(fetcher.place_ids):
+            raise
+        print("⏭ Every due place failed to fetch; retrying them on a later run")
+        fetcher.has_changes = False
+        df = pd.DataFrame()
+    finally:
+        telemetry.count('api_calls', fetcher.api_calls)
+        UsageLedger().append(fetcher.api_calls, fetcher.place_ids)
+        if scheduler:
+            scheduler.observe(fetcher.results, fetcher.errors)
+            scheduler.save()
+    return fetcher, df
+
+def run_analysis(df, stages=None, workers=None):
+    from analyze_reviews import TransformerAnalyzer
+    analyzer = TransformerAnalyzer(stages=stages)
+    telemetry.count('reviews', len(df))
+    with telemetry.stage('analyze'):
+        return analyzer.analyze_all_reviews(df, workers=workers)
+
+def save_analysis(df_analyzed):
+    """Write the CSV export, append new reviews to the columnar store and update the counts"""
+    from review_store import ReviewStore
+    from aggregates import AggregateStore
+    with telemetry.stage('persist'):
+        df_analyzed.to_csv(Config.ANALYZED_REVIEWS_FILE, index=False)
+        written = ReviewStore().write(df_analyzed)
+        AggregateStore().update(df_analyzed)
+    print(f"✓ {written} new reviews added to {Config.REVIEW_STORE_DIR}")
+
+def run_streaming_analysis(path, args):
+    """Analyze and persist the reviews in `path` chunk by chunk"""
+    from analyze_reviews import TransformerAnalyzer
+    from streaming import StreamingPipeline
+    analyzer = TransformerAnalyzer(stages=args.stages)
+    pipeline = StreamingPipeline(analyzer, chunk_size=args.chunk_size, workers=args.workers)
+    print(f"Streaming {path} in chunks of {pipeline.chunk_size} reviews...")
+    # Streaming interleaves analysis and persistence, so both count as 'analyze'
+    with telemetry.stage('analyze'):
+        processed, written = pipeline.run(path, resume=args.resume)
+    telemetry.count('reviews', processed)
+    print(f"\n✓ {processed} reviews analyzed, {written} new reviews added to {Config.REVIEW_STORE_DIR}")
+
+def open_review_store():
+    """The analyzed review history (migrating the CSV on first use)"""
+    from review_store import ReviewStore
+    store = ReviewStore()
+    if not store.exists():
+        store.import_csv(Config.ANALYZED_REVIEWS_FILE)
+    return store
+
+def report_changes(has_changes):
+    """Expose whether anything changed to later GitHub Actions steps"""
+    if os.getenv('GITHUB_OUTPUT'):
+        with open(os.getenv('GITHUB_OUTPUT'), 'a') as f:
+            f.write(f"changed={'true' if has_changes else 'false'}\n")
+
+def run_visualization():
+    """Dashboard and summary from the aggregates plus the per-review columns the plots need"""
+    from aggregates import AggregateStore
+    from visualize_results import ResultsVisualizer
+    with telemetry.stage('visualize'):
+        store = open_review_store()
+        aggregates = AggregateStore()
+        aggregates.sync(store)
+        columns = ['rating', 'sentiment_label', 'sentiment_score', 'time']
+        if store.count() <= Config.DASHBOARD_MAX_POINTS:
+            # Hover text is only shown when reviews are plotted individually
+            columns.append('text')
+        visualizer = ResultsVisualizer(store.read(columns=columns), aggregates)
+        visualizer.create_dashboard()
+        visualizer.generate_summary_report()
+
+def run_watch(args):
+    """Poll the places and alert on new negative reviews until interrupted"""
+    from analyze_reviews import TransformerAnalyzer
+    from watch import ReviewWatcher, make_sink
+    sinks = [make_sink(name) for name in (args.alert_sinks or Config.WATCH_ALERT_SINKS)]
+    analyzer = TransformerAnalyzer(stages=args.stages)
+    # Load the models before the first poll so alerts never wait on them
+    analyzer.load_models()
+    ReviewWatcher(analyzer, sinks, interval=args.interval).run(max_polls=args.polls)
 
 def main():
     parser = argparse.ArgumentParser(description='Google Reviews Sentiment Analysis')
@@ -11,50 +116,104 @@ def main():
     parser.add_argument('--analyze', action='store_true', help='Analyze reviews with Transformers')
     parser.add_argument('--visualize', action='store_true', help='Create visualizations')
     parser.add_argument('--all', action='store_true', help='Run complete pipeline')
+    parser.add_argument('--stages', type=lambda value: [s.strip() for s in value.split(',') if s.strip()],
+                        help=f'Comma-separated analysis stages to run ({",".join(Config.ALL_ANALYSIS_STAGES)}; '
+                             f'default: ANALYSIS_STAGES={",".join(Config.ANALYSIS_STAGES)})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Analyze reviews in N worker processes (default: 1)')
+    parser.add_argument('--force', action='store_true',
+                        help='Run the full pipeline even if no reviews changed')
+    parser.add_argument('--stream', action='store_true',
+                        help='Analyze and persist reviews in checkpointed chunks')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume an interrupted --stream run after its last committed chunk')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help=f'Reviews per chunk in streaming mode (default: {Config.STREAM_CHUNK_SIZE})')
+    parser.add_argument('--input', default=Config.RAW_REVIEWS_FILE,
+                        help='Reviews CSV to analyze, e.g. an imported dump (default: raw fetched reviews)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Poll the places and alert on new negative reviews until interrupted')
+    parser.add_argument('--interval', type=float, default=None,
+                        help=f'Seconds between watch polls (default: {Config.WATCH_INTERVAL:g})')
+    parser.add_argument('--alert-sinks', type=lambda value: [s.strip() for s in value.split(',') if s.strip()],
+                        help='Comma-separated alert sinks: stdout, file, webhook or module:Class '
+                             f'(default: {",".join(Config.WATCH_ALERT_SINKS)})')
+    parser.add_argument('--polls', type=int, default=None, help='Stop watching after N polls')
     
     args = parser.parse_args()
+    # Resuming only makes sense for a streaming run
+    args.stream = args.stream or args.resume
     
     Config.setup_directories()
     
+    telemetry.info.update({
+        'command': ' '.join(sys.argv[1:]),
+        'stages': args.stages or Config.ANALYSIS_STAGES,
+        'backend': Config.INFERENCE_BACKEND,
+        'category_engine': Config.CATEGORY_ENGINE,
+        'batch_size': Config.BATCH_SIZE,
+        'workers': args.workers or Config.ANALYSIS_WORKERS
+    })
+    try:
+        run_pipeline(args, parser)
+    finally:
+        telemetry_file = telemetry.save()
+        if telemetry_file:
+            print(f"\n✓ Run telemetry saved to {telemetry_file}")
+
+def run_pipeline(args, parser):
+    if args.watch:
+        run_watch(args)
+        return
+    
     # Run complete pipeline
     if args.all or (args.fetch and args.analyze and args.visualize):
         print("\n🚀 Running complete analysis pipeline...\n")
         
-        # Step 1: Fetch reviews
-        fetcher = ReviewsFetcher()
-        df = fetcher.fetch_and_save_reviews()
+        # Step 1: Fetch reviews (a resumed run continues on the reviews
+        # already fetched instead of fetching new ones)
+        fetcher = None
+        if not args.resume:
+            fetcher, df = run_fetch(args.force)
+            report_changes(fetcher.has_changes or args.force)
+            if not fetcher.has_changes and not args.force:
+                print("\n⏭ No new or changed reviews since the last run - "
+                      "skipping analysis and visualization (use --force to run anyway).")
+                return
         
         # Step 2: Analyze with Transformers
-        analyzer = TransformerAnalyzer()
-        df_analyzed = analyzer.analyze_all_reviews(df)
-        df_analyzed.to_csv(Config.ANALYZED_REVIEWS_FILE, index=False)
+        if args.stream:
+            run_streaming_analysis(Config.RAW_REVIEWS_FILE, args)
+        else:
+            df_analyzed = run_analysis(df, args.stages, args.workers)
+            save_analysis(df_analyzed)
         print(f"\n✓ Analysis complete! Saved to {Config.ANALYZED_REVIEWS_FILE}")
         
         # Step 3: Create visualizations
-        visualizer = ResultsVisualizer(df_analyzed)
-        visualizer.create_dashboard()
-        visualizer.generate_summary_report()
+        run_visualization()
+        if fetcher is not None:
+            fetcher.save_state()
         
         print("\n✅ All done! Check the 'visualizations' folder for results.")
         return
     
     # Individual steps
     if args.fetch:
-        fetcher = ReviewsFetcher()
-        fetcher.fetch_and_save_reviews()
+        fetcher, _ = run_fetch(args.force)
+        fetcher.save_state()
+        report_changes(fetcher.has_changes)
     
-    if args.analyze:
-        df = pd.read_csv(Config.RAW_REVIEWS_FILE)
-        analyzer = TransformerAnalyzer()
-        df_analyzed = analyzer.analyze_all_reviews(df)
-        df_analyzed.to_csv(Config.ANALYZED_REVIEWS_FILE, index=False)
+    if args.analyze and args.stream:
+        run_streaming_analysis(args.input, args)
+    elif args.analyze:
+        import pandas as pd
+        df = pd.read_csv(args.input)
+        df_analyzed = run_analysis(df, args.stages, args.workers)
+        save_analysis(df_analyzed)
         print(f"\n✓ Analysis saved to {Config.ANALYZED_REVIEWS_FILE}")
     
     if args.visualize:
-        df = pd.read_csv(Config.ANALYZED_REVIEWS_FILE)
-        visualizer = ResultsVisualizer(df)
-        visualizer.create_dashboard()
-        visualizer.generate_summary_report()
+        run_visualization()
     
     if not any([args.fetch, args.analyze, args.visualize, args.all]):
         parser.print_help()
@@ -0,0 +1,234 @@
+import os
+import re
+import glob
+import json
+import mmap
+import shutil
+import struct
+import hashlib
+import argparse
+from datetime import datetime
+import torch
+import transformers
+from transformers import AutoConfig, AutoTokenizer
+from transformers.modeling_utils import no_init_weights
+from config import Config
+
+BUNDLE_FORMAT = 1
+WEIGHTS_FILE = 'model.safetensors'
+
+# safetensors dtype names
+_DTYPES = {
+    'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+    'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8,
+    'U8': torch.uint8, 'BOOL': torch.bool
+}
+
+
+def bundle_path(version):
+    return os.path.join(Config.MODEL_BUNDLES_DIR, f"v{version}")
+
+
+def _bundle_version(path):
+    match = re.search(r'v(\d+)$', path.rstrip('/'))
+    return int(match.group(1)) if match else 0
+
+
+def bundles():
+    """Exported bundle directories, oldest first"""
+    paths = [path for path in glob.glob(os.path.join(Config.MODEL_BUNDLES_DIR, 'v*'))
+             if os.path.exists(os.path.join(path, 'manifest.json'))]
+    return sorted(paths, key=_bundle_version)
+
+
+def read_manifest(path):
+    with open(os.path.join(path, 'manifest.json')) as f:
+        return json.load(f)
+
+
+def find_bundle_model(role, model_name):
+    """
+    Directory holding `model_name` for `role` in the configured bundle
+    (MODEL_BUNDLE, else the newest one that has it), or None.
+    """
+    if not Config.MODEL_BUNDLE_ENABLED:
+        return None
+    candidates = [Config.MODEL_BUNDLE] if Config.MODEL_BUNDLE else reversed(bundles())
+    for path in candidates:
+        entry = read_manifest(path)['roles'].get(role)
+        if entry and entry['model'] == model_name:
+            return os.path.join(path, entry['path'])
+    if Config.MODEL_BUNDLE:
+        print(f"⚠ Bundle {Config.MODEL_BUNDLE} has no {role} model {model_name}; loading from the hub cache")
+    return None
+
+
+def mmap_state_dict(path):
+    """
+    Tensors of a safetensors file backed by a private memory map of it:
+    pages are read on first use and shared with every other process
+    mapping the same file until written to (inference never writes).
+    """
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    data_start = 8 + header_size
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == '__metadata__':
+            continue
+        dtype = _DTYPES[info['dtype']]
+        begin, end = info['data_offsets']
+        if end == begin:
+            state_dict[name] = torch.empty(info['shape'], dtype=dtype)
+            continue
+        count = (end - begin) // torch.empty(0, dtype=dtype).element_size()
+        state_dict[name] = torch.frombuffer(buffer, dtype=dtype, count=count,
+                                            offset=data_start + begin).reshape(info['shape'])
+    return state_dict
+
+
+def load_model(directory, model_class):
+    """Instantiate a bundled model without initializing weights, then point it at the mapped file"""
+    config = AutoConfig.from_pretrained(directory, local_files_only=True)
+    with no_init_weights():
+        model = model_class.from_config(config)
+    missing, unexpected = model.load_state_dict(
+        mmap_state_dict(os.path.join(directory, WEIGHTS_FILE)), strict=False, assign=True
+    )
+    # Tied weights are stored once; after tying they share a loaded tensor
+    model.tie_weights()
+    state = model.state_dict()
+    loaded = {state[key].data_ptr() for key in state if key not in missing}
+    missing = [key for key in missing if state[key].data_ptr() not in loaded]
+    if missing or unexpected:
+        raise ValueError(f"Bundle weights in {directory} do not match {model_class.__name__}: "
+                         f"missing {missing[:5]}, unexpected {unexpected[:5]}")
+    return model.eval()
+
+
+def load_tokenizer(directory):
+    return AutoTokenizer.from_pretrained(directory, local_files_only=True)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export(roles=None, force=False, keep=3):
+    """
+    Export the configured models into the next bundle version. Returns
+    the bundle path, or None when the newest bundle already holds them.
+    """
+    from analyze_reviews import TransformerAnalyzer
+
+    if roles is None:
+        roles = ['sentiment', 'emotion', 'categories']
+        if 'embedding' in Config.ANALYSIS_STAGES:
+            roles.append('embedding')
+    models = {role: getattr(Config, TransformerAnalyzer.PIPELINES[role][1]) for role in roles}
+
+    existing = bundles()
+    if existing and not force:
+        bundled = {role: entry['model'] for role, entry in read_manifest(existing[-1])['roles'].items()}
+        if all(bundled.get(role) == model_name for role, model_name in models.items()):
+            print(f"⏭ {existing[-1]} already holds the configured models (use --force to re-export)")
+            return None
+
+    version = _bundle_version(existing[-1]) + 1 if existing else 1
+    path = bundle_path(version)
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'version': version,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'transformers': transformers.__version__,
+        'torch': torch.__version__,
+        'roles': {}
+    }
+    for role, model_name in models.items():
+        model_class = TransformerAnalyzer.model_class(role)
+        print(f"Exporting {role} model ({model_name})...")
+        directory = os.path.join(tmp_path, role)
+        model_class.from_pretrained(model_name).save_pretrained(directory, safe_serialization=True)
+        AutoTokenizer.from_pretrained(model_name).save_pretrained(directory)
+        weights = os.path.join(directory, WEIGHTS_FILE)
+        manifest['roles'][role] = {
+            'model': model_name,
+            'model_class': model_class.__name__,
+            'task': TransformerAnalyzer.PIPELINES[role][0],
+            'path': role,
+            'bytes': os.path.getsize(weights),
+            'sha256': _sha256(weights)
+        }
+
+    with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    prune_bundles(keep)
+    return path
+
+
+def prune_bundles(keep):
+    """Delete all but the `keep` newest bundles"""
+    for path in bundles()[:-keep] if keep > 0 else []:
+        shutil.rmtree(path)
+
+
+def verify(path):
+    """Roles whose weights no longer match the manifest checksum"""
+    manifest = read_manifest(path)
+    return [role for role, entry in manifest['roles'].items()
+            if _sha256(os.path.join(path, entry['path'], WEIGHTS_FILE)) != entry['sha256']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export and inspect local model bundles')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Export the configured models into a new bundle')
+    export_parser.add_argument('--roles', type=lambda value: [r.strip() for r in value.split(',') if r.strip()],
+                               help='Comma-separated roles (default: sentiment,emotion,categories '
+                                    'plus embedding when that stage is configured)')
+    export_parser.add_argument('--force', action='store_true', help='Export even if the newest bundle is current')
+    export_parser.add_argument('--keep', type=int, default=3, help='Bundle versions to keep')
+    subparsers.add_parser('list', help='List bundles and their models')
+    verify_parser = subparsers.add_parser('verify', help='Check bundled weights against the manifest')
+    verify_parser.add_argument('path', nargs='?', help='Bundle directory (default: newest)')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        path = export(args.roles, args.force, args.keep)
+        if path:
+            manifest = read_manifest(path)
+            size = sum(entry['bytes'] for entry in manifest['roles'].values())
+            print(f"✓ Bundle v{manifest['version']} ({size / 1e6:.0f} MB) saved to {path}")
+    elif args.command == 'list':
+        paths = bundles()
+        if not paths:
+            print("No bundles yet (run: python model_bundle.py export)")
+        for path in paths:
+            manifest = read_manifest(path)
+            print(f"v{manifest['version']}  {manifest['created_at']}  {path}")
+            for role, entry in manifest['roles'].items():
+                print(f"    {role:<11} {entry['model']} ({entry['bytes'] / 1e6:.0f} MB)")
+    else:
+        path = args.path or (bundles() or [None])[-1]
+        if path is None:
+            print("No bundles yet (run: python model_bundle.py export)")
+            return
+        corrupted = verify(path)
+        if corrupted:
+            print(f"⚠ Weights changed since export in {path}: {', '.join(corrupted)}")
+            raise SystemExit(1)
+        print(f"✓ {path} matches its manifest")
+
+if __name__ == "__main__":
+    main()
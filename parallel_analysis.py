@@ -0,0 +1,80 @@
+import os
+import time
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import Config
+
+# More shards than workers keeps every core busy when shards differ in cost
+SHARDS_PER_WORKER = 4
+
+_worker_analyzer = None
+
+def threads_per_worker(workers):
+    """Intra-op threads per worker so workers x threads never exceeds the cores"""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+def _init_worker(config_values, stages, backend, threads):
+    """Pin torch threads and load this worker's own models once"""
+    global _worker_analyzer
+
+    # Workers are spawned fresh, so carry over runtime Config changes
+    for name, value in config_values.items():
+        setattr(Config, name, value)
+
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    from analyze_reviews import TransformerAnalyzer
+    _worker_analyzer = TransformerAnalyzer(use_cache=False, use_dedup=False, stages=stages, backend=backend)
+    _worker_analyzer.load_models()
+
+def _analyze_shard(shard_index, texts):
+    start = time.perf_counter()
+    results = _worker_analyzer.analyze_batch(texts)
+    return shard_index, results, os.getpid(), time.perf_counter() - start
+
+def analyze_texts_sharded(texts, workers, stages=None, backend=None, progress=None):
+    """
+    Analyze reviews in a pool of `workers` processes.
+    Texts are split into contiguous shards, each worker holds its own
+    models with pinned thread counts, and results are merged back in
+    the original order regardless of which shard finishes first.
+    """
+    if not texts:
+        return []
+
+    n_shards = min(len(texts), workers * SHARDS_PER_WORKER)
+    bounds = [round(i * len(texts) / n_shards) for i in range(n_shards + 1)]
+    shards = [texts[bounds[i]:bounds[i + 1]] for i in range(n_shards)]
+
+    threads = threads_per_worker(workers)
+    config_values = {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+    print(f"Analyzing {len(texts)} reviews in {n_shards} shards "
+          f"with {workers} workers x {threads} threads")
+
+    shard_results = [None] * n_shards
+    worker_stats = defaultdict(lambda: {'reviews': 0, 'seconds': 0.0})
+
+    # spawn gives every worker a clean torch runtime instead of a forked copy
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(config_values, stages, backend, threads)) as pool:
+        futures = [pool.submit(_analyze_shard, i, shard) for i, shard in enumerate(shards)]
+        for future in as_completed(futures):
+            shard_index, results, pid, seconds = future.result()
+            shard_results[shard_index] = results
+            worker_stats[pid]['reviews'] += len(results)
+            worker_stats[pid]['seconds'] += seconds
+            if progress is not None:
+                progress.update(len(results))
+
+    print("\nPer-worker throughput:")
+    for worker, (pid, stats) in enumerate(sorted(worker_stats.items()), start=1):
+        rate = stats['reviews'] / stats['seconds'] if stats['seconds'] else 0
+        print(f"  worker {worker} (pid {pid}): {stats['reviews']} reviews "
+              f"in {stats['seconds']:.1f}s ({rate:.1f} reviews/sec)")
+
+    return [result for results in shard_results for result in results]
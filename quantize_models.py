@@ -0,0 +1,148 @@
+import os
+import re
+import json
+import time
+import argparse
+import torch
+import pandas as pd
+from transformers import AutoConfig, AutoModelForSequenceClassification
+from config import Config
+
+def quantized_model_path(model_name):
+    """Location of the cached int8 weights for a model"""
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '--', model_name.strip('/'))
+    # Quantized state dicts are tied to the torch version that produced them
+    return os.path.join(Config.QUANTIZED_MODELS_DIR,
+                        f"{safe_name}-int8-torch{torch.__version__.split('+')[0]}.pt")
+
+def _quantize(model):
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_quantized_model(model_name, model_class=AutoModelForSequenceClassification, source=None):
+    """
+    Load a model (sequence classification unless `model_class` says
+    otherwise) with dynamic int8 quantization of its Linear layers. The
+    quantized weights are cached under Config.QUANTIZED_MODELS_DIR, so
+    later runs skip the fp32 checkpoint. `source` is a local copy of the
+    model (a bundle directory) to read its config and weights from.
+    """
+    source = source or model_name
+    path = quantized_model_path(model_name)
+    if model_class is not AutoModelForSequenceClassification:
+        path = path.replace('-int8-', f'-{model_class.__name__}-int8-')
+
+    if os.path.exists(path):
+        config = AutoConfig.from_pretrained(source)
+        model = _quantize(model_class.from_config(config).eval())
+        model.load_state_dict(torch.load(path))
+        return model
+
+    print(f"Quantizing {model_name} to int8 (first run only)...")
+    model = _quantize(model_class.from_pretrained(source).eval())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    torch.save(model.state_dict(), path)
+    print(f"✓ Quantized weights cached at {path}")
+    return model
+
+
+def _timed_analysis(analyzer, texts):
+    start = time.perf_counter()
+    results = analyzer.analyze_batch(texts)
+    return results, time.perf_counter() - start
+
+def parity_check(texts, stages=None):
+    """
+    Analyze the same reviews with the fp32 and int8 backends and report
+    label agreement, score drift and speedup. Categories always come from
+    the zero-shot model: the distilled engine would answer most reviews
+    for both backends with the same TF-IDF classifier.
+    """
+    from analyze_reviews import TransformerAnalyzer
+
+    engine = Config.CATEGORY_ENGINE
+    if engine not in ('fast', 'pipeline'):
+        Config.CATEGORY_ENGINE = 'fast'
+    try:
+        fp32 = TransformerAnalyzer(use_cache=False, use_dedup=False, stages=stages, backend='fp32')
+        int8 = TransformerAnalyzer(use_cache=False, use_dedup=False, stages=stages, backend='int8')
+
+        # Warm up so model loading and quantization are not timed
+        fp32.analyze_batch(texts[:1])
+        int8.analyze_batch(texts[:1])
+
+        fp32_results, fp32_seconds = _timed_analysis(fp32, texts)
+        int8_results, int8_seconds = _timed_analysis(int8, texts)
+    finally:
+        Config.CATEGORY_ENGINE = engine
+
+    pairs = [(a, b) for a, b in zip(fp32_results, int8_results) if a and b]
+    n = max(len(pairs), 1)
+    report = {
+        'reviews': len(pairs),
+        'fp32_seconds': fp32_seconds,
+        'int8_seconds': int8_seconds,
+        'speedup': fp32_seconds / int8_seconds if int8_seconds else None
+    }
+
+    def drift(values):
+        return {'mean': sum(values) / max(len(values), 1), 'max': max(values, default=0.0)}
+
+    if pairs and 'sentiment_label' in pairs[0][0]:
+        report['sentiment_label_agreement'] = sum(
+            a['sentiment_label'] == b['sentiment_label'] for a, b in pairs) / n
+        report['sentiment_score_drift'] = drift(
+            [abs(a['sentiment_score'] - b['sentiment_score']) for a, b in pairs])
+
+    if pairs and 'primary_emotion' in pairs[0][0]:
+        report['primary_emotion_agreement'] = sum(
+            a['primary_emotion'] == b['primary_emotion'] for a, b in pairs) / n
+        report['emotion_score_drift'] = drift([
+            abs(score - b['all_emotions'].get(label, 0))
+            for a, b in pairs for label, score in a['all_emotions'].items()
+        ])
+
+    if pairs and 'categories' in pairs[0][0]:
+        report['category_set_agreement'] = sum(
+            set(a['categories']) == set(b['categories']) for a, b in pairs) / n
+        report['category_score_drift'] = drift([
+            abs(score - b['category_scores'][label])
+            for a, b in pairs for label, score in a['category_scores'].items()
+            if label in b['category_scores']
+        ])
+
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize models to int8 and check parity with fp32')
+    parser.add_argument('--input', default=Config.RAW_REVIEWS_FILE, help='CSV with a text column')
+    parser.add_argument('--limit', type=int, default=200, help='Number of reviews to compare')
+    parser.add_argument('--stages', type=lambda value: [s.strip() for s in value.split(',') if s.strip()],
+                        help='Comma-separated analysis stages to compare (default: all)')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input)
+    texts = [t for t in df['text'].dropna().tolist() if len(t.strip()) >= 10][:args.limit]
+
+    report = parity_check(texts, args.stages)
+
+    print("\n" + "=" * 60)
+    print("INT8 vs FP32 PARITY CHECK")
+    print("=" * 60)
+    print(f"Reviews compared: {report['reviews']}")
+    print(f"fp32: {report['fp32_seconds']:.2f}s | int8: {report['int8_seconds']:.2f}s | "
+          f"speedup: {report['speedup'] or 0:.2f}x")
+    for key, value in report.items():
+        if key.endswith('_agreement'):
+            print(f"{key}: {value:.1%}")
+        elif key.endswith('_drift'):
+            print(f"{key}: mean {value['mean']:.4f}, max {value['max']:.4f}")
+
+    os.makedirs(Config.QUANTIZED_MODELS_DIR, exist_ok=True)
+    report_file = os.path.join(Config.QUANTIZED_MODELS_DIR, 'parity_report.json')
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Parity report saved to {report_file}")
+    return report
+
+if __name__ == "__main__":
+    main()
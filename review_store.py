@@ -0,0 +1,227 @@
+import os
+import ast
+import uuid
+import hashlib
+import argparse
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from config import Config
+
+LABEL = pa.dictionary(pa.int32(), pa.string())
+SCORES = pa.list_(pa.struct([('label', pa.string()), ('score', pa.float32())]))
+
+# Typed schema of the analyzed review history. Label columns are
+# dictionary-encoded (categorical in pandas) and scores are float32.
+SCHEMA = pa.schema([
+    ('review_id', pa.string()),
+    ('place_id', pa.string()),
+    ('place_name', pa.string()),
+    ('author_name', pa.string()),
+    ('rating', pa.int8()),
+    ('text', pa.string()),
+    ('time', pa.timestamp('us')),
+    ('relative_time', pa.string()),
+    ('language', LABEL),
+    ('profile_photo_url', pa.string()),
+    ('fetched_at', pa.timestamp('us')),
+    ('token_count', pa.int32()),
+    ('sentiment_label', LABEL),
+    ('sentiment_score', pa.float32()),
+    ('primary_emotion', LABEL),
+    ('primary_emotion_score', pa.float32()),
+    ('secondary_emotion', LABEL),
+    ('secondary_emotion_score', pa.float32()),
+    ('all_emotions', SCORES),
+    ('categories', pa.list_(pa.string())),
+    ('category_scores', SCORES),
+    ('category_source', LABEL),
+    ('positive_keywords', pa.list_(pa.string())),
+    ('negative_keywords', pa.list_(pa.string())),
+    ('duplicate_cluster', pa.string()),
+    ('duplicate_similarity', pa.float32()),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('fetch_date', pa.string())]), flavor='hive')
+
+LIST_COLUMNS = ['categories', 'positive_keywords', 'negative_keywords']
+SCORE_COLUMNS = ['all_emotions', 'category_scores']
+TIMESTAMP_COLUMNS = ['time', 'fetched_at']
+
+
+def review_ids(df):
+    """Stable id per review: place, author, posting time and text"""
+    times = pd.to_datetime(df['time']).astype('int64') // 10**9
+    places = df['place_id'] if 'place_id' in df.columns else pd.Series('', index=df.index)
+    keys = (places.fillna('').astype(str) + '\0' + df['author_name'].fillna('').astype(str) + '\0'
+            + times.astype(str) + '\0' + df['text'].fillna('').astype(str))
+    return keys.map(lambda key: hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+
+def _parse_literal(value):
+    """Legacy CSV cells hold str(list) / str(dict)"""
+    if isinstance(value, str):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return None
+    return value
+
+
+def _scores_to_struct(value):
+    if isinstance(value, dict):
+        return [{'label': label, 'score': score} for label, score in value.items()]
+    return value
+
+
+class ReviewStore:
+    """
+    Columnar history of analyzed reviews.
+    Reviews are stored as Parquet partitioned by fetch date
+    (data/reviews/fetch_date=YYYY-MM-DD/*.parquet) with native list and
+    struct columns, so readers can prune partitions, read only the columns
+    they need and never re-parse stringified cells. Each review is stored
+    once, in the partition of the day it was first fetched.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.REVIEW_STORE_DIR
+
+    def exists(self):
+        return os.path.isdir(self.path) and any(
+            name.endswith('.parquet')
+            for _, _, files in os.walk(self.path) for name in files
+        )
+
+    def _dataset(self):
+        return ds.dataset(self.path, format='parquet', partitioning=PARTITIONING,
+                          schema=SCHEMA.append(pa.field('fetch_date', pa.string())))
+
+    def _to_table(self, df):
+        df = df.copy()
+        for column in TIMESTAMP_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column])
+        df['review_id'] = review_ids(df)
+        df = df.drop_duplicates('review_id')
+        for column in LIST_COLUMNS + SCORE_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].map(_parse_literal)
+        for column in SCORE_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].map(_scores_to_struct)
+        for field in SCHEMA:
+            if field.name not in df.columns:
+                df[field.name] = None
+        return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+    def write(self, df):
+        """
+        Append analyzed reviews that are not in the store yet.
+        Returns the number of new reviews written.
+        """
+        table = self._to_table(df)
+
+        if self.exists():
+            existing = self._dataset().to_table(columns=['review_id']).column('review_id')
+            is_new = pc.invert(pc.is_in(table.column('review_id'), value_set=existing))
+            table = table.filter(is_new)
+        if table.num_rows == 0:
+            return 0
+
+        fetch_dates = pc.strftime(table.column('fetched_at'), format='%Y-%m-%d')
+        table = table.append_column('fetch_date', fetch_dates)
+        ds.write_dataset(
+            table,
+            self.path,
+            format='parquet',
+            partitioning=PARTITIONING,
+            basename_template=f"part-{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+        return table.num_rows
+
+    def read(self, columns=None, since=None, where=None):
+        """
+        Load reviews as a DataFrame.
+        `since` (a datetime) prunes fetch-date partitions and filters on
+        fetched_at; `where` is an extra pyarrow dataset expression.
+        """
+        if not self.exists():
+            return pd.DataFrame(columns=columns or SCHEMA.names)
+
+        expression = where
+        if since is not None:
+            window = ((ds.field('fetch_date') >= since.strftime('%Y-%m-%d'))
+                      & (ds.field('fetched_at') > pa.scalar(since, type=pa.timestamp('us'))))
+            expression = window if expression is None else expression & window
+
+        table = self._dataset().to_table(columns=columns or SCHEMA.names, filter=expression)
+        return table.to_pandas()
+
+    def rewrite(self, transform):
+        """
+        Replace each Parquet file with `transform` applied to its rows
+        (DataFrame in, same reviews out), keeping files in their fetch-date
+        partition. Files are swapped in atomically one at a time.
+        """
+        if not self.exists():
+            return 0
+        rewritten = 0
+        for directory, _, files in sorted(os.walk(self.path)):
+            for name in sorted(files):
+                if not name.endswith('.parquet'):
+                    continue
+                path = os.path.join(directory, name)
+                df = ds.dataset(path, format='parquet', schema=SCHEMA).to_table().to_pandas()
+                table = self._to_table(transform(df))
+                # Dot-prefixed files are ignored by dataset discovery
+                tmp_path = os.path.join(directory, f".{name}.tmp")
+                pq.write_table(table, tmp_path)
+                os.replace(tmp_path, path)
+                rewritten += table.num_rows
+        return rewritten
+
+    def count(self):
+        if not self.exists():
+            return 0
+        return self._dataset().count_rows()
+
+    def import_csv(self, path):
+        """Load a legacy analyzed_reviews.csv (stringified cells) into the store"""
+        return self.write(pd.read_csv(path))
+
+    def export_csv(self, path):
+        """Export the full history in the analyzed_reviews.csv format"""
+        df = self.read()
+        for column in SCORE_COLUMNS:
+            df[column] = df[column].map(
+                lambda items: {item['label']: item['score'] for item in items} if items is not None else {}
+            )
+        for column in LIST_COLUMNS:
+            df[column] = df[column].map(lambda items: list(items) if items is not None else [])
+        df.to_csv(path, index=False)
+        return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the columnar review store')
+    parser.add_argument('--import-csv', metavar='PATH', help='Import a legacy analyzed reviews CSV')
+    parser.add_argument('--export-csv', metavar='PATH', help='Export the full history as CSV')
+    args = parser.parse_args()
+
+    store = ReviewStore()
+    if args.import_csv:
+        written = store.import_csv(args.import_csv)
+        print(f"✓ Imported {written} new reviews into {store.path}")
+    if args.export_csv:
+        exported = store.export_csv(args.export_csv)
+        print(f"✓ Exported {exported} reviews to {args.export_csv}")
+    if not (args.import_csv or args.export_csv):
+        print(f"{store.count()} reviews in {store.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+import json
+from datetime import datetime
+import pandas as pd
+from tqdm import tqdm
+from config import Config
+from review_store import ReviewStore
+from aggregates import AggregateStore
+
+
+def source_fingerprint(path, chunk_size):
+    """Identifies an input file and chunking, so a checkpoint is only resumed on the same input"""
+    stat = os.stat(path)
+    return {
+        'source': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'chunk_size': chunk_size
+    }
+
+
+def iter_csv_chunks(path, chunk_size, start_chunk=0):
+    """Yield (chunk_index, DataFrame) from a CSV, skipping the first `start_chunk` chunks unparsed"""
+    skip = start_chunk * chunk_size
+    reader = pd.read_csv(path, chunksize=chunk_size,
+                         skiprows=range(1, skip + 1) if skip else None)
+    for offset, chunk in enumerate(reader):
+        yield start_chunk + offset, chunk.reset_index(drop=True)
+
+
+class Checkpoint:
+    """Last committed chunk of a streaming run, written atomically after each chunk"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.STREAM_CHECKPOINT_FILE
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class StreamingPipeline:
+    """
+    Moves reviews through analyze -> persist in fixed-size chunks.
+    Each chunk is analyzed, appended to the review store, the aggregates
+    and the analyzed CSV, and then checkpointed, so only one chunk is
+    held in memory and an interrupted run resumes after the last
+    committed chunk. A chunk interrupted between persisting and
+    checkpointing is redone; the store and aggregates skip reviews they
+    already hold and the analysis cache makes the rerun cheap.
+    """
+
+    def __init__(self, analyzer, chunk_size=None, checkpoint=None, output_csv=None,
+                 workers=None, use_service=None):
+        self.analyzer = analyzer
+        self.chunk_size = chunk_size or Config.STREAM_CHUNK_SIZE
+        self.checkpoint = checkpoint or Checkpoint()
+        self.output_csv = output_csv or Config.ANALYZED_REVIEWS_FILE
+        self.workers = workers
+        self.use_service = use_service
+        self.store = ReviewStore()
+        self.aggregates = AggregateStore()
+
+    def _start_chunk(self, fingerprint, resume):
+        state = self.checkpoint.load()
+        if not resume or state is None:
+            return 0, 0
+        if state.get('fingerprint') != fingerprint:
+            print(f"⚠ Checkpoint in {self.checkpoint.path} is for a different input; starting over")
+            return 0, 0
+        if state.get('complete'):
+            print(f"✓ {fingerprint['source']} was already fully processed")
+            return None, state['rows']
+        print(f"Resuming after chunk {state['chunk']} ({state['rows']} reviews already committed)")
+        return state['chunk'] + 1, state['rows']
+
+    def _persist(self, chunk, chunk_index):
+        chunk.to_csv(self.output_csv, mode='w' if chunk_index == 0 else 'a',
+                     header=chunk_index == 0, index=False)
+        written = self.store.write(chunk)
+        self.aggregates.update(chunk)
+        return written
+
+    def run(self, path, resume=False):
+        """
+        Stream the reviews in CSV `path` through analysis and persistence.
+        Returns (rows processed in this run, new reviews added to the store).
+        """
+        fingerprint = source_fingerprint(path, self.chunk_size)
+        start_chunk, rows = self._start_chunk(fingerprint, resume)
+        if start_chunk is None:
+            return 0, 0
+
+        processed = written = 0
+        last_chunk = start_chunk - 1
+        with tqdm(unit='reviews', initial=rows) as progress:
+            for chunk_index, chunk in iter_csv_chunks(path, self.chunk_size, start_chunk):
+                if 'fetched_at' not in chunk.columns:
+                    # Imported dumps: treat the import time as the fetch time
+                    chunk['fetched_at'] = datetime.now()
+                chunk = self.analyzer.analyze_dataframe(chunk, self.workers, self.use_service, progress)
+                written += self._persist(chunk, chunk_index)
+
+                processed += len(chunk)
+                rows += len(chunk)
+                last_chunk = chunk_index
+                self.checkpoint.save({
+                    'fingerprint': fingerprint,
+                    'chunk': last_chunk,
+                    'rows': rows,
+                    'complete': False,
+                    'updated_at': datetime.now().isoformat()
+                })
+
+        self.checkpoint.save({
+            'fingerprint': fingerprint,
+            'chunk': last_chunk,
+            'rows': rows,
+            'complete': True,
+            'updated_at': datetime.now().isoformat()
+        })
+        return processed, written
@@ -0,0 +1,195 @@
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import resource
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from config import Config
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and its finished children"""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / scale
+
+
+class Telemetry:
+    """
+    Performance measurements for one pipeline run: wall time per stage,
+    model load times, per-model batch latencies, review/token counts and
+    API calls. `save()` writes them as one JSON file per run under
+    Config.TELEMETRY_DIR, next to usage_tracking/api_usage.json.
+    Measurements are per process; analysis worker processes do not
+    report their model latencies back.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self.stages = {}
+        self.model_loads = {}
+        self.latencies = defaultdict(list)
+        self.counters = defaultdict(int)
+        self.info = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage (fetch, analyze, persist, visualize, ...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def model_call(self, model, reviews, tokens=0):
+        """Time one batched call of a model"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latencies[model].append(time.perf_counter() - start)
+            self.counters[f"{model}_reviews"] += reviews
+            self.counters[f"{model}_tokens"] += tokens
+
+    def record_model_load(self, model, seconds):
+        self.model_loads[model] = self.model_loads.get(model, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def to_dict(self):
+        analyze_seconds = self.stages.get('analyze')
+        models = {}
+        for model, latencies in self.latencies.items():
+            seconds = sum(latencies)
+            models[model] = {
+                'calls': len(latencies),
+                'seconds': round(seconds, 4),
+                'load_seconds': round(self.model_loads.get(model, 0.0), 4),
+                'latency_ms': {
+                    f"p{q}": round(_percentile(latencies, q) * 1000, 2) for q in (50, 90, 99)
+                },
+                'reviews_per_sec': round(self.counters[f"{model}_reviews"] / seconds, 1) if seconds else None,
+                'tokens_per_sec': (round(self.counters[f"{model}_tokens"] / seconds, 1)
+                                   if seconds and self.counters[f"{model}_tokens"] else None)
+            }
+        for model, seconds in self.model_loads.items():
+            models.setdefault(model, {'calls': 0, 'load_seconds': round(seconds, 4)})
+
+        reviews = self.counters.get('reviews', 0)
+        tokens = self.counters.get('tokens', 0)
+        return {
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'info': self.info,
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'models': models,
+            'reviews': reviews,
+            'tokens': tokens,
+            'reviews_per_sec': round(reviews / analyze_seconds, 1) if analyze_seconds else None,
+            'tokens_per_sec': round(tokens / analyze_seconds, 1) if analyze_seconds else None,
+            'api_calls': self.counters.get('api_calls', 0),
+            'peak_rss_mb': round(peak_rss_mb(), 1)
+        }
+
+    def save(self, directory=None):
+        """
+        Write this run's telemetry and drop all but the newest
+        TELEMETRY_KEEP_RUNS runs; returns the file path (None if nothing
+        was measured)
+        """
+        if not self.stages:
+            return None
+        directory = directory or Config.TELEMETRY_DIR
+        os.makedirs(directory, exist_ok=True)
+        # Microseconds and the pid keep runs started in the same second apart;
+        # the name still sorts by start time
+        path = os.path.join(directory, f"run-{self.started_at:%Y%m%d-%H%M%S-%f}-{os.getpid()}.json")
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        prune_runs(directory)
+        write_summary(directory)
+        return path
+
+
+def prune_runs(directory=None, keep=None):
+    """Delete all but the `keep` newest run files; returns how many were deleted"""
+    keep = Config.TELEMETRY_KEEP_RUNS if keep is None else keep
+    paths = sorted(glob.glob(os.path.join(directory or Config.TELEMETRY_DIR, 'run-*.json')))
+    stale = paths[:-keep] if keep > 0 else []
+    for path in stale:
+        os.remove(path)
+    return len(stale)
+
+
+def load_runs(directory=None, limit=None):
+    """Saved run telemetry, oldest first"""
+    paths = sorted(glob.glob(os.path.join(directory or Config.TELEMETRY_DIR, 'run-*.json')))
+    if limit:
+        paths = paths[-limit:]
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            runs.append(json.load(f))
+    return runs
+
+
+def summary_table(runs):
+    """One line per run, so trends across runs are visible at a glance"""
+    def number(value, fmt):
+        return format(value, fmt) if value is not None else '-'
+
+    lines = [
+        f"{'run':<17} {'reviews':>8} {'api':>5} {'fetch s':>8} {'analyze s':>10} "
+        f"{'reviews/s':>10} {'tokens/s':>10} {'load s':>7} {'sent p90 ms':>12} {'rss MB':>8}",
+    ]
+    for run in runs:
+        stages = run.get('stages', {})
+        models = run.get('models', {})
+        load_seconds = sum(model.get('load_seconds', 0) for model in models.values())
+        sentiment_p90 = models.get('sentiment', {}).get('latency_ms', {}).get('p90')
+        lines.append(
+            f"{run['started_at'][:16].replace('T', ' '):<17} {run.get('reviews', 0):>8} "
+            f"{run.get('api_calls', 0):>5} {number(stages.get('fetch'), '.2f'):>8} "
+            f"{number(stages.get('analyze'), '.2f'):>10} {number(run.get('reviews_per_sec'), '.1f'):>10} "
+            f"{number(run.get('tokens_per_sec'), '.0f'):>10} {load_seconds:>7.2f} "
+            f"{number(sentiment_p90, '.1f'):>12} {number(run.get('peak_rss_mb'), '.0f'):>8}"
+        )
+    return '\n'.join(lines)
+
+
+def write_summary(directory=None, limit=30):
+    directory = directory or Config.TELEMETRY_DIR
+    table = summary_table(load_runs(directory, limit))
+    with open(os.path.join(os.path.dirname(directory), 'telemetry_summary.txt'), 'w') as f:
+        f.write(f"PIPELINE TELEMETRY (last {limit} runs)\n{'=' * 30}\n{table}\n")
+    return table
+
+
+# Telemetry of the current process's run
+telemetry = Telemetry()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show performance telemetry across pipeline runs')
+    parser.add_argument('--last', type=int, default=30, help='Number of recent runs to show')
+    args = parser.parse_args()
+    print(summary_table(load_runs(limit=args.last)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+class PlacesStub:
+    """
+    Places API details endpoint on localhost. `reviews` holds each place's
+    reviews, `failures` a queue of responses to return before succeeding
+    (an HTTP status code, or a Places status such as 'NOT_FOUND'), and
+    `calls` counts requests per place. Unknown places are NOT_FOUND.
+    """
+
+    def __init__(self):
+        self.reviews = {}
+        self.failures = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                place_id = parse_qs(urlparse(self.path).query)['place_id'][0]
+                status, body = stub.respond(place_id)
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, place_id):
+        with self.lock:
+            self.calls[place_id] = self.calls.get(place_id, 0) + 1
+            queue = self.failures.get(place_id) or []
+            failure = queue.pop(0) if queue else None
+        if isinstance(failure, int):
+            return failure, {}
+        if failure:
+            return 200, {'status': failure}
+        if place_id not in self.reviews:
+            return 200, {'status': 'NOT_FOUND'}
+        return 200, {'status': 'OK', 'result': {
+            'name': place_id.title(),
+            'rating': 4.0,
+            'user_ratings_total': len(self.reviews[place_id]),
+            'reviews': list(self.reviews[place_id])
+        }}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_review(author, rating, text, time=1700000000):
+    return {'author_name': author, 'rating': rating, 'text': text, 'time': time}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory, so data/, usage_tracking/ and caches start fresh"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def places_stub(workdir, monkeypatch):
+    stub = PlacesStub()
+    monkeypatch.setattr(Config, 'PLACES_API_URL', stub.url)
+    monkeypatch.setattr(Config, 'GOOGLE_API_KEY', 'test-key')
+    monkeypatch.setattr(Config, 'FETCH_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(Config, 'FETCH_RATE_LIMIT', 1000.0)
+    yield stub
+    stub.close()
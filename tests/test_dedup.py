@@ -0,0 +1,109 @@
+import pandas as pd
+import pytest
+from config import Config
+from dedup import DedupIndex
+from telemetry import telemetry
+
+REVIEW = ("the staff at this store were friendly and helpful, the shelves were clean and well stocked "
+          "and checkout was quick even on a busy saturday afternoon")
+NEAR_DUPLICATE = REVIEW + " overall"
+OTHER = "parking was impossible and the cashier ignored us for ten minutes before helping anyone"
+
+
+@pytest.fixture
+def analyzer(workdir, monkeypatch):
+    """Keyword-only analyzer: the real cache/dedup path without loading models"""
+    from analyze_reviews import TransformerAnalyzer
+
+    monkeypatch.setattr(Config, 'ANALYSIS_SERVICE_ENABLED', False)
+    monkeypatch.setattr(Config, 'AUTOTUNE_ENABLED', False)
+    return TransformerAnalyzer(stages=['keywords'], use_cache=True, use_dedup=True)
+
+
+def reviews(*texts):
+    return pd.DataFrame({
+        'place_id': 'alpha',
+        'author_name': [f"author-{i}" for i in range(len(texts))],
+        'rating': 4,
+        'text': list(texts),
+        'time': pd.Timestamp('2025-01-01') + pd.to_timedelta(range(len(texts)), unit='h')
+    })
+
+
+def reused_by(analyzer, df):
+    before = telemetry.counters['dedup_reused']
+    result = analyzer.analyze_dataframe(df, workers=1)
+    return result, telemetry.counters['dedup_reused'] - before
+
+
+def test_near_duplicate_in_batch_reuses_and_shares_cluster(analyzer):
+    result, reused = reused_by(analyzer, reviews(REVIEW, NEAR_DUPLICATE, OTHER))
+
+    assert reused == 1
+    assert result['duplicate_cluster'][0] == result['duplicate_cluster'][1]
+    assert result['duplicate_cluster'][2] != result['duplicate_cluster'][0]
+    assert pd.isna(result['duplicate_similarity'][0])
+    assert result['duplicate_similarity'][1] >= Config.DEDUP_THRESHOLD
+    assert result['positive_keywords'][1] == result['positive_keywords'][0]
+
+
+def test_rerunning_the_same_reviews_reports_no_reuse(analyzer):
+    df = reviews(REVIEW, NEAR_DUPLICATE, OTHER)
+    first, _ = reused_by(analyzer, df.copy())
+    stats = analyzer.dedup.stats()
+
+    again, reused = reused_by(analyzer, df.copy())
+    assert reused == 0
+    assert analyzer.dedup.stats() == stats
+    assert list(again['duplicate_cluster']) == list(first['duplicate_cluster'])
+    # Served from the exact cache before the near-duplicate lookup
+    assert analyzer.cache.stats()['hits'] >= 2
+
+    # Without the exact cache the index still recognizes the reviews
+    analyzer.cache = None
+    _, reused = reused_by(analyzer, df.copy())
+    assert reused == 0
+    assert analyzer.dedup.stats() == stats
+
+
+def test_near_duplicate_of_indexed_review_reuses_its_payload(workdir):
+    index = DedupIndex(fingerprint='models-a')
+    index.record(index.match([REVIEW]), [{'sentiment_label': 'POSITIVE'}])
+
+    match = index.match([NEAR_DUPLICATE])[0]
+    assert match['source'] == 'index'
+    assert match['cluster_id'] == index.match([REVIEW])[0]['cluster_id']
+    assert match['similarity'] >= Config.DEDUP_THRESHOLD
+    assert match['payload'] == {'sentiment_label': 'POSITIVE'}
+
+    index.record([match], [match['payload']])
+    assert index.stats() == {'clusters': 1, 'reviews': 2, 'clusters_with_duplicates': 1}
+
+
+def test_model_change_drops_the_payload_until_refreshed(workdir):
+    DedupIndex(fingerprint='models-a').record(
+        DedupIndex(fingerprint='models-a').match([REVIEW]), [{'sentiment_label': 'POSITIVE'}]
+    )
+
+    index = DedupIndex(fingerprint='models-b')
+    match = index.match([NEAR_DUPLICATE])[0]
+    assert match['source'] == 'index'
+    assert match['payload'] is None
+
+    index.record([match], [{'sentiment_label': 'NEGATIVE'}])
+    assert DedupIndex(fingerprint='models-b').match([NEAR_DUPLICATE])[0]['payload'] == {'sentiment_label': 'NEGATIVE'}
+    assert DedupIndex(fingerprint='models-a').match([NEAR_DUPLICATE])[0]['payload'] is None
+
+
+def test_error_analyses_are_never_stored_as_payloads(analyzer, monkeypatch):
+    def failing(texts, *args, **kwargs):
+        return [{'sentiment_label': 'ERROR', 'sentiment_score': 0} for _ in texts]
+    monkeypatch.setattr(analyzer, '_analyze_uncached', failing)
+
+    reused_by(analyzer, reviews(REVIEW))
+    assert analyzer.dedup.stats()['clusters'] == 0
+    assert analyzer.cache.stats()['entries'] == 0
+
+    # A later run analyzes the review again instead of reusing the error
+    match = analyzer.dedup.match([analyzer.preprocessor.normalize(NEAR_DUPLICATE)])[0]
+    assert match['source'] == 'new'
@@ -0,0 +1,100 @@
+import time
+import pytest
+import fetch_reviews
+from config import Config
+from fetch_reviews import ReviewsFetcher, TokenBucket, PlacesAPIError
+from conftest import make_review
+
+
+def test_fetch_all_places_returns_results_and_errors(places_stub):
+    places_stub.reviews['ok'] = [make_review('a', 5, 'great coffee and friendly staff')]
+    places_stub.reviews['flaky'] = [make_review('b', 2, 'slow service today')]
+    places_stub.failures['flaky'] = [503, 'UNKNOWN_ERROR']
+
+    fetcher = ReviewsFetcher(['ok', 'flaky', 'missing'], response_cache=False)
+    results, errors = fetcher.fetch_all_places()
+
+    assert set(results) == {'ok', 'flaky'}
+    assert results['flaky']['reviews'][0]['author_name'] == 'b'
+    # One failing place does not affect the others, and is not retried
+    assert set(errors) == {'missing'}
+    assert isinstance(errors['missing'], PlacesAPIError)
+    assert errors['missing'].status == 'NOT_FOUND'
+    assert places_stub.calls == {'ok': 1, 'flaky': 3, 'missing': 1}
+    assert fetcher.api_calls == 5
+
+
+def test_transient_failures_give_up_after_max_retries(places_stub, monkeypatch):
+    monkeypatch.setattr(Config, 'FETCH_MAX_RETRIES', 2)
+    places_stub.reviews['busy'] = [make_review('a', 4, 'good value for money')]
+    places_stub.failures['busy'] = [429, 'OVER_QUERY_LIMIT', 500, 500]
+
+    results, errors = ReviewsFetcher(['busy'], response_cache=False).fetch_all_places()
+
+    assert results == {}
+    assert errors['busy'].status == 'HTTP 500'
+    assert errors['busy'].retryable
+    assert places_stub.calls['busy'] == 3
+
+
+def test_backoff_is_exponential_with_full_jitter(places_stub, monkeypatch):
+    monkeypatch.setattr(Config, 'FETCH_BACKOFF_BASE', 0.5)
+    monkeypatch.setattr(Config, 'FETCH_MAX_RETRIES', 3)
+    places_stub.reviews['flaky'] = [make_review('a', 4, 'good value for money')]
+    places_stub.failures['flaky'] = [503, 503, 503]
+    bounds, sleeps = [], []
+
+    def uniform(low, high):
+        bounds.append((low, high))
+        return high / 2
+    monkeypatch.setattr(fetch_reviews.random, 'uniform', uniform)
+    monkeypatch.setattr(fetch_reviews.time, 'sleep', sleeps.append)
+
+    result = ReviewsFetcher(['flaky'], response_cache=False).get_place_details('flaky')
+
+    assert result['name'] == 'Flaky'
+    assert bounds == [(0, 0.5), (0, 1.0), (0, 2.0)]
+    assert sleeps == [0.25, 0.5, 1.0]
+
+
+def test_fetch_and_save_reviews_keeps_partial_results(places_stub):
+    places_stub.reviews['ok'] = [make_review('a', 5, 'great coffee and friendly staff'),
+                                 make_review('b', 1, 'cold food and rude staff', 1700000100)]
+
+    fetcher = ReviewsFetcher(['ok', 'missing'], response_cache=False)
+    df = fetcher.fetch_and_save_reviews()
+
+    assert list(df['author_name']) == ['a', 'b']
+    assert set(df['place_id']) == {'ok'}
+    assert set(fetcher.results) == {'ok'}
+    assert set(fetcher.errors) == {'missing'}
+    assert fetcher.changed_places == ['ok']
+
+
+def test_fetch_and_save_reviews_raises_when_every_place_fails(places_stub):
+    fetcher = ReviewsFetcher(['missing', 'gone'], response_cache=False)
+    with pytest.raises(Exception, match='All 2 place'):
+        fetcher.fetch_and_save_reviews()
+    assert set(fetcher.errors) == {'missing', 'gone'}
+
+
+def test_token_bucket_limits_the_request_rate():
+    bucket = TokenBucket(rate=50, capacity=2)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # Two requests burst, the other four wait 1/50 s each
+    assert time.monotonic() - start >= 0.07
+
+
+def test_token_bucket_rate_zero_is_unlimited():
+    bucket = TokenBucket(rate=0, capacity=5)
+    start = time.monotonic()
+    for _ in range(100):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_token_bucket_rejects_negative_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=-1, capacity=5)
@@ -0,0 +1,132 @@
+import json
+from datetime import datetime, timedelta
+import pytest
+from config import Config
+from fetch_scheduler import FetchScheduler, UsageLedger, load_usage, save_usage
+from fetch_reviews import PlacesAPIError
+
+NOW = datetime(2026, 1, 10, 12, 0)
+
+
+@pytest.fixture
+def usage(workdir):
+    """A $450 / 90 day budget that started nine days before NOW"""
+    settings = {'start_date': (NOW - timedelta(days=9)).isoformat(), 'budget': 450, 'days_total': 90}
+    save_usage(settings)
+    return settings
+
+
+def scheduler(state=None, now=NOW, place_ids=('a', 'b', 'c')):
+    if state is not None:
+        with open(Config.FETCH_SCHEDULE_FILE, 'w') as f:
+            json.dump(state, f)
+    return FetchScheduler(list(place_ids), now=now)
+
+
+def fetched(hours_ago, rate):
+    return {'rate': rate, 'fetches': 1, 'newest_review': None,
+            'last_fetched': (NOW - timedelta(hours=hours_ago)).isoformat()}
+
+
+def test_velocity_interval_is_clamped(usage):
+    schedule = scheduler({'quiet': fetched(1, 0.0), 'busy': fetched(1, 100.0), 'steady': fetched(1, 1.0)},
+                         place_ids=['quiet', 'busy', 'steady', 'new'])
+    assert schedule.velocity_interval('new') == Config.SCHEDULE_MIN_INTERVAL_HOURS
+    assert schedule.velocity_interval('quiet') == Config.SCHEDULE_MAX_INTERVAL_HOURS
+    assert schedule.velocity_interval('busy') == Config.SCHEDULE_MIN_INTERVAL_HOURS
+    # SCHEDULE_TARGET_NEW_REVIEWS (3) reviews at one review per day
+    assert schedule.velocity_interval('steady') == pytest.approx(72)
+
+
+def test_due_places_most_overdue_first(usage):
+    schedule = scheduler({
+        'a': fetched(100, 1.0),   # 72 h interval, well overdue
+        'b': fetched(70, 1.0),    # due within the run tolerance
+        'c': fetched(10, 1.0),    # not due
+    }, place_ids=['a', 'b', 'c', 'new'])
+    # A never fetched place comes first
+    assert schedule.due_places() == ['new', 'a', 'b']
+    assert schedule.due_places(force=True) == ['new', 'a', 'b', 'c']
+
+
+def test_intervals_stretch_to_fit_the_budget(usage):
+    # 100 requests for the remaining 81 days
+    usage['budget'] = 100 * Config.PLACES_COST_PER_REQUEST
+    save_usage(usage)
+    schedule = scheduler({})
+    budget = schedule.budget()
+    intervals = schedule.intervals(budget)
+
+    # Unstretched, three new places would take 3 * 24 / 6 = 12 requests/day
+    assert sum(24 / hours for hours in intervals.values()) == pytest.approx(budget['daily_requests'])
+    assert all(hours > Config.SCHEDULE_MIN_INTERVAL_HOURS for hours in intervals.values())
+
+
+def test_due_places_are_capped_by_worst_case_retries(usage, monkeypatch):
+    monkeypatch.setattr(Config, 'FETCH_MAX_RETRIES', 3)
+    usage['budget'] = 9 * Config.PLACES_COST_PER_REQUEST
+    save_usage(usage)
+    schedule = scheduler({'a': fetched(300, 1.0), 'b': fetched(100, 1.0), 'c': fetched(200, 1.0)})
+    # 9 requests pay for two places at up to 4 attempts each
+    assert schedule.due_places(force=True) == ['a', 'c']
+
+
+def test_failing_place_backs_off_doubling_up_to_the_max(usage):
+    schedule = scheduler({}, place_ids=['missing'])
+    expected = [6, 12, 24, 48, 96, 168, 168]
+    for hours in expected:
+        schedule.observe({}, {'missing': PlacesAPIError('NOT_FOUND')})
+        assert schedule.retry_interval('missing') == hours
+    schedule.save()
+
+    # Due again once the backoff (minus the run tolerance) has passed
+    last = Config.SCHEDULE_MAX_INTERVAL_HOURS
+    tolerance = Config.SCHEDULE_RUN_INTERVAL_HOURS / 2
+    assert scheduler(now=NOW + timedelta(hours=last - tolerance - 1), place_ids=['missing']).due_places() == []
+    assert scheduler(now=NOW + timedelta(hours=last - tolerance), place_ids=['missing']).due_places() == ['missing']
+
+    # A success resets the backoff
+    schedule.observe({'missing': {'name': 'Found', 'reviews': []}})
+    assert schedule.retry_interval('missing') is None
+    assert schedule.state['missing']['failures'] == 0
+
+
+def test_legacy_daily_calls_move_to_the_ledger(workdir):
+    save_usage({'start_date': '2026-01-01T00:00:00', 'budget': 450, 'days_total': 90,
+                'daily_calls': [{'date': '2026-01-01', 'requests': 3}, {'date': '2026-01-02', 'requests': 4}]})
+
+    settings = load_usage()
+
+    assert 'daily_calls' not in settings
+    with open(Config.USAGE_FILE) as f:
+        assert 'daily_calls' not in json.load(f)
+    totals = UsageLedger().totals()
+    assert totals['requests'] == 7
+    assert totals['first'].startswith('2026-01-01')
+    # Migrated once
+    load_usage()
+    assert UsageLedger().totals()['requests'] == 7
+
+
+def test_default_usage_is_persisted_from_the_first_ledger_entry(workdir):
+    UsageLedger().append(2, ['a'], at=datetime(2026, 1, 5))
+    settings = load_usage()
+    assert settings['start_date'] == '2026-01-05T00:00:00'
+    assert load_usage() == settings
+
+
+def test_ledger_totals_are_rebuilt_when_the_ledger_changes(workdir):
+    ledger = UsageLedger()
+    ledger.append(2, ['a'], at=datetime(2026, 1, 1))
+    ledger.append(3, ['b'], at=datetime(2026, 1, 2))
+    assert ledger.totals()['requests'] == 5
+
+    # Written behind the totals file's back (e.g. merged from another branch)
+    with open(Config.USAGE_LEDGER_FILE, 'a') as f:
+        f.write(json.dumps({'at': '2026-01-03T00:00:00', 'requests': 10, 'cost': 0.17, 'places': []}) + '\n')
+
+    totals = UsageLedger().totals()
+    assert totals['requests'] == 15
+    assert totals['entries'] == 3
+    assert totals['last'] == '2026-01-03T00:00:00'
+    assert ledger.daily()['2026-01-03']['requests'] == 10
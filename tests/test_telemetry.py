@@ -0,0 +1,25 @@
+from datetime import datetime
+from config import Config
+from telemetry import Telemetry, load_runs
+
+
+def run_started_at(started_at, seconds):
+    run = Telemetry()
+    run.started_at = started_at
+    run.stages['fetch'] = seconds
+    return run
+
+
+def test_runs_started_in_the_same_second_are_all_kept(workdir):
+    paths = [run_started_at(datetime(2026, 1, 1, 12, 0, 0, 1000 * i), i).save('runs') for i in range(3)]
+
+    assert len(set(paths)) == 3
+    assert [run['stages']['fetch'] for run in load_runs('runs')] == [0, 1, 2]
+
+
+def test_only_the_newest_runs_are_kept(workdir, monkeypatch):
+    monkeypatch.setattr(Config, 'TELEMETRY_KEEP_RUNS', 2)
+    for second in (5, 1, 3):
+        run_started_at(datetime(2026, 1, 1, 12, 0, second), second).save('runs')
+
+    assert [run['stages']['fetch'] for run in load_runs('runs')] == [3, 5]
@@ -0,0 +1,93 @@
+from config import Config
+from watch import ReviewWatcher
+from conftest import make_review
+
+
+class RatingAnalyzer:
+    """Stands in for TransformerAnalyzer: reviews rated 1-2 are NEGATIVE"""
+
+    def analyze_dataframe(self, df):
+        df = df.copy()
+        df['sentiment_label'] = ['NEGATIVE' if rating <= 2 else 'POSITIVE' for rating in df['rating']]
+        df['sentiment_score'] = 0.99
+        df['categories'] = [[] for _ in range(len(df))]
+        return df
+
+
+class ListSink:
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alert):
+        self.alerts.append(alert)
+
+
+def make_watcher(sink):
+    return ReviewWatcher(RatingAnalyzer(), [sink], interval=0.01)
+
+
+def test_watch_baselines_then_alerts_once_per_new_negative_review(places_stub, monkeypatch):
+    monkeypatch.setattr(Config, 'PLACE_IDS', ['alpha'])
+    monkeypatch.setattr(Config, 'WATCH_ALERT_CATEGORIES', [])
+    places_stub.reviews['alpha'] = [
+        make_review('old-1', 1, 'terrible service and rude staff', 1700000000),
+        make_review('old-2', 5, 'great store, friendly staff', 1700000100),
+    ]
+    sink = ListSink()
+    watcher = make_watcher(sink)
+
+    # The first poll of a place without history only records a baseline
+    assert watcher.poll() == []
+    assert sink.alerts == []
+
+    places_stub.reviews['alpha'] = [
+        make_review('new-1', 1, 'waited forever, nobody helped me', 1700000200),
+        make_review('new-2', 4, 'quick checkout and clean aisles', 1700000300),
+    ] + places_stub.reviews['alpha']
+    alerts = watcher.poll()
+    assert [alert['author_name'] for alert in alerts] == ['new-1']
+    assert alerts[0]['reasons'] == ['negative']
+    assert 'latency_ms' in alerts[0]
+    assert [alert['author_name'] for alert in sink.alerts] == ['new-1']
+
+    # Nothing new: no repeated alert
+    assert watcher.poll() == []
+    assert len(sink.alerts) == 1
+
+
+def test_watch_does_not_repeat_alerts_after_restart(places_stub, monkeypatch):
+    monkeypatch.setattr(Config, 'PLACE_IDS', ['alpha'])
+    monkeypatch.setattr(Config, 'WATCH_ALERT_CATEGORIES', [])
+    places_stub.reviews['alpha'] = [make_review('old-1', 5, 'lovely place to shop', 1700000000)]
+    make_watcher(ListSink()).poll()
+    places_stub.reviews['alpha'].insert(0, make_review('new-1', 2, 'broken product, no refund', 1700000200))
+    first = ListSink()
+    make_watcher(first).poll()
+    assert len(first.alerts) == 1
+
+    # A restarted watcher knows the reviews from the stored history
+    sink = ListSink()
+    restarted = make_watcher(sink)
+    assert restarted.poll() == []
+
+    places_stub.reviews['alpha'].insert(0, make_review('new-2', 1, 'dirty floors and long lines', 1700000300))
+    assert [alert['author_name'] for alert in restarted.poll()] == ['new-2']
+    assert [alert['author_name'] for alert in sink.alerts] == ['new-2']
+
+
+def test_watch_run_stops_after_max_polls(places_stub, monkeypatch):
+    monkeypatch.setattr(Config, 'PLACE_IDS', ['alpha'])
+    places_stub.reviews['alpha'] = [make_review('old-1', 5, 'lovely place to shop', 1700000000)]
+    watcher = make_watcher(ListSink())
+    # Within budget the configured interval is used as is
+    monkeypatch.setattr(watcher, 'paced_interval', lambda budget: watcher.interval)
+    assert watcher.run(max_polls=2) == 2
+    assert places_stub.calls['alpha'] == 2
+
+
+def test_watch_polls_are_paced_to_the_daily_request_budget(places_stub, monkeypatch):
+    monkeypatch.setattr(Config, 'PLACE_IDS', ['alpha', 'beta'])
+    watcher = ReviewWatcher(RatingAnalyzer(), [], interval=300)
+    # Two requests per poll at 96 requests/day: one poll every 30 minutes
+    assert watcher.paced_interval({'daily_requests': 96}) == 1800
+    assert watcher.paced_interval({'daily_requests': 10000}) == 300
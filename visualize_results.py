@@ -1,14 +1,87 @@
+import os
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import plotly.express as px
 from config import Config
-from collections import Counter
-import ast
+from aggregates import AggregateStore
 
 class ResultsVisualizer:
-    def __init__(self, df):
+    # Columns produced by the analysis stages; missing ones (when only some
+    # stages ran) are added empty so every panel can still be drawn
+    ANALYSIS_COLUMNS = ['sentiment_label', 'sentiment_score']
+    
+    def __init__(self, df, aggregates=None):
+        """
+        `df` supplies the per-review panels (sentiment vs rating, timeline);
+        counts come from `aggregates`, an AggregateStore, and are computed
+        from `df` when none is given.
+        """
         self.df = df
+        for column in self.ANALYSIS_COLUMNS:
+            if column not in self.df.columns:
+                self.df[column] = float('nan') if column.endswith('_score') else None
+        self.aggregates = aggregates if aggregates is not None else AggregateStore.from_dataframe(df)
+    
+    @property
+    def large_data(self):
+        """Above DASHBOARD_MAX_POINTS reviews, per-review panels are binned server-side"""
+        return len(self.df) > Config.DASHBOARD_MAX_POINTS
+    
+    def _sentiment_rating_trace(self):
+        sentiment_map = {'POSITIVE': 1, 'NEGATIVE': 0}
+        if not self.large_data:
+            return go.Scatter(
+                x=self.df['rating'],
+                y=self.df['sentiment_label'].map(sentiment_map),
+                mode='markers',
+                marker=dict(size=10, color=self.df['sentiment_score'], 
+                          colorscale='RdYlGn', showscale=True),
+                text=self.df['text'].str[:100] if 'text' in self.df.columns else None
+            )
+        
+        # One density bin per (rating, sentiment): size by review count,
+        # color by mean sentiment score
+        bins = (self.df.dropna(subset=['rating', 'sentiment_label'])
+                .groupby(['rating', 'sentiment_label'], observed=True)['sentiment_score']
+                .agg(['size', 'mean']).reset_index())
+        sizes = bins['size'] ** 0.5
+        return go.Scatter(
+            x=bins['rating'],
+            y=bins['sentiment_label'].astype(str).map(sentiment_map),
+            mode='markers',
+            marker=dict(size=sizes, sizemode='area', sizeref=2 * sizes.max() / 40 ** 2 if len(bins) else 1,
+                        color=bins['mean'], colorscale='RdYlGn', showscale=True),
+            text=[f"{n} reviews, mean score {mean:.2f}" for n, mean in zip(bins['size'], bins['mean'])]
+        )
+    
+    def _timeline_trace(self):
+        df_time = self.df.dropna(subset=['time']).sort_values('time')
+        if not self.large_data:
+            return go.Scatter(x=df_time['time'], y=df_time['rating'],
+                              mode='lines+markers',
+                              marker=dict(color=df_time['sentiment_label'].map(
+                                  {'POSITIVE': 'green', 'NEGATIVE': 'red'})),
+                              name='Rating over time')
+        
+        # Daily rollups (weekly/monthly for long histories) drawn with WebGL
+        df_time = df_time.assign(
+            time=pd.to_datetime(df_time['time']),
+            positive=(df_time['sentiment_label'].astype(str) == 'POSITIVE').astype(float)
+        )
+        days = (df_time['time'].iloc[-1] - df_time['time'].iloc[0]).days + 1 if len(df_time) else 0
+        freq = 'D' if days <= Config.DASHBOARD_MAX_POINTS else 'W' if days <= 7 * Config.DASHBOARD_MAX_POINTS else 'MS'
+        rollup = (df_time.set_index('time')
+                  .resample(freq)
+                  .agg({'rating': 'mean', 'positive': 'mean', 'sentiment_label': 'size'})
+                  .dropna(subset=['rating']))
+        return go.Scattergl(
+            x=rollup.index, y=rollup['rating'],
+            mode='lines+markers',
+            marker=dict(color=rollup['positive'], colorscale='RdYlGn', cmin=0, cmax=1),
+            text=[f"{n} reviews, {share:.0%} positive"
+                  for n, share in zip(rollup['sentiment_label'], rollup['positive'])],
+            name='Average rating over time'
+        )
     
     def create_dashboard(self):
         """Create comprehensive visualization dashboard"""
@@ -30,7 +103,7 @@ class ResultsVisualizer:
         )
         
         # 1. Sentiment Distribution
-        sentiment_counts = self.df['sentiment_label'].value_counts()
+        sentiment_counts = self.aggregates.counts('sentiment')
         fig.add_trace(
             go.Pie(labels=sentiment_counts.index, values=sentiment_counts.values,
                    marker=dict(colors=['#2ecc71', '#e74c3c'])),
@@ -38,7 +111,9 @@ class ResultsVisualizer:
         )
         
         # 2. Rating Distribution
-        rating_counts = self.df['rating'].value_counts().sort_index()
+        rating_counts = self.aggregates.counts('rating')
+        rating_counts.index = rating_counts.index.astype(int)
+        rating_counts = rating_counts.sort_index()
         fig.add_trace(
             go.Bar(x=rating_counts.index, y=rating_counts.values,
                    marker_color='lightblue'),
@@ -46,72 +121,41 @@ class ResultsVisualizer:
         )
         
         # 3. Top Emotions
-        emotions = []
-        for emotion_dict in self.df['all_emotions'].dropna():
-            try:
-                emotion_dict = ast.literal_eval(emotion_dict) if isinstance(emotion_dict, str) else emotion_dict
-                emotions.extend(emotion_dict.keys())
-            except:
-                continue
-        emotion_counts = Counter(emotions).most_common(5)
-        if emotion_counts:
+        emotion_counts = self.aggregates.counts('emotion').head(5)
+        if len(emotion_counts):
             fig.add_trace(
-                go.Bar(x=[e[0] for e in emotion_counts], 
-                       y=[e[1] for e in emotion_counts],
+                go.Bar(x=emotion_counts.index.tolist(), 
+                       y=emotion_counts.values.tolist(),
                        marker_color='coral'),
                 row=2, col=1
             )
         
         # 4. Category Mentions
-        categories = []
-        for cat_list in self.df['categories'].dropna():
-            try:
-                cat_list = ast.literal_eval(cat_list) if isinstance(cat_list, str) else cat_list
-                categories.extend(cat_list)
-            except:
-                continue
-        category_counts = Counter(categories).most_common(8)
-        if category_counts:
+        category_counts = self.aggregates.counts('category').head(8)
+        if len(category_counts):
             fig.add_trace(
-                go.Bar(y=[c[0] for c in category_counts],
-                       x=[c[1] for c in category_counts],
+                go.Bar(y=category_counts.index.tolist(),
+                       x=category_counts.values.tolist(),
                        orientation='h',
                        marker_color='mediumpurple'),
                 row=2, col=2
             )
         
         # 5. Sentiment vs Rating
-        sentiment_map = {'POSITIVE': 1, 'NEGATIVE': 0}
-        fig.add_trace(
-            go.Scatter(
-                x=self.df['rating'],
-                y=self.df['sentiment_label'].map(sentiment_map),
-                mode='markers',
-                marker=dict(size=10, color=self.df['sentiment_score'], 
-                          colorscale='RdYlGn', showscale=True),
-                text=self.df['text'].str[:100]
-            ),
-            row=3, col=1
-        )
+        fig.add_trace(self._sentiment_rating_trace(), row=3, col=1)
         
         # 6. Timeline
         if 'time' in self.df.columns:
-            df_time = self.df.sort_values('time')
-            fig.add_trace(
-                go.Scatter(x=df_time['time'], y=df_time['rating'],
-                          mode='lines+markers',
-                          marker=dict(color=df_time['sentiment_label'].map(
-                              {'POSITIVE': 'green', 'NEGATIVE': 'red'})),
-                          name='Rating over time'),
-                row=3, col=2
-            )
+            fig.add_trace(self._timeline_trace(), row=3, col=2)
         
         fig.update_layout(height=1200, showlegend=False,
                          title_text="Google Reviews Analysis Dashboard")
         
         output_file = f"{Config.VISUALIZATIONS_DIR}/sentiment_report.html"
-        fig.write_html(output_file)
-        print(f"✓ Dashboard saved to {output_file}")
+        fig.write_html(output_file, include_plotlyjs=Config.DASHBOARD_PLOTLYJS)
+        size_kb = os.path.getsize(output_file) / 1024
+        mode = "large-data mode, " if self.large_data else ""
+        print(f"✓ Dashboard saved to {output_file} ({mode}{size_kb:.0f} KB)")
         
         return fig
     
@@ -121,47 +165,35 @@ class ResultsVisualizer:
         report.append("=" * 60)
         report.append("GOOGLE REVIEWS ANALYSIS SUMMARY")
         report.append("=" * 60)
-        report.append(f"\nTotal Reviews Analyzed: {len(self.df)}")
-        report.append(f"Average Rating: {self.df['rating'].mean():.2f}/5.0")
+        report.append(f"\nTotal Reviews Analyzed: {self.aggregates.total()}")
+        report.append(f"Average Rating: {self.aggregates.average_rating():.2f}/5.0")
         
         # Sentiment breakdown
-        sentiment_pct = self.df['sentiment_label'].value_counts(normalize=True) * 100
+        sentiment_counts = self.aggregates.counts('sentiment')
+        sentiment_pct = sentiment_counts / max(sentiment_counts.sum(), 1) * 100
         report.append("\n--- SENTIMENT ANALYSIS ---")
         for sentiment, pct in sentiment_pct.items():
             report.append(f"{sentiment}: {pct:.1f}%")
         
         # Top emotions
         report.append("\n--- PRIMARY EMOTIONS ---")
-        top_emotions = self.df['primary_emotion'].value_counts().head(5)
+        top_emotions = self.aggregates.counts('primary_emotion').head(5)
         for emotion, count in top_emotions.items():
             report.append(f"{emotion}: {count} reviews")
         
         # Most mentioned categories
         report.append("\n--- TOP CATEGORIES ---")
-        all_categories = []
-        for cats in self.df['categories'].dropna():
-            try:
-                cats = ast.literal_eval(cats) if isinstance(cats, str) else cats
-                all_categories.extend(cats)
-            except:
-                continue
-        for cat, count in Counter(all_categories).most_common(5):
+        for cat, count in self.aggregates.counts('category').head(5).items():
             report.append(f"{cat}: {count} mentions")
         
         # Key insights
         report.append("\n--- KEY INSIGHTS ---")
-        negative_reviews = self.df[self.df['sentiment_label'] == 'NEGATIVE']
-        if len(negative_reviews) > 0:
-            report.append(f"\n⚠ {len(negative_reviews)} negative reviews need attention")
+        negative_reviews = self.aggregates.total(sentiment='NEGATIVE')
+        if negative_reviews > 0:
+            report.append(f"\n⚠ {negative_reviews} negative reviews need attention")
             report.append("\nMost common issues in negative reviews:")
-            neg_keywords = []
-            for keywords in negative_reviews['negative_keywords'].dropna():
-                try:
-                    keywords = ast.literal_eval(keywords) if isinstance(keywords, str) else keywords
-                    neg_keywords.extend(keywords)
-                except:
-                    continue
-            for keyword, count in Counter(neg_keywords).most_common(5):
+            neg_keywords = self.aggregates.counts('negative_keyword', sentiment='NEGATIVE')
+            for keyword, count in neg_keywords.head(5).items():
                 report.append(f"  - {keyword}: {count} times")
         
         report.append("\n" + "=" * 60)
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import importlib
+from datetime import datetime
+import requests
+from config import Config
+from telemetry import telemetry, _percentile
+
+
+class StdoutSink:
+    """Print alerts"""
+
+    def send(self, alert):
+        text = ' '.join(str(alert['text']).split())
+        print(f"🚨 {alert['place_name'] or alert['place_id']}: {alert['rating']}★ "
+              f"{alert['sentiment_label']} ({', '.join(alert['reasons'])}) "
+              f"- {text[:120] + '...' if len(text) > 120 else text}")
+
+
+class FileSink:
+    """Append alerts to a JSON lines file"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.WATCH_ALERT_FILE
+
+    def send(self, alert):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(alert) + '\n')
+
+
+class WebhookSink:
+    """POST each alert as JSON (e.g. to a Slack or Teams incoming webhook relay)"""
+
+    def __init__(self, url=None):
+        self.url = url or Config.WATCH_WEBHOOK_URL
+        if not self.url:
+            raise ValueError("WATCH_WEBHOOK_URL is not set")
+        self.session = requests.Session()
+
+    def send(self, alert):
+        response = self.session.post(self.url, json=alert, timeout=Config.FETCH_TIMEOUT)
+        response.raise_for_status()
+
+
+SINKS = {'stdout': StdoutSink, 'file': FileSink, 'webhook': WebhookSink}
+
+
+def make_sink(name):
+    """A sink by name, or any class with a send(alert) method given as 'module:Class'"""
+    if name in SINKS:
+        return SINKS[name]()
+    if ':' in name:
+        module, attribute = name.split(':', 1)
+        return getattr(importlib.import_module(module), attribute)()
+    raise ValueError(f"Unknown alert sink: {name} (choose from {', '.join(SINKS)} or module:Class)")
+
+
+def alert_reasons(review):
+    """Why an analyzed review deserves an alert (empty when it does not)"""
+    reasons = []
+    if review.get('sentiment_label') == 'NEGATIVE':
+        reasons.append('negative')
+    categories = review.get('categories')
+    categories = list(categories) if isinstance(categories, (list, tuple)) else []
+    reasons.extend(f"category: {category}" for category in categories
+                   if category in Config.WATCH_ALERT_CATEGORIES)
+    return reasons
+
+
+class ReviewWatcher:
+    """
+    Polls the configured places, analyzes only reviews it has not seen
+    with models kept loaded between polls, persists them like a pipeline
+    run and sends alerts for NEGATIVE reviews and WATCH_ALERT_CATEGORIES
+    to the sinks. Reviews already in the history count as seen; a place
+    with no history is baselined on its first poll without alerts.
+    Latency is measured from the moment a poll's responses arrive until
+    the sinks have returned from sending the alert. Polls are spaced
+    further apart than `interval` when needed to stay within the daily
+    request rate the fetch scheduler allows for the remaining budget.
+    """
+
+    def __init__(self, analyzer, sinks, fetcher=None, interval=None):
+        from fetch_reviews import ReviewsFetcher
+        from review_store import ReviewStore
+
+        self.analyzer = analyzer
+        self.sinks = sinks
+        # New reviews must not be hidden by cached responses
+        self.fetcher = fetcher or ReviewsFetcher(response_cache=False)
+        self.interval = interval or Config.WATCH_INTERVAL
+        self.store = ReviewStore()
+
+        history = self.store.read(columns=['review_id', 'place_id'])
+        self.seen = set(history['review_id'])
+        self.known_places = set(history['place_id'].dropna())
+        self.latencies = []
+        self.alerts_sent = 0
+
+    def poll(self):
+        """Fetch once, analyze new reviews and send their alerts; returns the alerts"""
+        import pandas as pd
+        from review_store import review_ids
+        from aggregates import AggregateStore
+        from fetch_scheduler import UsageLedger
+
+        calls_before = self.fetcher.api_calls
+        try:
+            results, errors = self.fetcher.fetch_all_places()
+        finally:
+            UsageLedger().append(self.fetcher.api_calls - calls_before, self.fetcher.place_ids, note='watch')
+        detected_at = time.time()
+        for place_id, error in errors.items():
+            print(f"⚠ Failed to fetch {place_id}: {error}")
+
+        rows = [row for place_id, result in results.items()
+                for row in self.fetcher._reviews_to_rows(place_id, result)]
+        if not rows:
+            return []
+        df = pd.DataFrame(rows)
+        df['review_id'] = review_ids(df)
+        df = df[~df['review_id'].isin(self.seen)].drop_duplicates('review_id')
+        if df.empty:
+            return []
+
+        baseline = set(df['place_id']) - self.known_places
+        analyzed = self.analyzer.analyze_dataframe(df.drop(columns=['review_id']))
+        analyzed['review_id'] = df['review_id'].values
+
+        alerts = []
+        for review in analyzed.to_dict('records'):
+            reasons = alert_reasons(review)
+            if reasons and review['place_id'] not in baseline:
+                alerts.append(self._alert(review, reasons, detected_at))
+        for alert in alerts:
+            self._send(alert, detected_at)
+
+        # Persist after alerting so storage never delays an alert
+        self.store.write(analyzed)
+        AggregateStore().update(analyzed)
+        self.seen.update(df['review_id'])
+        self.known_places.update(df['place_id'])
+        for place_id in sorted(baseline):
+            print(f"✓ Baseline for {place_id}: {(df['place_id'] == place_id).sum()} reviews, no alerts")
+        return alerts
+
+    @staticmethod
+    def _alert(review, reasons, detected_at):
+        return {
+            'review_id': review['review_id'],
+            'place_id': review['place_id'],
+            'place_name': review.get('place_name'),
+            'author_name': review.get('author_name'),
+            'rating': review.get('rating'),
+            'text': review.get('text'),
+            'posted_at': review['time'].isoformat() if review.get('time') is not None else None,
+            'sentiment_label': review.get('sentiment_label'),
+            'sentiment_score': review.get('sentiment_score'),
+            'categories': list(review.get('categories') or []),
+            'reasons': reasons,
+            'detected_at': datetime.fromtimestamp(detected_at).isoformat(timespec='milliseconds')
+        }
+
+    def _send(self, alert, detected_at):
+        delivered = 0
+        for sink in self.sinks:
+            try:
+                sink.send(alert)
+                delivered += 1
+            except Exception as e:
+                print(f"⚠ {type(sink).__name__} failed: {e}")
+        if delivered:
+            latency = time.time() - detected_at
+            alert['latency_ms'] = round(latency * 1000, 1)
+            self.latencies.append(latency)
+            self.alerts_sent += 1
+
+    def latency_summary(self):
+        if not self.latencies:
+            return "no alerts sent"
+        return (f"{self.alerts_sent} alert(s) sent, detection→alert "
+                f"p50 {_percentile(self.latencies, 50) * 1000:.0f} ms, "
+                f"p95 {_percentile(self.latencies, 95) * 1000:.0f} ms, "
+                f"max {max(self.latencies) * 1000:.0f} ms")
+
+    def paced_interval(self, budget):
+        """Seconds between polls: `interval`, stretched to the budget's daily request rate"""
+        requests_per_poll = len(self.fetcher.place_ids)
+        return max(self.interval, requests_per_poll / budget['daily_requests'] * 86400)
+
+    def run(self, max_polls=None):
+        """Poll every `interval` seconds until interrupted (or `max_polls` polls)"""
+        from fetch_scheduler import FetchScheduler
+
+        print(f"👀 Watching {len(self.fetcher.place_ids)} place(s) every {self.interval:g}s "
+              f"(alerts: {', '.join(type(sink).__name__ for sink in self.sinks)}); Ctrl+C to stop")
+        polls = 0
+        paced = self.interval
+        try:
+            while max_polls is None or polls < max_polls:
+                started = time.monotonic()
+                budget = FetchScheduler(self.fetcher.place_ids).budget()
+                if budget['requests_left'] < len(self.fetcher.place_ids):
+                    print(f"⚠ API budget exhausted (${budget['remaining']:.2f} left); stopping")
+                    break
+                interval = self.paced_interval(budget)
+                if interval > self.interval and abs(interval - paced) > 1:
+                    print(f"⏱ Polling every {interval:.0f}s to stay within the API budget "
+                          f"({budget['daily_requests']:.0f} requests/day)")
+                paced = interval
+                try:
+                    with telemetry.stage('watch'):
+                        alerts = self.poll()
+                except Exception as e:
+                    print(f"⚠ Poll failed: {e}")
+                    alerts = []
+                polls += 1
+                if alerts:
+                    print(f"[{datetime.now():%H:%M:%S}] {len(alerts)} new alert(s) (total: {self.latency_summary()})")
+                if max_polls is not None and polls >= max_polls:
+                    break
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        except KeyboardInterrupt:
+            print()
+        telemetry.count('watch_polls', polls)
+        telemetry.count('alerts', self.alerts_sent)
+        if self.latencies:
+            telemetry.info['alert_latency_ms'] = {
+                'p50': round(_percentile(self.latencies, 50) * 1000, 1),
+                'p95': round(_percentile(self.latencies, 95) * 1000, 1),
+                'max': round(max(self.latencies) * 1000, 1)
+            }
+        print(f"✓ Watch stopped after {polls} poll(s): {self.latency_summary()}")
+        return polls
+